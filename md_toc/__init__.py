@@ -20,4 +20,35 @@
 #
 """Python discovery file."""
 
-from . import api, cli, exceptions, types
+import functools
+import importlib
+
+__all__ = ['api', 'cache', 'cli', 'daemon', 'exceptions', 'types']
+
+# Reachable as attributes like the ones in __all__.
+_submodules = __all__ + ['cmark', 'constants', 'generic']
+
+
+@functools.lru_cache(maxsize=None)
+def _get_version() -> str:
+    import pathlib
+    from importlib import metadata
+
+    try:
+        return metadata.distribution('md_toc').version
+    except metadata.PackageNotFoundError:
+        # Development version: changes with the source.
+        return 'dev-' + str(
+            max(p.stat().st_mtime_ns
+                for p in pathlib.Path(__file__).parent.rglob('*.py')))
+
+
+def __getattr__(name: str):
+    # Import the submodules on first use: the command line client
+    # must start quickly when a daemon does the work.
+    if name in _submodules:
+        return importlib.import_module('.' + name, __name__)
+    if name == '__version__':
+        return _get_version()
+    raise AttributeError('module ' + repr(__name__) + ' has no attribute ' +
+                         repr(name))
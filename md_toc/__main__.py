@@ -23,15 +23,13 @@
 import sys
 import traceback
 
-from .cli import CliInterface
+from . import daemon
 
 
-def main(args=None):
-    """Call the CLI interface and wait for the result."""
+def _run(args) -> int:
+    """Call the API function selected by the parsed arguments and get the return value."""
     retcode = 0
     try:
-        ci = CliInterface()
-        args = ci.parser.parse_args()
         result = args.func(args)
         if result is not None and not isinstance(result, bool):
             print(result)
@@ -44,6 +42,22 @@ def main(args=None):
     except Exception:
         retcode = 1
         traceback.print_exc()
+    return retcode
+
+
+def main(args=None):
+    """Call the CLI interface and wait for the result."""
+    # Avoid loading the parsers if a daemon is running.
+    retcode = daemon.call(sys.argv[1:])
+    if retcode is None:
+        try:
+            from .cli import CliInterface
+            ci = CliInterface()
+            args = ci.parse_args()
+        except Exception:
+            traceback.print_exc()
+            sys.exit(1)
+        retcode = _run(args)
     sys.exit(retcode)
 
 
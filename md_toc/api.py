@@ -22,17 +22,21 @@
 
 from __future__ import annotations
 
+import array
+import concurrent.futures
 import copy
+import functools
 import hashlib
+import io
+import itertools
+import locale
 import os
 import re
 import sys
 import typing
 
-import fpyutils
-
-from . import generic, types
-from .cmark import inlines_c, node_h, references_h
+from . import cache, generic, types
+from .cmark import chunk_h, inlines_c, node_h, references_h
 from .constants import common_defaults
 from .constants import parser as md_parser
 from .exceptions import (
@@ -45,6 +49,99 @@ from .exceptions import (
 )
 
 
+@functools.lru_cache(maxsize=None)
+def _get_compiled_re(parser: str) -> dict:
+    # Compile the regular expressions of a parser only once, instead of
+    # relying on the small internal cache of the re module.
+    compiled: dict = dict()
+    if parser in ['github', 'cmark', 'gitlab', 'commonmarker', 'goldmark']:
+        # We need to match newline as well because it is a WS, so we
+        # must use re.DOTALL.
+        # The HTML regexes cannot be merged in a single alternation:
+        # removing a match may create a new match for one of the
+        # regexes that follow.
+        compiled['html_tags'] = [
+            re.compile(md_parser[parser]['re'][r], flags=re.DOTALL)
+            for r in ['OT', 'CT', 'CO', 'PI', 'DE', 'CD']
+        ]
+        # Keep spaces, hypens and "word characters" only.
+        compiled['punctuation'] = re.compile(r'[^\w\- ]')
+        compiled['hyphens'] = re.compile('-+')
+        # Block structure. See is_paragraph_line.
+        # [0.29]: spaces, [0.30]: spaces or tabs. See get_atx_heading.
+        if parser in ['github', 'commonmarker']:
+            spaces = ' '
+        else:
+            spaces = ' \t'
+        compiled['link_reference_definition'] = re.compile(r' {0,3}\[')
+        compiled['atx_heading'] = re.compile(r' {0,3}#{1,6}(?:[' + spaces +
+                                             r'\n]|$)')
+        compiled['setext_heading_underline'] = re.compile(r' {0,3}(=+|-+)[' +
+                                                          spaces + r']*\n?')
+        compiled['thematic_break'] = re.compile(
+            r' {0,3}(?:(?:\*[ \t]*){3,}|(?:-[ \t]*){3,}|(?:_[ \t]*){3,})\n?')
+        compiled['block_quote'] = re.compile(r' {0,3}> ?')
+        # Characters which never start a block other than a paragraph.
+        compiled['paragraph_text'] = re.compile(
+            r' {0,3}[^ \t\n#>*+\-_=`~0-9<]')
+        # The marker and the first space of a list item.
+        compiled['list_item'] = re.compile(
+            r' {0,3}(?:[-+*]|(?P<start>[0-9]{1,9})[.)])(?:[ \t]|(?=\n)|$)')
+
+        # HTML blocks, from type 1 to 7. See is_opening_html_block.
+        # [0.29]: whitespace, [0.30]: spaces or tabs.
+        if parser in ['github', 'commonmarker']:
+            whitespace = ' \t\x0b\x0c'
+            letters = 'A-Z'
+        else:
+            whitespace = ' \t'
+            letters = 'A-Za-z'
+        html_block: dict = md_parser[parser]['html_block']
+        verbatim_tags: str = '|'.join(html_block['verbatim_tags'])
+        block_tags: str = '|'.join(html_block['block_tags'])
+        start: list[str] = [
+            r' {0,3}<(?i:' + verbatim_tags + r')(?:[' + whitespace +
+            r'>\r\n]|$)',
+            r' {0,3}<!--',
+            r' {0,3}<\?',
+            r' {0,3}<![' + letters + ']',
+            r' {0,3}<!\[CDATA\[',
+        ]
+        end: list[str] = [
+            r'</(?i:' + verbatim_tags + r')>',
+            r'-->',
+            r'\?>',
+            r'>',
+            r'\]\]>',
+        ]
+        compiled['html_block_start'] = [re.compile(r) for r in start] + [
+            re.compile(r' {0,3}</?(?i:' + block_tags + r')(?:[' + whitespace +
+                       r'>\n]|/>|$)'),
+            # A complete open or closing tag, alone on the line.
+            re.compile(r' {0,3}(?!</?(?i:' + verbatim_tags +
+                       r')(?![A-Za-z0-9-]))(?:' +
+                       md_parser['cmark']['re']['OT'] + '|' +
+                       md_parser['cmark']['re']['CT'] + r')[' + whitespace +
+                       r']*\n?'),
+        ]
+        compiled['html_block_end'] = [re.compile(r) for r in end]
+        # The blocks that can contain blank lines, for the mmap engine.
+        compiled['html_block_verbatim'] = [
+            (re.compile(start[i].encode('UTF-8')),
+             re.compile(end[i].encode('UTF-8'))) for i in range(0, len(end))
+        ]
+    if parser in [
+            'github', 'cmark', 'gitlab', 'commonmarker', 'goldmark',
+            'redcarpet'
+    ]:
+        # Characters which start emphasis, code spans, links, images, HTML,
+        # entities, escapes and line breaks. See SPECIAL_CHARS in
+        # _cmark_subject_find_special_char.
+        compiled['inline_special_chars'] = re.compile(r'[\r\n`\\&_*\[\]<]')
+
+    return compiled
+
+
 def tocs_equal(current_toc: str, filename: str, marker: str) -> bool:
     r"""Check if the TOC already present in a file is the samw of the one passed to this function.
 
@@ -86,8 +183,12 @@ def write_string_on_file_between_markers(
     :type newline_string: str
     :returns: ``True`` if new TOC is the same as the exising one, ``False`` otherwise.
     :rtype: bool
-    :raises: StdinIsNotAFileToBeWritten or an fpyutils exception
-         or a built-in exception.
+    :raises: StdinIsNotAFileToBeWritten or a built-in exception.
+
+    .. note:: The file is read once and, if its content changes, it is
+         replaced atomically. All the newlines of the file are changed to
+         ``newline_string``. Files without markers or with the same
+         content are not written so their modification time does not change.
     """
     if filename == '-':
         raise StdinIsNotAFileToBeWritten
@@ -98,6 +199,8 @@ def write_string_on_file_between_markers(
         string.rstrip(), newline_string, newline_string, marker, newline_string
     ])
 
+    content, lines = generic._read_lines(filename)
+
     (
         old_toc,
         lines_to_delete,
@@ -105,29 +208,45 @@ def write_string_on_file_between_markers(
         marker_line_positions_length,
         marker_line_positions,
         first_marker_line_number,
-    ) = generic._get_existing_toc(filename, marker)
+    ) = generic._get_existing_toc_in_lines(lines, marker)
 
     equal: bool = False
     if string.strip() == old_toc:
         equal = True
 
-    generic._remove_line_intervals(filename, lines_to_delete)
+    # No markers: nothing to do.
+    if len(marker_line_positions) == 0:
+        return equal
+
+    # Line numbers start from 1.
+    for interval in lines_to_delete:
+        del lines[interval[0] - 1:interval[1]]
 
     # Only 1 pre-existing marker.
     if not two_or_more_markers and marker_line_positions_length == 1:
-        generic._remove_line_intervals(
-            filename, [[marker_line_positions[1], marker_line_positions[1]]])
+        del lines[marker_line_positions[1] - 1]
 
     # 2 or more pre-existing markers.
     if marker_line_positions_length >= 1:
-        fpyutils.filelines.insert_string_at_line(
-            filename,
-            final_toc_string,
-            first_marker_line_number,
-            filename,
-            append=False,
-            newline_character=newline_string,
-        )
+        # Fill the lines out of the file bounds.
+        while len(lines) < first_marker_line_number - 1:
+            lines.append(newline_string)
+        lines.insert(first_marker_line_number - 1, final_toc_string)
+
+    # Encode and translate the newlines in the same way a file opened
+    # with newline=newline_string does.
+    buffer = io.BytesIO()
+    with io.TextIOWrapper(
+            buffer,
+            encoding=locale.getpreferredencoding(False),
+            newline=newline_string,
+            write_through=True,
+    ) as f:
+        f.write(''.join(lines))
+        new_content: bytes = buffer.getvalue()
+
+    if new_content != content:
+        generic._write_file_atomically(filename, new_content)
 
     return equal
 
@@ -154,10 +273,10 @@ def write_strings_on_files_between_markers(
     :returns: ``True`` if all TOCs are the same as the existing ones, ``False``
          otherwise.
     :rtype: bool
-    :raises: an fpyutils exception or a built-in exception.
+    :raises: a built-in exception.
     """
     if not len(filenames) == len(strings):
-        raise ValueError
+        raise ValueError('there must be one string for each file')
 
     file_id: int = 0
     equal: bool = True
@@ -169,6 +288,1031 @@ def write_strings_on_files_between_markers(
     return equal
 
 
+def _get_reference_map(
+        filename: str,
+        parser: str = 'github') -> references_h._cmarkCmarkReferenceMap:
+    # Collect the link reference definitions of a file so that headers
+    # can use them, wherever they are.
+    #
+    # Like cmark, definitions are only searched at the start of paragraphs
+    # and outside fenced code blocks. Other block structures, like indented
+    # code blocks and HTML blocks, are not detected.
+    refmap = references_h._cmarkCmarkReferenceMap()
+    if parser not in ['github', 'cmark', 'gitlab', 'commonmarker', 'goldmark']:
+        return refmap
+
+    # Same limit as cmark.
+    refmap.max_ref_size = max(os.stat(filename).st_size, 100000)
+
+    compiled: dict = _get_compiled_re(parser)
+    is_within_code_fence: bool = False
+    code_fence: str = None
+    is_paragraph_start: bool = True
+    with open(filename, newline=None) as f:
+        lines: typing.Iterator[str] = iter(f)
+        # A definition can span at most three lines: label, destination
+        # and title.
+        window: list[str] = list()
+        while True:
+            window.extend(itertools.islice(lines, 3 - len(window)))
+            if len(window) == 0:
+                break
+
+            line: str = window[0]
+            consumed: int = 1
+            if is_within_code_fence:
+                is_within_code_fence = not is_closing_code_fence(
+                    line, code_fence,
+                    len(window) == 1, parser)
+                is_paragraph_start = not is_within_code_fence
+            elif line.strip(' \t\n') == '' or compiled['atx_heading'].match(
+                    line):
+                is_paragraph_start = True
+            elif (is_paragraph_start
+                  and compiled['link_reference_definition'].match(line)):
+                text: str = ''.join(window)
+                if not text.endswith('\n'):
+                    text += '\n'
+                pos: int = inlines_c._cmark_cmark_parse_reference_inline(
+                    None, chunk_h._cmarkCmarkChunk(text, len(text)), refmap)
+                if pos > 0:
+                    # The definition ends with a newline.
+                    consumed = text.count('\n', 0, pos)
+                else:
+                    is_paragraph_start = False
+            else:
+                code_fence = is_opening_code_fence(line, parser)
+                is_within_code_fence = code_fence is not None
+                is_paragraph_start = False
+
+            del window[:consumed]
+
+    return refmap
+
+
+def _get_mmap_first_chars(parser: str) -> bytes:
+    return ''.join([
+        '#', '=', '-', '<', md_parser['github']['code_fence']['marker']
+        ['backtick'], md_parser['github']['code_fence']['marker']['tilde']
+    ] + [d[0]
+         for d in md_parser[parser]['front_matter']['delimiters']]).encode(
+             'UTF-8')
+
+
+def iter_headers(
+    filename_or_stream: str | typing.TextIO,
+    keep_header_levels: int = 3,
+    parser: str = 'github',
+    no_links: bool = False,
+    skip_lines: int = 0,
+    engine: str = common_defaults['engine'],
+) -> typing.Iterator[types.HeaderWithLineNumber]:
+    r"""Iterate over the headers of a file that would end up in its TOC.
+
+    :parameter filename_or_stream: the file that needs to be read, ``-``
+        for stdin, or an open text stream. Streams are not closed.
+    :parameter keep_header_levels: the maximum level of headers to be
+        considered as such. Defaults to ``3``.
+    :parameter parser: decides rules on how to generate anchor links.
+        Defaults to ``github``.
+    :parameter no_links: disables the use of links.
+        Defaults to ``False``.
+    :parameter skip_lines: the number of lines to be skipped from
+        the start of file before parsing. Defaults to ``0``.
+    :parameter engine: the way the file is read. See ``build_toc``.
+        Streams are always read with ``readline``.
+        Defaults to ``readline``.
+    :type filename_or_stream: typing.Union[str, typing.TextIO]
+    :type keep_header_levels: int
+    :type parser: str
+    :type no_links: bool
+    :type skip_lines: int
+    :type engine: str
+    :returns: a generator of headers. Lines are read only when the next
+        header is requested.
+    :rtype: typing.Iterator[types.HeaderWithLineNumber]
+    :raises: a built-in exception.
+
+    .. note:: Headers that are not visible are still used to compute the
+        anchor link duplicates but they are not yielded.
+
+    :Example:
+
+    >>> import md_toc # doctest: +SKIP
+    >>> with open('foo.md', 'w') as f: # doctest: +SKIP
+    ...     f.write('# This\n# Is an\n## Example\n') # doctest: +SKIP
+    26
+    >>> [h['text_anchor_link'] for h in md_toc.api.iter_headers('foo.md')] # doctest: +SKIP
+    ['this', 'is-an', 'example']
+    """
+    if not skip_lines >= 0:
+        raise ValueError('skip_lines must be a non-negative integer: ' +
+                         repr(skip_lines))
+    if engine not in common_defaults['engines']:
+        raise ValueError('engine must be one of ' +
+                         ', '.join(common_defaults['engines']) + ': ' +
+                         repr(engine))
+
+    header_duplicate_counter: types.HeaderDuplicateCounter = {}
+    has_duplicates: bool = parser in [
+        'github', 'cmark', 'gitlab', 'commonmarker', 'goldmark'
+    ]
+
+    # Streams cannot be read twice so their headers do not use the link
+    # reference definitions.
+    refmap_filename: str | None = None
+    if isinstance(filename_or_stream, str) and filename_or_stream != '-':
+        refmap_filename = filename_or_stream
+    for header in _iter_headers_in_lines(
+            _skip_front_matter(
+                _readlines(filename_or_stream, [parser], skip_lines, engine),
+                parser),
+            keep_header_levels,
+            parser,
+            no_links,
+            _get_block_state(),
+            refmap_filename,
+    ):
+        if has_duplicates:
+            header['text_anchor_link'] = _add_duplicate_suffix(
+                header['text_anchor_link'], header_duplicate_counter)
+        if header['visible']:
+            yield header
+
+
+def _readlines(
+    filename_or_stream: str | typing.TextIO,
+    parsers: list[str],
+    skip_lines: int,
+    engine: str,
+) -> typing.Iterator[tuple[int, str, bool]]:
+    # Yield the lines of a file that may change the headers found by any
+    # of the parsers, see iter_headers.
+    #
+    # Document ending detection.
+    #
+    # Each line is paired with a flag telling if it is the last one. This
+    # changes the state of is_within_code_fence if the
+    # file has no closing fence markers. This serves no practial
+    # purpose since the code would run correctly anyway. It is
+    # however more semantically correct.
+    #
+    # See the unit tests (examples 95 and 96 of the github parser)
+    # and the is_closing_code_fence function.
+    lines: typing.Iterator[tuple[int, str, bool]]
+    f = None
+    close_f: bool = False
+    if not isinstance(filename_or_stream, str):
+        f = filename_or_stream
+    elif filename_or_stream == '-':
+        f = sys.stdin
+    elif engine in ['mmap', 'numpy']:
+        # Lines that do not start with these characters, after the
+        # allowed indentation, can neither be headings, setext heading
+        # underlines, code fences, HTML blocks nor front matter delimiters
+        # so they do not change the result, unless they are in the same
+        # paragraph as one of those lines: the paragraph decides if the
+        # line is a heading, so it is returned too.
+        first_chars: bytes = bytes(
+            dict.fromkeys(b''.join([_get_mmap_first_chars(p)
+                                    for p in parsers])))
+        # HTML blocks ending with a string instead of a blank line.
+        blocks: list[tuple[re.Pattern, re.Pattern]] = list()
+        for p in parsers:
+            for b in _get_compiled_re(p).get('html_block_verbatim', list()):
+                if b not in blocks:
+                    blocks.append(b)
+        lines = generic._mmap_readlines_with_lookahead(
+            filename_or_stream,
+            first_chars,
+            md_parser['github']['header']['max_space_indentation'],
+            skip_lines,
+            first_chars,
+            blocks if len(blocks) > 0 else None,
+            vectorized=engine == 'numpy',
+        )
+    else:
+        # When reading input from the stream,
+        # if newline is None, universal newlines mode is enabled.
+        # Lines in the input can end in '\n', '\r', or '\r\n',
+        # and these are translated into '\n' before being returned to the caller.
+        # See
+        # https://docs.python.org/3/library/functions.html#open-newline-parameter
+        f = open(filename_or_stream, newline=None)
+        close_f = True
+
+    try:
+        if f is not None:
+            line_counter: int = 0
+            while line_counter < skip_lines and f.readline() != '':
+                line_counter += 1
+            lines = generic._readlines_with_lookahead(f, line_counter + 1)
+
+        yield from lines
+
+    finally:
+        if close_f:
+            f.close()
+
+
+def _get_block_state(is_within_code_fence: bool = False,
+                     code_fence: str | None = None,
+                     html_block_type: int | None = None) -> dict:
+    # The blocks which are open at the start of a line and that can
+    # contain blank lines.
+    return {
+        'is_within_code_fence': is_within_code_fence,
+        'code_fence': code_fence,
+        'html_block_type': html_block_type,
+    }
+
+
+def _iter_headers_in_lines(
+    lines: typing.Iterator[tuple[int, str, bool]],
+    keep_header_levels: int,
+    parser: str,
+    no_links: bool,
+    block_state: dict,
+    refmap_filename: str | None = None,
+) -> typing.Iterator[types.HeaderWithLineNumber]:
+    # Yield all the headers, visible or not, with anchor links without the
+    # duplicate suffix. The link reference definitions of refmap_filename
+    # are used if it is not None. block_state is the one of
+    # _get_block_state and it is updated with the blocks still open after
+    # the last line.
+    #
+    # Built when the first header that may contain a link is found.
+    refmap: references_h._cmarkCmarkReferenceMap = None
+
+    is_within_code_fence: bool = block_state['is_within_code_fence']
+    code_fence: str | None = block_state['code_fence']
+    html_block_type: int | None = block_state['html_block_type']
+    # The lines of the current paragraph, which become a setext heading
+    # if an underline follows.
+    paragraph: list[str] = list()
+    # Paragraphs in block quotes and list items are not headings, and
+    # neither are their lazy continuation lines.
+    is_lazy_paragraph: bool = False
+    previous_line_number: int = 0
+    for line_number, line, is_document_end in lines:
+        # The mmap engine skips blank lines and the lines which are not
+        # part of the paragraph.
+        if line_number != previous_line_number + 1:
+            paragraph = list()
+            is_lazy_paragraph = False
+            if html_block_type is not None and html_block_type >= 6:
+                html_block_type = None
+        previous_line_number = line_number
+
+        # Headings are not searched in HTML blocks and code blocks.
+        if html_block_type is not None:
+            if is_closing_html_block(line, html_block_type, parser):
+                html_block_type = None
+            continue
+
+        # Code fence detection.
+        if is_within_code_fence:
+            is_within_code_fence = not is_closing_code_fence(
+                line,
+                code_fence,
+                is_document_end,
+                parser,
+            )
+        else:
+            code_fence = is_opening_code_fence(line, parser)
+            if code_fence is not None:
+                # Update the status of the next line.
+                is_within_code_fence = True
+
+        if is_within_code_fence:
+            paragraph = list()
+            is_lazy_paragraph = False
+
+        if not is_within_code_fence or code_fence is None:
+            is_continuation: bool = len(paragraph) > 0 or is_lazy_paragraph
+            html_block_type = is_opening_html_block(line, is_continuation,
+                                                    parser)
+            if html_block_type is not None:
+                paragraph = list()
+                is_lazy_paragraph = False
+                if is_closing_html_block(line, html_block_type, parser):
+                    html_block_type = None
+                continue
+            if is_indented_code_line(line, is_continuation, parser):
+                continue
+
+            # Link reference definitions can be anywhere in the file.
+            # They are used only when brackets are not escaped.
+            if (refmap is None and no_links and '[' in line
+                    and line.lstrip(' ').startswith('#')
+                    and refmap_filename is not None):
+                refmap = _get_reference_map(refmap_filename, parser)
+
+            setext_header_type: int | None = None
+            if len(paragraph) > 0:
+                setext_header_type = is_setext_heading_underline(line, parser)
+
+            header: types.Header
+            if setext_header_type is not None:
+                if (refmap is None and no_links and '[' in ''.join(paragraph)
+                        and refmap_filename is not None):
+                    refmap = _get_reference_map(refmap_filename, parser)
+                r = get_setext_heading(paragraph, setext_header_type,
+                                       keep_header_levels, parser, no_links)
+                header = {
+                    'header_type':
+                    r['header_type'],
+                    'text_original':
+                    r['header_text_trimmed'],
+                    'text_anchor_link':
+                    build_anchor_link(r['header_text_trimmed'], dict(), parser,
+                                      refmap),
+                    'visible':
+                    r['visible'],
+                }
+                # The heading starts with the paragraph.
+                line_number -= len(paragraph)
+                paragraph = list()
+            else:
+                # Header detection and gathering.
+                # We only need to get the first element since all the
+                # lines have been already separated here.
+                header = get_md_header(
+                    line,
+                    dict(),
+                    keep_header_levels,
+                    parser,
+                    no_links,
+                    refmap,
+                )[0]
+
+                if header is None and is_paragraph_line(
+                        line, is_continuation, parser):
+                    if not is_lazy_paragraph:
+                        paragraph.append(line)
+                    if len(paragraph) > common_defaults['max_paragraph_lines']:
+                        # Like a lazy paragraph, the rest of the lines are
+                        # not kept.
+                        paragraph = list()
+                        is_lazy_paragraph = True
+                else:
+                    paragraph = list()
+                    is_lazy_paragraph = False
+                    content: str | None = line
+                    if header is None:
+                        while content is not None and not is_lazy_paragraph:
+                            content = _get_container_content(content, parser)
+                            is_lazy_paragraph = (content is not None
+                                                 and is_paragraph_line(
+                                                     content, False, parser))
+
+            # Ignore invalid headers.
+            if header is not None:
+                header['line_number'] = line_number
+                yield header
+
+    block_state['is_within_code_fence'] = is_within_code_fence
+    block_state['code_fence'] = code_fence
+    block_state['html_block_type'] = html_block_type
+
+
+def _get_chunk_headers(
+    filename: str,
+    start: int,
+    end: int | None,
+    keep_header_levels: int,
+    parser: str,
+    no_links: bool,
+    skip_lines: int,
+    engine: str,
+    block_state: dict,
+) -> tuple[list[types.HeaderWithLineNumber], int, dict]:
+    # Get the headers of the lines between the start and end byte offsets
+    # of a file, like _iter_headers_in_lines, with line numbers relative to
+    # start, the number of lines and the blocks open at the end.
+    # Only the first chunk, starting at 0, skips lines and front matter.
+    with open(filename, 'rb') as f:
+        f.seek(start)
+        data: bytes = f.read() if end is None else f.read(end - start)
+    line_count: int = data.count(b'\n') + data.count(b'\r') - data.count(
+        b'\r\n')
+
+    lines: typing.Iterator[tuple[int, str, bool]]
+    if engine in ['mmap', 'numpy']:
+        first_chars: bytes = _get_mmap_first_chars(parser)
+        block_end: re.Pattern | None = None
+        if block_state['html_block_type'] is not None:
+            block_end = _get_compiled_re(parser)['html_block_verbatim'][
+                block_state['html_block_type'] - 1][1]
+        lines = generic._mmap_readlines_with_lookahead(
+            filename,
+            first_chars,
+            md_parser['github']['header']['max_space_indentation'],
+            skip_lines,
+            first_chars,
+            _get_compiled_re(parser).get('html_block_verbatim'),
+            start,
+            end,
+            block_end,
+            engine == 'numpy',
+        )
+    else:
+        # See iter_headers.
+        s = io.StringIO(data.decode(locale.getpreferredencoding(False)),
+                        newline=None)
+        line_counter: int = 0
+        while line_counter < skip_lines and s.readline() != '':
+            line_counter += 1
+        lines = generic._readlines_with_lookahead(s, line_counter + 1)
+        if end is not None:
+            # The last line of the chunk is not the last of the file.
+            lines = ((n, line, False) for n, line, _ in lines)
+
+    if start == 0:
+        lines = _skip_front_matter(lines, parser)
+    headers: list[types.HeaderWithLineNumber] = list(
+        _iter_headers_in_lines(
+            lines,
+            keep_header_levels,
+            parser,
+            no_links,
+            block_state,
+        ))
+
+    return headers, line_count, block_state
+
+
+def _iter_headers_in_chunks(
+    filename: str,
+    keep_header_levels: int,
+    parser: str,
+    no_links: bool,
+    skip_lines: int,
+    engine: str,
+    jobs: int,
+) -> typing.Iterator[types.HeaderWithLineNumber]:
+    # Split the file after blank lines: only code fences and HTML blocks
+    # ending with a string can be open at the start of the next line.
+    # Every chunk is read by a worker process as if no block was open.
+    # The chunks are then checked in order: if a block is open at the
+    # start of one, it is read again by this process, knowing the block.
+    # Duplicate suffixes and link reference definitions, which depend on
+    # the previous chunks and on the whole file, are applied at the end.
+    number_of_chunks: int = min(
+        jobs * 4,
+        os.path.getsize(filename) // common_defaults['min_chunk_size'])
+    chunks: list[tuple[int, int | None]] = [(0, None)]
+    if number_of_chunks >= 2:
+        # The front matter must be in the first chunk.
+        first_chunk_end: re.Pattern | None = None
+        delimiters: list[str] = md_parser[parser]['front_matter']['delimiters']
+        if skip_lines == 0 and len(delimiters) > 0:
+            # See _skip_front_matter. A lone \r must not be followed by \n,
+            # otherwise \r\n could also be read as two line endings and
+            # the regular expression would backtrack exponentially.
+            front_matter_lines: bytes = (
+                b'(?:[^\r\n]*(?:\r\n|\r(?!\n)|\n)){0,%d}?' %
+                common_defaults['max_front_matter_lines'])
+            first_chunk_end = re.compile(b'\\A(?:' + b'|'.join([
+                re.escape(d.encode('UTF-8')) + b'[ \t]*(?:\r\n|\r|\n)' +
+                front_matter_lines + re.escape(d.encode('UTF-8')) +
+                b'[ \t]*(?![^\r\n])' for d in delimiters
+            ]) + b')')
+        chunks = generic._mmap_split_after_blank_lines(filename,
+                                                       number_of_chunks,
+                                                       skip_lines,
+                                                       first_chunk_end)
+
+    results: list[tuple[list[types.HeaderWithLineNumber], int, dict]] = list()
+    if len(chunks) >= 2:
+        try:
+            with concurrent.futures.ProcessPoolExecutor(
+                    max_workers=jobs) as ex:
+                futures: list[concurrent.futures.Future] = [
+                    ex.submit(_get_chunk_headers, filename, start, end,
+                              keep_header_levels, parser, no_links,
+                              skip_lines if start == 0 else 0, engine,
+                              _get_block_state()) for start, end in chunks
+                ]
+                block_state: dict = _get_block_state()
+                for (start, end), future in zip(chunks, futures):
+                    if block_state == _get_block_state():
+                        results.append(future.result())
+                    else:
+                        future.cancel()
+                        results.append(
+                            _get_chunk_headers(filename, start, end,
+                                               keep_header_levels, parser,
+                                               no_links, 0, engine,
+                                               block_state))
+                    block_state = results[-1][2]
+                    # The last code fence is kept even after it is closed.
+                    if not block_state['is_within_code_fence']:
+                        block_state['code_fence'] = None
+                    # A blank line closes the other HTML blocks.
+                    if (block_state['html_block_type'] is not None
+                            and block_state['html_block_type'] >= 6):
+                        block_state['html_block_type'] = None
+        except Exception:
+            # Read the file again so that the error, if any, is the same:
+            # the text stream of iter_headers, for example, finds
+            # undecodable bytes ahead of the current line.
+            results = list()
+
+    if len(results) == 0:
+        yield from iter_headers(filename, keep_header_levels, parser, no_links,
+                                skip_lines, engine)
+        return
+
+    refmap: references_h._cmarkCmarkReferenceMap = None
+    header_duplicate_counter: types.HeaderDuplicateCounter = {}
+    has_duplicates: bool = parser in [
+        'github', 'cmark', 'gitlab', 'commonmarker', 'goldmark'
+    ]
+    line_offset: int = 0
+    for headers, line_count, _ in results:
+        for header in headers:
+            if no_links and '[' in header['text_original']:
+                if refmap is None:
+                    refmap = _get_reference_map(filename, parser)
+                header['text_anchor_link'] = build_anchor_link(
+                    header['text_original'], dict(), parser, refmap)
+            if has_duplicates:
+                header['text_anchor_link'] = _add_duplicate_suffix(
+                    header['text_anchor_link'], header_duplicate_counter)
+            if header['visible']:
+                header['line_number'] += line_offset
+                yield header
+        line_offset += line_count
+
+
+def _iter_toc_lines(
+    headers: typing.Iterator[types.Header],
+    parser: str,
+    no_links: bool,
+    list_marker: str,
+    ordered: bool,
+    no_indentation: bool,
+    no_list_coherence: bool,
+    constant_ordered_list: bool,
+    newline_string: str,
+) -> typing.Iterator[str]:
+    # Yield the lines of the TOC one by one, see build_toc. Each line
+    # is built only when it is requested.
+    header_type_counter: types.HeaderTypeCounter = {}
+    header_type_curr: int = 0
+    header_type_prev: int = 0
+    header_type_first: int = 0
+
+    # Help the developers: override the list_marker in case
+    # this function is called with the default unordered list marker,
+    # for example like this:
+    # print(md_toc.build_toc('test.md', ordered=True))
+    # This avoids an AssertionError later on.
+    if (ordered and list_marker
+            == md_parser[parser]['list']['unordered']['default_marker']):
+        list_marker = md_parser[parser]['list']['ordered'][
+            'default_closing_marker']
+    if constant_ordered_list:
+        ordered = True
+    if ordered and (
+            list_marker is None or list_marker
+            not in md_parser[parser]['list']['ordered']['closing_markers']):
+        list_marker = md_parser[parser]['list']['ordered'][
+            'default_closing_marker']
+
+    indentation_log: dict[types.IndentationLogElement] = init_indentation_log(
+        parser, list_marker)
+    for header in headers:
+        header_type_curr = header['header_type']
+
+        # Take care of the ordered TOC.
+        if ordered and not constant_ordered_list:
+            increase_index_ordered_list(
+                header_type_counter,
+                header_type_prev,
+                header_type_curr,
+                parser,
+            )
+            index = header_type_counter['h' + str(header_type_curr)]
+        else:
+            # This value should work on most parsers.
+            index = 1
+
+        # Take care of list indentations.
+        if no_indentation:
+            no_of_indentation_spaces_curr = 0
+            # TOC list coherence checks are not necessary
+            # without indentation.
+        else:
+            if not no_list_coherence:
+                # In-place list coherence checks can be made using only
+                # the first, current and previous header types.
+                if header_type_first == 0:
+                    header_type_first = header_type_curr
+                if header_type_prev == 0:
+                    header_type_prev = header_type_curr
+                if (header_type_curr < header_type_first
+                        or header_type_curr > header_type_prev + 1):
+                    raise TocDoesNotRenderAsCoherentList
+
+            compute_toc_line_indentation_spaces(
+                header_type_curr,
+                header_type_prev,
+                parser,
+                ordered,
+                list_marker,
+                indentation_log,
+                index,
+            )
+            no_of_indentation_spaces_curr = indentation_log[header_type_curr][
+                'indentation_spaces']
+
+        # endif
+
+        # Build a single TOC line.
+        toc_line_no_indent = build_toc_line_without_indentation(
+            header,
+            ordered,
+            no_links,
+            index,
+            parser,
+            list_marker,
+        )
+
+        # Yield the TOC line with the indentation.
+        yield ''.join([
+            build_toc_line(
+                toc_line_no_indent,
+                no_of_indentation_spaces_curr,
+            ), newline_string
+        ])
+
+        header_type_prev = header_type_curr
+
+    # endfor
+
+
+class Toc():
+    r"""The headers of a file, stored as a tree, that can be rendered as TOCs.
+
+    Entries are kept in the order of the file. Each field of the entries
+    is stored in its own list or array: use ``toc[i]`` to get the entry at
+    position ``i`` as a ``types.TocEntry`` object.
+
+    :parameter parser: the parser used to read the headers.
+    :parameter no_links: if the headers were read without links.
+    :type parser: str
+    :type no_links: bool
+
+    :Example:
+
+    >>> import md_toc # doctest: +SKIP
+    >>> toc = md_toc.api.get_toc('foo.md') # doctest: +SKIP
+    >>> print(toc.render(ordered=True), end='') # doctest: +SKIP
+    1. [This](#this)
+    2. [Is an](#is-an)
+       1. [Example](#example)
+    >>> [e['text_original'] for e in toc] # doctest: +SKIP
+    ['This', 'Is an', 'Example']
+    """
+
+    __slots__ = ('parser', 'no_links', 'levels', 'texts', 'anchors', 'indices',
+                 'line_numbers', 'parents', '_counters', '_ancestors')
+
+    def __init__(self, parser: str = 'github', no_links: bool = False):
+        r"""Create an empty TOC."""
+        self.parser: str = parser
+        self.no_links: bool = no_links
+        self.levels: array.array = array.array('B')
+        self.texts: list[str] = list()
+        self.anchors: list[str] = list()
+        self.indices: array.array = array.array('q')
+        self.line_numbers: array.array = array.array('q')
+        self.parents: array.array = array.array('q')
+        # The last index of each level and the positions of the entries
+        # that can be the parent of the next one.
+        self._counters: list[int] = [0] * (
+            md_parser[parser]['header']['max_levels'] + 1)
+        self._ancestors: list[int] = list()
+
+    def __len__(self) -> int:
+        r"""Get the number of entries."""
+        return len(self.levels)
+
+    def __getitem__(self, position: int) -> types.TocEntry:
+        r"""Get a single entry."""
+        return {
+            'header_type': self.levels[position],
+            'text_original': self.texts[position],
+            'text_anchor_link': self.anchors[position],
+            'visible': True,
+            'line_number': self.line_numbers[position],
+            'index': self.indices[position],
+            'parent': self.parents[position],
+        }
+
+    def __iter__(self) -> typing.Iterator[types.TocEntry]:
+        r"""Iterate over the entries in the order of the file."""
+        for position in range(0, len(self)):
+            yield self[position]
+
+    def append(self, header: types.HeaderWithLineNumber):
+        r"""Add a header after the last entry.
+
+        :parameter header: a visible header, as returned by ``iter_headers``.
+        :type header: types.HeaderWithLineNumber
+        :returns: None
+        :rtype: None
+        :raises: a built-in exception.
+        """
+        level: int = header['header_type']
+        # Same as increase_index_ordered_list.
+        if len(self) == 0 or self.levels[-1] < level:
+            self._counters[level] = 0
+        self._counters[level] += 1
+
+        while (len(self._ancestors) > 0
+               and self.levels[self._ancestors[-1]] >= level):
+            self._ancestors.pop()
+        if len(self._ancestors) > 0:
+            self.parents.append(self._ancestors[-1])
+        else:
+            self.parents.append(-1)
+        self._ancestors.append(len(self))
+
+        self.levels.append(level)
+        self.texts.append(header['text_original'])
+        self.anchors.append(header['text_anchor_link'])
+        self.indices.append(self._counters[level])
+        self.line_numbers.append(header['line_number'])
+
+    def children(self, position: int = -1) -> list[int]:
+        r"""Get the positions of the children of an entry.
+
+        :parameter position: the position of the entry. Defaults to ``-1``,
+            i.e. the top level entries.
+        :type position: int
+        :returns: the positions, in the order of the file.
+        :rtype: list[int]
+        :raises: a built-in exception.
+        """
+        return [i for i, p in enumerate(self.parents) if p == position]
+
+    def render(
+        self,
+        list_marker: str = '-',
+        ordered: bool = False,
+        no_indentation: bool = False,
+        no_list_coherence: bool = False,
+        constant_ordered_list: bool = False,
+        newline_string: str = common_defaults['newline_string'],
+    ) -> str:
+        r"""Render the entries as a markdown list.
+
+        :parameter list_marker: a string that contains some of the first
+            characters of the list element. Defaults to ``-``.
+        :parameter ordered: decides whether to build an ordered list or not.
+            Defaults to ``False``.
+        :parameter no_indentation: disables indentation in the list.
+            Defaults to ``False``.
+        :parameter no_list_coherence: if set to ``False`` checks
+            header levels for consecutiveness, see ``build_toc``.
+            Defaults to ``False``.
+        :parameter constant_ordered_list: use a single integer
+            as list marker. This sets ordered to ``True``.
+        :parameter newline_string: the newline separator.
+            Defaults to ``os.linesep``.
+        :type list_marker: str
+        :type ordered: bool
+        :type no_indentation: bool
+        :type no_list_coherence: bool
+        :type constant_ordered_list: bool
+        :type newline_string: str
+        :returns: toc, the table of contents.
+        :rtype: str
+        :raises: GithubOverflowOrderedListMarker,
+            TocDoesNotRenderAsCoherentList or a built-in exception.
+        """
+        return ''.join(
+            _iter_toc_lines(iter(self), self.parser, self.no_links,
+                            list_marker, ordered, no_indentation,
+                            no_list_coherence, constant_ordered_list,
+                            newline_string))
+
+
+def get_toc(
+    filename: str,
+    keep_header_levels: int = 3,
+    parser: str = 'github',
+    no_links: bool = False,
+    skip_lines: int = 0,
+    engine: str = common_defaults['engine'],
+    jobs: int = 1,
+) -> Toc:
+    r"""Read the headers of a single file once so they can be rendered later.
+
+    :parameter filename: the file that needs to be read.
+    :parameter keep_header_levels: the maximum level of headers to be
+        considered as such when building the table of contents.
+        Defaults to ``3``.
+    :parameter parser: decides rules on how to generate anchor links.
+        Defaults to ``github``.
+    :parameter no_links: disables the use of links.
+        Defaults to ``False``.
+    :parameter skip_lines: the number of lines to be skipped from
+        the start of file before parsing for table of contents.
+        Defaults to ``0```.
+    :parameter engine: the way the file is read, see ``build_toc``.
+        Defaults to ``readline``.
+    :parameter jobs: the number of worker processes used to read chunks
+        of the file, see ``build_toc``. Defaults to ``1``.
+    :type filename: str
+    :type keep_header_levels: int
+    :type parser: str
+    :type no_links: bool
+    :type skip_lines: int
+    :type engine: str
+    :type jobs: int
+    :returns: toc, the headers of the file.
+    :rtype: Toc
+    :raises: a built-in exception.
+
+    .. note:: The TOC of ``build_toc`` is the one of ``Toc.render`` with
+        the same options.
+    """
+    toc: Toc = Toc(parser, no_links)
+    for header in _get_toc_headers(filename, keep_header_levels, parser,
+                                   no_links, skip_lines, engine, jobs):
+        toc.append(header)
+
+    return toc
+
+
+def _get_toc_headers(
+    filename: str,
+    keep_header_levels: int,
+    parser: str,
+    no_links: bool,
+    skip_lines: int,
+    engine: str,
+    jobs: int,
+) -> typing.Iterator[types.HeaderWithLineNumber]:
+    # The headers of the TOC of a file, read by this process or by worker
+    # processes depending on jobs. See build_toc.
+    if not skip_lines >= 0:
+        raise ValueError('skip_lines must be a non-negative integer: ' +
+                         repr(skip_lines))
+    if engine not in common_defaults['engines']:
+        raise ValueError('engine must be one of ' +
+                         ', '.join(common_defaults['engines']) + ': ' +
+                         repr(engine))
+    if not jobs >= 0:
+        raise ValueError('jobs must be a non-negative integer: ' + repr(jobs))
+
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+
+    if jobs == 1 or filename == '-':
+        return iter_headers(filename, keep_header_levels, parser, no_links,
+                            skip_lines, engine)
+    return _iter_headers_in_chunks(filename, keep_header_levels, parser,
+                                   no_links, skip_lines, engine, jobs)
+
+
+def _get_block_rules(parser: str) -> str:
+    # Parsers following the same CommonMark version find the same blocks,
+    # apart from the front matter. See get_atx_heading.
+    if parser in ['github', 'commonmarker']:
+        return 'github'
+    elif parser in ['cmark', 'gitlab', 'goldmark']:
+        return 'cmark'
+    return parser
+
+
+def get_tocs_for_parsers(
+    filename: str,
+    parsers: list[str],
+    keep_header_levels: int = 3,
+    no_links: bool = False,
+    skip_lines: int = 0,
+    engine: str = common_defaults['engine'],
+) -> list[Toc]:
+    r"""Read the headers of a single file once for several parsers.
+
+    :parameter filename: the file that needs to be read.
+    :parameter parsers: the parsers deciding the rules on how to find the
+        headers and to generate anchor links.
+    :parameter keep_header_levels: the maximum level of headers to be
+        considered as such when building the table of contents.
+        Defaults to ``3``.
+    :parameter no_links: disables the use of links.
+        Defaults to ``False``.
+    :parameter skip_lines: the number of lines to be skipped from
+        the start of file before parsing for table of contents.
+        Defaults to ``0```.
+    :parameter engine: the way the file is read, see ``build_toc``.
+        Defaults to ``readline``.
+    :type filename: str
+    :type parsers: list
+    :type keep_header_levels: int
+    :type no_links: bool
+    :type skip_lines: int
+    :type engine: str
+    :returns: tocs, the headers of the file for each parser, in the same
+        order.
+    :rtype: list[Toc]
+    :raises: a built-in exception.
+
+    .. note:: The file is read once. Parsers that follow the same CommonMark
+        version, and that agree on the front matter of the file, also find
+        the blocks once: only the anchor links are computed for each of
+        them. For example ``cmark``, ``gitlab`` and ``goldmark`` share the
+        same blocks unless the file starts with a front matter, but
+        ``github`` follows an older version than ``gitlab``.
+    """
+    if not skip_lines >= 0:
+        raise ValueError('skip_lines must be a non-negative integer: ' +
+                         repr(skip_lines))
+    if engine not in common_defaults['engines']:
+        raise ValueError('engine must be one of ' +
+                         ', '.join(common_defaults['engines']) + ': ' +
+                         repr(engine))
+
+    unique_parsers: list[str] = list(dict.fromkeys(parsers))
+    lines: typing.Iterator[tuple[int, str,
+                                 bool]] = _readlines(filename, unique_parsers,
+                                                     skip_lines, engine)
+    first: tuple[int, str, bool] | None = next(lines, None)
+    if first is not None:
+        lines = itertools.chain([first], lines)
+
+    # Parsers with the same blocks, the first one finds them.
+    groups: dict[tuple[str, str | None], list[str]] = dict()
+    for parser in unique_parsers:
+        delimiter: str | None = None
+        if first is not None and first[0] == 1:
+            delimiter = is_opening_front_matter(first[1], parser)
+        groups.setdefault((_get_block_rules(parser), delimiter),
+                          list()).append(parser)
+
+    refmap_filename: str | None = None
+    if filename != '-':
+        refmap_filename = filename
+    scans: list[typing.Iterator[types.HeaderWithLineNumber]] = [
+        _iter_headers_in_lines(
+            _skip_front_matter(group_lines, group[0]),
+            keep_header_levels,
+            group[0],
+            no_links,
+            _get_block_state(),
+            refmap_filename,
+        ) for group_lines, group in zip(itertools.tee(lines, len(groups)),
+                                        groups.values())
+    ]
+
+    tocs: dict[str, Toc] = {p: Toc(p, no_links) for p in unique_parsers}
+    refmaps: dict[str, references_h._cmarkCmarkReferenceMap] = dict()
+    header_duplicate_counters: dict[str, types.HeaderDuplicateCounter] = {
+        p: dict()
+        for p in unique_parsers
+    }
+    # Go on with the scan which is behind the others so that only the
+    # lines between a header and the next one are kept in memory.
+    last_line_numbers: list[int] = [0] * len(scans)
+    running: list[int] = list(range(0, len(scans)))
+    group_parsers: list[list[str]] = list(groups.values())
+    while len(running) > 0:
+        i: int = min(running, key=lambda i: last_line_numbers[i])
+        header: types.HeaderWithLineNumber | None = next(scans[i], None)
+        if header is None:
+            running.remove(i)
+            continue
+        last_line_numbers[i] = header['line_number']
+
+        for parser in group_parsers[i]:
+            anchor_link: str = header['text_anchor_link']
+            if parser != group_parsers[i][0]:
+                refmap: references_h._cmarkCmarkReferenceMap = None
+                if (no_links and '[' in header['text_original']
+                        and refmap_filename is not None):
+                    if parser not in refmaps:
+                        refmaps[parser] = _get_reference_map(
+                            refmap_filename, parser)
+                    refmap = refmaps[parser]
+                anchor_link = build_anchor_link(header['text_original'],
+                                                dict(), parser, refmap)
+            if parser in [
+                    'github', 'cmark', 'gitlab', 'commonmarker', 'goldmark'
+            ]:
+                anchor_link = _add_duplicate_suffix(
+                    anchor_link, header_duplicate_counters[parser])
+            if header['visible']:
+                tocs[parser].append(dict(header, text_anchor_link=anchor_link))
+
+    return [tocs[p] for p in parsers]
+
+
 def build_toc(
     filename: str,
     ordered: bool = False,
@@ -181,6 +1325,9 @@ def build_toc(
     skip_lines: int = 0,
     constant_ordered_list: bool = False,
     newline_string: str = common_defaults['newline_string'],
+    engine: str = common_defaults['engine'],
+    use_cache: bool = False,
+    jobs: int = 1,
 ) -> str:
     r"""Build the table of contents of a single file.
 
@@ -211,6 +1358,20 @@ def build_toc(
         as list marker. This sets ordered to ``True``.
     :parameter newline_string: the newline separator.
         Defaults to ``os.linesep``.
+    :parameter engine: the way the file is read. ``readline`` reads
+        every line in text mode while ``mmap`` memory maps the file and
+        keeps only the lines that might be ATX headings or code fences.
+        ``numpy`` works like ``mmap`` but finds those lines with numpy,
+        installed with ``md_toc[fast]``, or like ``mmap`` if it is not
+        available. stdin is always read with ``readline``.
+        Defaults to ``readline``.
+    :parameter use_cache: get the TOC from the on-disk cache if the file
+        and the options did not change, and save it there otherwise.
+        stdin is never cached. Defaults to ``False``.
+    :parameter jobs: the number of worker processes used to read chunks
+        of the file. ``0`` uses all the available CPUs. Files smaller than
+        two chunks and stdin are read by the calling process.
+        Defaults to ``1``, i.e. no worker processes.
     :type filename: str
     :type ordered: bool
     :type no_links: bool
@@ -222,6 +1383,9 @@ def build_toc(
     :type skip_lines: int
     :type constant_ordered_list: bool
     :type newline_string: str
+    :type engine: str
+    :type use_cache: bool
+    :type jobs: int
     :returns: toc, the corresponding table of contents of the file.
     :rtype: str
     :raises: a built-in exception.
@@ -229,6 +1393,13 @@ def build_toc(
     .. warning:: In case of ordered TOCs you must explicitly pass one of the
         supported ordered list markers.
 
+    .. note:: All the engines give the same result. ``mmap`` and ``numpy``
+        also decode the lines they skip, so that undecodable bytes give
+        the binary file comment like with ``readline``.
+
+    .. note:: The TOC is the same whatever the number of jobs. See
+        ``common_defaults['min_chunk_size']`` for the size of the chunks.
+
     :Example:
 
     >>> import md_toc # doctest: +SKIP
@@ -241,203 +1412,406 @@ def build_toc(
       - [Example](#example)
     """
     if not skip_lines >= 0:
-        raise ValueError
-
-    toc: list[str] = []
-    header_type_counter: types.HeaderTypeCounter = {}
-    header_type_curr: int = 0
-    header_type_prev: int = 0
-    header_type_first: int = 0
-    header_duplicate_counter: types.HeaderDuplicateCounter = {}
-
-    if filename == '-':
-        f = sys.stdin
-    else:
-        # When reading input from the stream,
-        # if newline is None, universal newlines mode is enabled.
-        # Lines in the input can end in '\n', '\r', or '\r\n',
-        # and these are translated into '\n' before being returned to the caller.
-        # See
-        # https://docs.python.org/3/library/functions.html#open-newline-parameter
-        f = open(filename, newline=None)
-
-    # Help the developers: override the list_marker in case
-    # this function is called with the default unordered list marker,
-    # for example like this:
-    # print(md_toc.build_toc('test.md', ordered=True))
-    # This avoids an AssertionError later on.
-    if (ordered and list_marker
-            == md_parser[parser]['list']['unordered']['default_marker']):
-        list_marker = md_parser[parser]['list']['ordered'][
-            'default_closing_marker']
-    if constant_ordered_list:
-        ordered = True
-    if ordered and (
-            list_marker is None or list_marker
-            not in md_parser[parser]['list']['ordered']['closing_markers']):
-        list_marker = md_parser[parser]['list']['ordered'][
-            'default_closing_marker']
-
-    if skip_lines > 0:
-        loop: bool = True
-        line_counter = 1
-        while loop:
-            if line_counter > skip_lines or f.readline() == '':
-                loop = False
-            line_counter += 1
+        raise ValueError('skip_lines must be a non-negative integer: ' +
+                         repr(skip_lines))
+    if engine not in common_defaults['engines']:
+        raise ValueError('engine must be one of ' +
+                         ', '.join(common_defaults['engines']) + ': ' +
+                         repr(engine))
+    if not jobs >= 0:
+        raise ValueError('jobs must be a non-negative integer: ' + repr(jobs))
+
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+
+    use_cache = use_cache and filename != '-'
+    if use_cache:
+        cache_options: tuple = (
+            ordered,
+            no_links,
+            no_indentation,
+            no_list_coherence,
+            keep_header_levels,
+            parser,
+            list_marker,
+            skip_lines,
+            constant_ordered_list,
+            newline_string,
+            engine,
+        )
+        file_status: os.stat_result = os.stat(filename)
+        cached_toc: str | None
+        digest: str | None
+        cached_toc, digest = cache.lookup(filename, cache_options, file_status)
+        if cached_toc is not None:
+            return cached_toc
 
     try:
-        line = f.readline()
+        toc: Toc = get_toc(filename, keep_header_levels, parser, no_links,
+                           skip_lines, engine, jobs)
     except UnicodeDecodeError:
         return ''.join(
             ['<!--stop reading ', filename, ': probably a binary file-->'])
 
-    indentation_log: dict[types.IndentationLogElement] = init_indentation_log(
-        parser, list_marker)
-    is_within_code_fence = False
-    code_fence = None
-    is_document_end = False
-    while line:
-        # Document ending detection.
-        #
-        # This changes the state of is_within_code_fence if the
-        # file has no closing fence markers. This serves no practial
-        # purpose since the code would run correctly anyway. It is
-        # however more semantically correct.
-        #
-        # See the unit tests (examples 95 and 96 of the github parser)
-        # and the is_closing_code_fence function.
-        if filename != '-':
-            # stdin is not seekable.
-            file_pointer_pos = f.tell()
-            try:
-                if f.readline() == '':
-                    is_document_end = True
-            except UnicodeDecodeError:
-                return ''.join([
-                    '<!--stop reading ', filename,
-                    ': probably a binary file-->'
-                ])
-            f.seek(file_pointer_pos)
+    toc_string: str = toc.render(
+        list_marker,
+        ordered,
+        no_indentation,
+        no_list_coherence,
+        constant_ordered_list,
+        newline_string,
+    )
+    if use_cache:
+        cache.store(filename, cache_options, toc_string, file_status, digest)
 
-        # Code fence detection.
-        if is_within_code_fence:
-            is_within_code_fence = not is_closing_code_fence(
-                line,
-                code_fence,
-                is_document_end,
-                parser,
-            )
-        else:
-            code_fence = is_opening_code_fence(line, parser)
-            if code_fence is not None:
-                # Update the status of the next line.
-                is_within_code_fence = True
+    return toc_string
 
-        if not is_within_code_fence or code_fence is None:
 
-            # Header detection and gathering.
-            headers: list[types.Header] = get_md_header(
-                line,
-                header_duplicate_counter,
-                keep_header_levels,
-                parser,
-                no_links,
-            )
+def build_multiple_tocs(
+    filenames: list[str],
+    ordered: bool = False,
+    no_links: bool = False,
+    no_indentation: bool = False,
+    no_list_coherence: bool = False,
+    keep_header_levels: int = 3,
+    parser: str = 'github',
+    list_marker: str = '-',
+    skip_lines: int = 0,
+    constant_ordered_list: bool = False,
+    newline_string: str = common_defaults['newline_string'],
+    engine: str = common_defaults['engine'],
+    jobs: int = 1,
+    use_cache: bool = False,
+) -> list[str]:
+    r"""Parse files by line and build the table of contents of each file.
 
-            # We only need to get the first element since all the lines
-            # have been already separated here.
-            header: types.Header = headers[0]
-
-            # Ignore invalid or to-be-invisible headers.
-            if header is not None and header['visible']:
-                header_type_curr = header['header_type']
-
-                # Take care of the ordered TOC.
-                if ordered and not constant_ordered_list:
-                    increase_index_ordered_list(
-                        header_type_counter,
-                        header_type_prev,
-                        header_type_curr,
-                        parser,
-                    )
-                    index = header_type_counter['h' + str(header_type_curr)]
-                elif constant_ordered_list:
-                    # This value should work on most parsers.
-                    index = 1
-                else:
-                    index = 1
+    :parameter filenames: the files that needs to be read.
+    :parameter ordered: decides whether to build an ordered list or not.
+         Defaults to ``False``.
+    :parameter no_links: disables the use of links.
+         Defaults to ``False``.
+    :parameter no_indentation: disables indentation in the list.
+         Defaults to ``False``.
+    :parameter keep_header_levels: the maximum level of headers to be
+         considered as such when building the table of contents.
+         Defaults to ``3``.
+    :parameter parser: decides rules on how to generate anchor links.
+         Defaults to ``github``.
+    :parameter skip_lines: the number of lines to be skipped from
+         the start of file before parsing for table of contents.
+         Defaults to ``0```.
+    :parameter list_marker: a string that contains some of the first
+         characters of the list element.
+         Defaults to ``-``.
+    :parameter constant_ordered_list: use a single integer
+        as list marker. This sets ordered to ``True``.
+    :parameter newline_string: the newline separator.
+        Defaults to ``os.linesep``.
+    :parameter engine: the way files are read, see ``build_toc``.
+        Defaults to ``readline``.
+    :parameter jobs: the number of worker processes used to build the TOCs.
+        With a single file they read its chunks, see ``build_toc``.
+        ``0`` uses all the available CPUs. Defaults to ``1``, i.e. no
+        worker processes.
+    :parameter use_cache: use the on-disk TOC cache, see ``build_toc``.
+        Defaults to ``False``.
+    :type filenames: list
+    :type ordered: bool
+    :type no_links: bool
+    :type no_indentation: bool
+    :type keep_header_levels: int
+    :type parser: str
+    :type list_marker: str
+    :type skip_lines: int
+    :type constant_ordered_list: bool
+    :type newline_string: str
+    :type engine: str
+    :type jobs: int
+    :type use_cache: bool
+    :returns: toc_struct, the corresponding table of contents for each input
+         file.
+    :rtype: list[str]
+    :raises: a built-in exception.
 
-                # Take care of list indentations.
-                if no_indentation:
-                    no_of_indentation_spaces_curr = 0
-                    # TOC list coherence checks are not necessary
-                    # without indentation.
-                else:
-                    if not no_list_coherence:
-                        # In-place list coherence checks can be made using only
-                        # the first, current and previous header types.
-                        if header_type_first == 0:
-                            header_type_first = header_type_curr
-                        if header_type_prev == 0:
-                            header_type_prev = header_type_curr
-                        if (header_type_curr < header_type_first
-                                or header_type_curr > header_type_prev + 1):
-                            raise TocDoesNotRenderAsCoherentList
-
-                    compute_toc_line_indentation_spaces(
-                        header_type_curr,
-                        header_type_prev,
-                        parser,
-                        ordered,
-                        list_marker,
-                        indentation_log,
-                        index,
-                    )
-                    no_of_indentation_spaces_curr = indentation_log[
-                        header_type_curr]['indentation_spaces']
-
-                # endif
-
-                # Build a single TOC line.
-                toc_line_no_indent = build_toc_line_without_indentation(
-                    header,
-                    ordered,
-                    no_links,
-                    index,
-                    parser,
-                    list_marker,
-                )
+    .. warning:: In case of ordered TOCs you must explicitly pass one of the
+        supported ordered list markers.
 
-                # Save the TOC line with the indentation.
-                toc.append(''.join([
-                    build_toc_line(
-                        toc_line_no_indent,
-                        no_of_indentation_spaces_curr,
-                    ), newline_string
-                ]))
+    .. note:: The order of the TOCs and the raised exception, if any, are the
+        same whatever the number of jobs. stdin is always read by
+        the calling process, so worker processes are not used when ``-``
+        is one of the filenames.
+    """
+    if not jobs >= 0:
+        raise ValueError('jobs must be a non-negative integer: ' + repr(jobs))
 
-                header_type_prev = header_type_curr
+    if len(filenames) == 0:
+        filenames.append('-')
 
-            # endif
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+    workers: int = min(jobs, len(filenames))
+
+    build = functools.partial(
+        build_toc,
+        ordered=ordered,
+        no_links=no_links,
+        no_indentation=no_indentation,
+        no_list_coherence=no_list_coherence,
+        keep_header_levels=keep_header_levels,
+        parser=parser,
+        list_marker=list_marker,
+        skip_lines=skip_lines,
+        constant_ordered_list=constant_ordered_list,
+        newline_string=newline_string,
+        engine=engine,
+        use_cache=use_cache,
+    )
+
+    if len(filenames) == 1:
+        return [build(filenames[0], jobs=jobs)]
+    if workers <= 1 or '-' in filenames:
+        return [build(f) for f in filenames]
+
+    # Send the files in chunks so that many small files do not pay
+    # the inter process communication costs one by one.
+    # This is the same heuristic used by multiprocessing.Pool.map.
+    chunksize, extra = divmod(len(filenames), workers * 4)
+    if extra:
+        chunksize += 1
+
+    # Executor.map returns the results in order and raises the
+    # exception of the first failing file, just like the sequential case.
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as ex:
+        return list(ex.map(build, filenames, chunksize=chunksize))
+
+
+def build_tocs_for_parsers(
+    filename: str,
+    parsers: list[str],
+    ordered: bool = False,
+    no_links: bool = False,
+    no_indentation: bool = False,
+    no_list_coherence: bool = False,
+    keep_header_levels: int = 3,
+    list_marker: str = '-',
+    skip_lines: int = 0,
+    constant_ordered_list: bool = False,
+    newline_string: str = common_defaults['newline_string'],
+    engine: str = common_defaults['engine'],
+) -> list[str]:
+    r"""Build the tables of contents of a single file for several parsers.
 
-        # endif
+    :parameter filename: the file that needs to be read.
+    :parameter parsers: the parsers deciding the rules on how to generate
+        anchor links.
+    :parameter ordered: decides whether to build an ordered list or not.
+        Defaults to ``False``.
+    :parameter no_links: disables the use of links.
+        Defaults to ``False``.
+    :parameter no_indentation: disables indentation in the list.
+        Defaults to ``False``.
+    :parameter no_list_coherence: if set to ``False`` checks
+        header levels for consecutiveness, see ``build_toc``.
+        Defaults to ``False``.
+    :parameter keep_header_levels: the maximum level of headers to be
+        considered as such when building the table of contents.
+        Defaults to ``3``.
+    :parameter list_marker: a string that contains some of the first
+        characters of the list element.
+        Defaults to ``-``.
+    :parameter skip_lines: the number of lines to be skipped from
+        the start of file before parsing for table of contents.
+        Defaults to ``0```.
+    :parameter constant_ordered_list: use a single integer
+        as list marker. This sets ordered to ``True``.
+    :parameter newline_string: the newline separator.
+        Defaults to ``os.linesep``.
+    :parameter engine: the way the file is read, see ``build_toc``.
+        Defaults to ``readline``.
+    :type filename: str
+    :type parsers: list
+    :type ordered: bool
+    :type no_links: bool
+    :type no_indentation: bool
+    :type no_list_coherence: bool
+    :type keep_header_levels: int
+    :type list_marker: str
+    :type skip_lines: int
+    :type constant_ordered_list: bool
+    :type newline_string: str
+    :type engine: str
+    :returns: tocs, the table of contents of the file for each parser, in
+        the same order. Each one is the same as the one of ``build_toc``.
+    :rtype: list[str]
+    :raises: a built-in exception.
 
-        try:
-            line = f.readline()
-        except UnicodeDecodeError:
-            return ''.join(
+    .. note:: The file is read once, see ``get_tocs_for_parsers``.
+
+    :Example:
+
+    >>> import md_toc # doctest: +SKIP
+    >>> with open('foo.md', 'w') as f: # doctest: +SKIP
+    ...     f.write('# A -- B\n') # doctest: +SKIP
+    9
+    >>> md_toc.api.build_tocs_for_parsers('foo.md', ['github', 'gitlab']) # doctest: +SKIP
+    ['- [A -- B](#a----b)\n', '- [A -- B](#a-b)\n']
+    """
+    try:
+        tocs: list[Toc] = get_tocs_for_parsers(filename, parsers,
+                                               keep_header_levels, no_links,
+                                               skip_lines, engine)
+    except UnicodeDecodeError:
+        return [
+            ''.join(
                 ['<!--stop reading ', filename, ': probably a binary file-->'])
+        ] * len(parsers)
+
+    return [
+        toc.render(
+            list_marker,
+            ordered,
+            no_indentation,
+            no_list_coherence,
+            constant_ordered_list,
+            newline_string,
+        ) for toc in tocs
+    ]
 
-    # endwhile
 
-    f.close()
+def check_toc(
+    filename: str,
+    marker: str = common_defaults['toc_marker'],
+    ordered: bool = False,
+    no_links: bool = False,
+    no_indentation: bool = False,
+    no_list_coherence: bool = False,
+    keep_header_levels: int = 3,
+    parser: str = 'github',
+    list_marker: str = '-',
+    skip_lines: int = 0,
+    constant_ordered_list: bool = False,
+    newline_string: str = common_defaults['newline_string'],
+    engine: str = common_defaults['engine'],
+    use_cache: bool = False,
+    jobs: int = 1,
+) -> bool:
+    r"""Check if the TOC between the markers of a file is up to date.
+
+    :parameter filename: the file that needs to be read.
+    :parameter marker: the TOC marker.
+        Defaults to ``<!--TOC-->``.
+    :parameter ordered: decides whether to build an ordered list or not.
+        Defaults to ``False``.
+    :parameter no_links: disables the use of links.
+        Defaults to ``False``.
+    :parameter no_indentation: disables indentation in the list.
+        Defaults to ``False``.
+    :parameter no_list_coherence: if set to ``False`` checks
+        header levels for consecutiveness, see ``build_toc``.
+        Defaults to ``False``.
+    :parameter keep_header_levels: the maximum level of headers to be
+        considered as such when building the table of contents.
+        Defaults to ``3``.
+    :parameter parser: decides rules on how to generate anchor links.
+        Defaults to ``github``.
+    :parameter list_marker: a string that contains some of the first
+        characters of the list element.
+        Defaults to ``-``.
+    :parameter skip_lines: the number of lines to be skipped from
+        the start of file before parsing for table of contents.
+        Defaults to ``0```.
+    :parameter constant_ordered_list: use a single integer
+        as list marker. This sets ordered to ``True``.
+    :parameter newline_string: the newline separator.
+        Defaults to ``os.linesep``.
+    :parameter engine: the way the file is read, see ``build_toc``.
+        Defaults to ``readline``.
+    :parameter use_cache: use the on-disk TOC cache, see ``build_toc``.
+        Defaults to ``False``.
+    :parameter jobs: the number of worker processes used to read chunks
+        of the file, see ``build_toc``. Defaults to ``1``.
+    :type filename: str
+    :type marker: str
+    :type ordered: bool
+    :type no_links: bool
+    :type no_indentation: bool
+    :type no_list_coherence: bool
+    :type keep_header_levels: int
+    :type parser: str
+    :type list_marker: str
+    :type skip_lines: int
+    :type constant_ordered_list: bool
+    :type newline_string: str
+    :type engine: str
+    :type use_cache: bool
+    :type jobs: int
+    :returns: ``True`` if the TOC of ``build_toc`` is the same as the one
+        in the file, like ``tocs_equal``, ``False`` otherwise.
+    :rtype: bool
+    :raises: a built-in exception.
+
+    .. note:: The new TOC is built line by line and compared with the
+        existing one: headers are not read anymore after the first
+        difference, so errors that would be found after it are not raised.
+    """
+    old_toc: str = generic._get_existing_toc(filename, marker)[0]
+    if use_cache:
+        return build_toc(
+            filename,
+            ordered,
+            no_links,
+            no_indentation,
+            no_list_coherence,
+            keep_header_levels,
+            parser,
+            list_marker,
+            skip_lines,
+            constant_ordered_list,
+            newline_string,
+            engine,
+            use_cache,
+            jobs,
+        ).strip() == old_toc
+
+    lines: typing.Iterator[str] = _iter_toc_lines(
+        _get_toc_headers(filename, keep_header_levels, parser, no_links,
+                         skip_lines, engine, jobs),
+        parser,
+        no_links,
+        list_marker,
+        ordered,
+        no_indentation,
+        no_list_coherence,
+        constant_ordered_list,
+        newline_string,
+    )
+    # Same as comparing the stripped TOCs: the whitespace at the end of a
+    # line is compared only when another line follows.
+    position: int = 0
+    whitespace: str = ''
+    try:
+        for line in lines:
+            text: str = line.rstrip()
+            if text == '':
+                whitespace += line
+                continue
+            if position == 0:
+                whitespace = whitespace.lstrip()
+            if not old_toc.startswith(whitespace + text, position):
+                return False
+            position += len(whitespace) + len(text)
+            whitespace = line[len(text):]
+    except UnicodeDecodeError:
+        return ''.join(
+            ['<!--stop reading ', filename,
+             ': probably a binary file-->']) == old_toc
 
-    return ''.join(toc)
+    return position == len(old_toc)
 
 
-def build_multiple_tocs(
+def check_multiple_tocs(
     filenames: list[str],
+    marker: str = common_defaults['toc_marker'],
     ordered: bool = False,
     no_links: bool = False,
     no_indentation: bool = False,
@@ -448,66 +1822,124 @@ def build_multiple_tocs(
     skip_lines: int = 0,
     constant_ordered_list: bool = False,
     newline_string: str = common_defaults['newline_string'],
-) -> list[str]:
-    r"""Parse files by line and build the table of contents of each file.
-
-    :parameter filenames: the files that needs to be read.
+    engine: str = common_defaults['engine'],
+    jobs: int = 1,
+    use_cache: bool = False,
+    fail_fast: bool = False,
+) -> list[bool]:
+    r"""Check if the TOCs between the markers of files are up to date.
+
+    :parameter filenames: the files that needs to be read. stdin, ``-``,
+        has no existing TOC and cannot be checked.
+    :parameter marker: the TOC marker.
+        Defaults to ``<!--TOC-->``.
     :parameter ordered: decides whether to build an ordered list or not.
-         Defaults to ``False``.
+        Defaults to ``False``.
     :parameter no_links: disables the use of links.
-         Defaults to ``False``.
+        Defaults to ``False``.
     :parameter no_indentation: disables indentation in the list.
-         Defaults to ``False``.
+        Defaults to ``False``.
+    :parameter no_list_coherence: if set to ``False`` checks
+        header levels for consecutiveness, see ``build_toc``.
+        Defaults to ``False``.
     :parameter keep_header_levels: the maximum level of headers to be
-         considered as such when building the table of contents.
-         Defaults to ``3``.
+        considered as such when building the table of contents.
+        Defaults to ``3``.
     :parameter parser: decides rules on how to generate anchor links.
-         Defaults to ``github``.
-    :parameter skip_lines: the number of lines to be skipped from
-         the start of file before parsing for table of contents.
-         Defaults to ``0```.
+        Defaults to ``github``.
     :parameter list_marker: a string that contains some of the first
-         characters of the list element.
-         Defaults to ``-``.
+        characters of the list element.
+        Defaults to ``-``.
+    :parameter skip_lines: the number of lines to be skipped from
+        the start of file before parsing for table of contents.
+        Defaults to ``0```.
     :parameter constant_ordered_list: use a single integer
         as list marker. This sets ordered to ``True``.
     :parameter newline_string: the newline separator.
         Defaults to ``os.linesep``.
+    :parameter engine: the way files are read, see ``build_toc``.
+        Defaults to ``readline``.
+    :parameter jobs: the number of worker processes used to check the
+        files, see ``build_multiple_tocs``. Defaults to ``1``.
+    :parameter use_cache: use the on-disk TOC cache, see ``build_toc``.
+        Defaults to ``False``.
+    :parameter fail_fast: stop at the first file whose TOC is not up to
+        date. Defaults to ``False``.
     :type filenames: list
+    :type marker: str
     :type ordered: bool
     :type no_links: bool
     :type no_indentation: bool
+    :type no_list_coherence: bool
     :type keep_header_levels: int
     :type parser: str
     :type list_marker: str
     :type skip_lines: int
     :type constant_ordered_list: bool
     :type newline_string: str
-    :returns: toc_struct, the corresponding table of contents for each input
-         file.
-    :rtype: list[str]
+    :type engine: str
+    :type jobs: int
+    :type use_cache: bool
+    :type fail_fast: bool
+    :returns: the result of ``check_toc`` for each file checked, in the same
+        order. With ``fail_fast`` the last one is the first ``False``.
+    :rtype: list[bool]
     :raises: a built-in exception.
-
-    .. warning:: In case of ordered TOCs you must explicitly pass one of the
-        supported ordered list markers.
     """
-    if len(filenames) == 0:
-        filenames.append('-')
-    return [
-        build_toc(
-            filenames[file_id],
-            ordered,
-            no_links,
-            no_indentation,
-            no_list_coherence,
-            keep_header_levels,
-            parser,
-            list_marker,
-            skip_lines,
-            constant_ordered_list,
-            newline_string,
-        ) for file_id in range(0, len(filenames))
-    ]
+    if not jobs >= 0:
+        raise ValueError('jobs must be a non-negative integer: ' + repr(jobs))
+
+    if len(filenames) == 0 or '-' in filenames:
+        raise ValueError('stdin cannot be checked')
+
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+    workers: int = min(jobs, len(filenames))
+
+    check = functools.partial(
+        check_toc,
+        marker=marker,
+        ordered=ordered,
+        no_links=no_links,
+        no_indentation=no_indentation,
+        no_list_coherence=no_list_coherence,
+        keep_header_levels=keep_header_levels,
+        parser=parser,
+        list_marker=list_marker,
+        skip_lines=skip_lines,
+        constant_ordered_list=constant_ordered_list,
+        newline_string=newline_string,
+        engine=engine,
+        use_cache=use_cache,
+    )
+
+    results: list[bool] = list()
+    if len(filenames) == 1:
+        return [check(filenames[0], jobs=jobs)]
+    if workers <= 1:
+        for f in filenames:
+            results.append(check(f))
+            if fail_fast and not results[-1]:
+                break
+        return results
+
+    # See build_multiple_tocs.
+    chunksize, extra = divmod(len(filenames), workers * 4)
+    if extra:
+        chunksize += 1
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as ex:
+        equal: typing.Iterator[bool] = ex.map(check,
+                                              filenames,
+                                              chunksize=chunksize)
+        for e in equal:
+            results.append(e)
+            if fail_fast and not e:
+                # Cancel the files that are still waiting for a worker.
+                equal.close()
+                break
+
+    return results
 
 
 def increase_index_ordered_list(
@@ -815,29 +2247,31 @@ def remove_html_tags(line: str, parser: str = 'github') -> str:
     :rtype: str
     :raises: a built-in exception.
     """
-    if parser in ['github', 'cmark', 'gitlab', 'commonmarker', 'goldmark']:
-        # We need to match newline as well because it is a WS, so we
-        # must use re.DOTALL.
-        regexes: list[str] = [
-            md_parser[parser]['re']['OT'], md_parser[parser]['re']['CT'],
-            md_parser[parser]['re']['CO'], md_parser[parser]['re']['PI'],
-            md_parser[parser]['re']['DE'], md_parser[parser]['re']['CD']
-        ]
-
-        for r in regexes:
-            line = re.sub(r, '', line, flags=re.DOTALL)
+    # All HTML tags start with '<'.
+    if (parser in ['github', 'cmark', 'gitlab', 'commonmarker', 'goldmark']
+            and '<' in line):
+        for r in _get_compiled_re(parser)['html_tags']:
+            line = r.sub('', line)
 
     return line
 
 
-def remove_emphasis(line: str, parser: str = 'github') -> str:
+def remove_emphasis(
+    line: str,
+    parser: str = 'github',
+    refmap: references_h._cmarkCmarkReferenceMap | None = None,
+) -> str:
     r"""Remove markdown emphasis.
 
     :parameter line: a string.
     :parameter parser: decides rules on how to find delimiters.
         Defaults to ``github``.
+    :parameter refmap: the link reference definitions of the document.
+        Emphasis cannot span the boundaries of reference links.
+        Defaults to ``None``.
     :type line: str
     :type parser: str
+    :type refmap: md_toc.cmark.references_h._cmarkCmarkReferenceMap
     :returns: the input line without emphasis.
     :rtype: str
     :raises: a built-in exception.
@@ -854,14 +2288,20 @@ def remove_emphasis(line: str, parser: str = 'github') -> str:
             'github', 'cmark', 'gitlab', 'commonmarker', 'goldmark',
             'redcarpet'
     ]:
+        # Remove NULL bytes.
+        line = line.replace('\x00', '')
+
+        # Plain text does not need the inline parser.
+        if _get_compiled_re(parser)['inline_special_chars'].search(
+                line) is None:
+            return line
+
         mem = None
-        refmap = references_h._cmarkCmarkReferenceMap()
+        if refmap is None:
+            refmap = references_h._cmarkCmarkReferenceMap()
 
         parent = node_h._cmarkCmarkNode()
 
-        # Remove NULL bytes.
-        line = line.replace('\x00', '')
-
         parent.data = line
         parent.length = len(line)
         parent.start_line = 0
@@ -890,13 +2330,25 @@ def filter_indices_from_line(line: str, ranges: list[range]) -> str:
     :rtype: str
     :raises: a built-in exception.
     """
-    # Transform ranges into lists.
-    rng: list[typing.Sequence[int]] = [list(r) for r in ranges]
+    # Split ranges with steps into single indices.
+    contiguous: list[range] = list()
+    for r in ranges:
+        if r.step == 1:
+            contiguous.append(r)
+        else:
+            contiguous.extend([range(i, i + 1) for i in r])
 
-    # Flatten list.
-    rng_flat: list[int] = sorted([item for e in rng for item in e])
+    # Merge the sorted ranges while copying the slices between them.
+    filtered: list[str] = list()
+    start: int = 0
+    for r in sorted([r for r in contiguous if len(r) > 0],
+                    key=lambda r: r.start):
+        if r.start > start:
+            filtered.append(line[start:r.start])
+        start = max(start, r.stop)
+    filtered.append(line[start:])
 
-    return ''.join([line[i] for i in range(0, len(line)) if i not in rng_flat])
+    return ''.join(filtered)
 
 
 def anchor_link_punctuation_filter(
@@ -927,9 +2379,9 @@ def anchor_link_punctuation_filter(
         #                   space
         # remove its complementary set from the input_string. This is achieved
         # using `^`.
-        pattern: str = r'[^\w\- ]'
         replacement: str = ''
-        output_string = re.sub(pattern, replacement, input_string)
+        output_string = _get_compiled_re(parser)['punctuation'].sub(
+            replacement, input_string)
     return output_string
 
 
@@ -937,6 +2389,7 @@ def build_anchor_link(
     header_text_trimmed: str,
     header_duplicate_counter: types.HeaderDuplicateCounter,
     parser: str = 'github',
+    refmap: references_h._cmarkCmarkReferenceMap | None = None,
 ) -> str:
     r"""Apply the specified slug rule to build the anchor link.
 
@@ -947,9 +2400,12 @@ def build_anchor_link(
         meaningful only for certain values of parser.
     :parameter parser: decides rules on how to generate anchor links.
         Defaults to ``github``.
+    :parameter refmap: the link reference definitions of the document.
+        Defaults to ``None``.
     :type header_text_trimmed: str
     :type header_duplicate_counter: types.HeaderDuplicateCounter
     :type parser: str
+    :type refmap: md_toc.cmark.references_h._cmarkCmarkReferenceMap
     :returns: None if the specified parser is not recognized, or the anchor
         link, otherwise.
     :rtype: str
@@ -975,7 +2431,8 @@ def build_anchor_link(
         header_text_trimmed = remove_html_tags(header_text_trimmed, parser)
 
         # Filter "emphasis and strong emphasis".
-        header_text_trimmed = remove_emphasis(header_text_trimmed, parser)
+        header_text_trimmed = remove_emphasis(header_text_trimmed, parser,
+                                              refmap)
 
         # Remove punctuation characters.
         header_text_trimmed = anchor_link_punctuation_filter(
@@ -987,31 +2444,11 @@ def build_anchor_link(
         if parser in ['gitlab']:
             # See https://docs.gitlab.com/ee/user/markdown.html#header-ids-and-links
             # Two or more hyphens in a row are converted to one.
-            header_text_trimmed = re.sub('-+', '-', header_text_trimmed)
-
-        # Use a checksum to reduce memory usage on the dict:
-        #
-        # import sys
-        # size = getsizeof(header_duplicate_counter)
-        # size += sum(map(getsizeof, header_duplicate_counter.values())) + sum(map(getsizeof, header_duplicate_counter.keys()))
-        #
-        # See also
-        # https://stackoverflow.com/a/6579816
-        ht_checksum = hashlib.sha1(
-            header_text_trimmed.encode('UTF-8')).hexdigest()
-        # Check for duplicates.
-        # Set the initial value if we are examining the first occurrency.
-        # The state of header_duplicate_counter is available to the caller
-        # functions.
-        if ht_checksum not in header_duplicate_counter:
-            header_duplicate_counter[ht_checksum] = 0
-        if header_duplicate_counter[ht_checksum] > 0:
-            header_text_trimmed = ''.join([
-                header_text_trimmed, '-',
-                str(header_duplicate_counter[ht_checksum])
-            ])
-        header_duplicate_counter[ht_checksum] += 1
-        return header_text_trimmed
+            header_text_trimmed = _get_compiled_re(parser)['hyphens'].sub(
+                '-', header_text_trimmed)
+
+        return _add_duplicate_suffix(header_text_trimmed,
+                                     header_duplicate_counter)
     elif parser in ['redcarpet']:
         # To ensure full compatibility what follows is a direct translation
         # of the rndr_header_anchor C function used in redcarpet.
@@ -1067,6 +2504,27 @@ def build_anchor_link(
     return None
 
 
+def _add_duplicate_suffix(
+        anchor_link: str,
+        header_duplicate_counter: types.HeaderDuplicateCounter) -> str:
+    # Check for duplicates.
+    # Short anchor links are the key themselves: they are the same object
+    # returned for the first occurrency and they are not hashed twice.
+    # Long ones, which would be kept in memory as long as the counter,
+    # are replaced by their checksum. It is bytes, so it is never equal
+    # to an anchor link.
+    # The state of header_duplicate_counter is available to the caller
+    # functions.
+    key: str | bytes = anchor_link
+    if len(anchor_link) > common_defaults['max_anchor_link_key_length']:
+        key = hashlib.sha256(anchor_link.encode('UTF-8')).digest()
+    duplicates: int = header_duplicate_counter.get(key, 0)
+    header_duplicate_counter[key] = duplicates + 1
+    if duplicates > 0:
+        anchor_link = ''.join([anchor_link, '-', str(duplicates)])
+    return anchor_link
+
+
 def replace_and_split_newlines(line: str) -> list[str]:
     r"""Replace all the newline characters with line feeds and separate the components.
 
@@ -1088,6 +2546,40 @@ def replace_and_split_newlines(line: str) -> list[str]:
     return line.split('\n')
 
 
+def _build_link_label(text: str) -> str:
+    # Make the header text usable as a link label.
+    if len(text) > 0 and text[-1] == '\u005c':
+        text = ''.join([text, ' '])
+    if len(
+            text.strip('\u0020').strip('\u0009').strip('\u000a').strip(
+                '\u000b').strip('\u000c').strip('\u000d'), ) == 0:
+        raise GithubEmptyLinkLabel
+    if len(text, ) > md_parser['github']['link']['max_chars_label']:
+        raise GithubOverflowCharsLinkLabel
+
+    i: int = 0
+    while i < len(text):
+        # Escape square brackets if not already escaped.
+        if (text[i] == '[' or text[i] == ']'):
+            j = i - 1
+            consecutive_escape_characters = 0
+            while j >= 0 and text[j] == '\u005c':
+                consecutive_escape_characters += 1
+                j -= 1
+            if ((consecutive_escape_characters > 0
+                 and consecutive_escape_characters % 2 == 0)
+                    or consecutive_escape_characters == 0):
+                tmp = '\u005c'
+            else:
+                tmp = ''
+            text = ''.join([text[0:i], tmp, text[i:]])
+            i += 1 + len(tmp)
+        else:
+            i += 1
+
+    return text
+
+
 def get_atx_heading(
     line: str,
     keep_header_levels: int = 3,
@@ -1257,37 +2749,7 @@ def get_atx_heading(
 
             # Add escaping.
             if not no_links:
-                if len(final_line) > 0 and final_line[-1] == '\u005c':
-                    final_line = ''.join([final_line, ' '])
-                if len(
-                        final_line.strip('\u0020').strip('\u0009').strip(
-                            '\u000a').strip('\u000b').strip('\u000c').strip(
-                                '\u000d'), ) == 0:
-                    raise GithubEmptyLinkLabel
-                if len(final_line,
-                       ) > md_parser['github']['link']['max_chars_label']:
-                    raise GithubOverflowCharsLinkLabel
-
-                i = 0
-                while i < len(final_line):
-                    # Escape square brackets if not already escaped.
-                    if (final_line[i] == '[' or final_line[i] == ']'):
-                        j = i - 1
-                        consecutive_escape_characters = 0
-                        while j >= 0 and final_line[j] == '\u005c':
-                            consecutive_escape_characters += 1
-                            j -= 1
-                        if ((consecutive_escape_characters > 0
-                             and consecutive_escape_characters % 2 == 0)
-                                or consecutive_escape_characters == 0):
-                            tmp = '\u005c'
-                        else:
-                            tmp = ''
-                        final_line = ''.join(
-                            [final_line[0:i], tmp, final_line[i:]])
-                        i += 1 + len(tmp)
-                    else:
-                        i += 1
+                final_line = _build_link_label(final_line)
 
             # Overwrite the element with None as values.
             struct[-1] = {
@@ -1362,6 +2824,7 @@ def get_md_header(
     keep_header_levels: int = 3,
     parser: str = 'github',
     no_links: bool = False,
+    refmap: references_h._cmarkCmarkReferenceMap | None = None,
 ) -> list[types.Header]:
     r"""Build a data structure with the elements needed to create a TOC line.
 
@@ -1377,10 +2840,16 @@ def get_md_header(
          Defaults to ``3``.
     :parameter parser: decides rules on how to generate anchor links.
          Defaults to ``github``.
+    :parameter no_links: disables the use of links.
+         Defaults to ``False``.
+    :parameter refmap: the link reference definitions of the document.
+         Defaults to ``None``.
     :type header_text_line: str
     :type header_duplicate_counter: types.HeaderDuplicateCounter
     :type keep_header_levels: int
     :type parser: str
+    :type no_links: bool
+    :type refmap: md_toc.cmark.references_h._cmarkCmarkReferenceMap
     :returns: a list with elements ``None`` if the input line does not correspond
         to one of the designated cases or a list of data structures containing
         the necessary components to create a table of contents.
@@ -1402,6 +2871,7 @@ def get_md_header(
                 r['header_text_trimmed'],
                 header_duplicate_counter,
                 parser,
+                refmap,
             ),
             'visible':
             r['visible'],
@@ -1621,5 +3091,358 @@ def is_closing_code_fence(
     return False
 
 
+def is_setext_heading_underline(line: str,
+                                parser: str = 'github') -> int | None:
+    r"""Determine if the given line is a setext heading underline.
+
+    :parameter line: a single markdown line to evaluate.
+    :parameter parser: decides rules on how to generate the anchor text.
+         Defaults to ``github``.
+    :type line: str
+    :type parser: str
+    :returns: the header type, ``1`` for ``=`` and ``2`` for ``-``
+         underlines, or None if the line is not an underline.
+    :rtype: typing.Optional[int]
+    :raises: a built-in exception.
+
+    .. note:: The line makes a setext heading only if it follows a
+         paragraph. See is_paragraph_line.
+    """
+    if parser in ['github', 'cmark', 'gitlab', 'commonmarker', 'goldmark']:
+        # [0.29]
+        #   The setext heading underline can be indented up to three spaces,
+        #   and may have trailing spaces.
+        # [0.30]
+        #   The setext heading underline can be preceded by up to three
+        #   spaces of indentation, and may have trailing spaces or tabs.
+        m = _get_compiled_re(parser)['setext_heading_underline'].fullmatch(
+            line)
+        if m is None:
+            return None
+        return 1 if m.group(1)[0] == '=' else 2
+    elif parser in ['redcarpet']:
+        # TODO.
+        return None
+
+    return None
+
+
+def is_paragraph_line(line: str,
+                      is_continuation: bool = False,
+                      parser: str = 'github') -> bool:
+    r"""Determine if the given line starts or continues a paragraph.
+
+    :parameter line: a single markdown line to evaluate.
+    :parameter is_continuation: if the previous line is part of a
+         paragraph.
+         Defaults to ``False``.
+    :parameter parser: decides rules on how to generate the anchor text.
+         Defaults to ``github``.
+    :type line: str
+    :type is_continuation: bool
+    :type parser: str
+    :returns: True if the line is paragraph text, False if it is blank or
+         it starts another block.
+    :rtype: bool
+    :raises: a built-in exception.
+
+    .. note:: Link reference definitions are not detected.
+         Setext heading underlines must be checked before calling this
+         function.
+    """
+    if parser in ['github', 'cmark', 'gitlab', 'commonmarker', 'goldmark']:
+        compiled: dict = _get_compiled_re(parser)
+
+        # Most lines start with a character that cannot start a block.
+        if compiled['paragraph_text'].match(line):
+            return True
+
+        # Blank line.
+        if line.strip(' \t\n') == '':
+            return False
+
+        if is_indented_code_line(line, is_continuation, parser):
+            return False
+
+        if (compiled['atx_heading'].match(line)
+                or compiled['thematic_break'].fullmatch(line)
+                or compiled['block_quote'].match(line)):
+            return False
+
+        m = compiled['list_item'].match(line)
+        if m is not None:
+            if not is_continuation:
+                return False
+            # In order for a list to interrupt a paragraph, it must start
+            # with a non blank line and ordered lists must start with 1.
+            if (line[m.end():].strip(' \t\n') != ''
+                    and m.group('start') in [None, '1']):
+                return False
+
+        return (is_opening_code_fence(line, parser) is None and
+                is_opening_html_block(line, is_continuation, parser) is None)
+    elif parser in ['redcarpet']:
+        # TODO.
+        return False
+
+    return False
+
+
+def _get_container_content(line: str, parser: str = 'github') -> str | None:
+    # The content of a block quote or list item line, without the marker.
+    if parser not in ['github', 'cmark', 'gitlab', 'commonmarker', 'goldmark']:
+        return None
+    compiled: dict = _get_compiled_re(parser)
+    m = compiled['block_quote'].match(line)
+    if m is None:
+        m = compiled['list_item'].match(line)
+    if m is None:
+        return None
+    return line[m.end():]
+
+
+def get_setext_heading(
+    lines: list[str],
+    header_type: int,
+    keep_header_levels: int = 3,
+    parser: str = 'github',
+    no_links: bool = False,
+) -> types.AtxHeadingStructElement:
+    r"""Given the lines of a paragraph followed by an underline extract the link label.
+
+    :parameter lines: the lines of the paragraph.
+    :parameter header_type: the return value of
+         ``is_setext_heading_underline``.
+    :parameter keep_header_levels: the maximum level of headers to be
+         considered as such when building the table of contents.
+         Defaults to ``3``.
+    :parameter parser: decides rules on how to generate the anchor text.
+         Defaults to ``github``.
+    :parameter no_links: disables the use of links.
+         Defaults to ``False``.
+    :type lines: list[str]
+    :type header_type: int
+    :type keep_header_levels: int
+    :type parser: str
+    :type no_links: bool
+    :returns: the same structure returned for a line by ``get_atx_heading``.
+         Multiline headings are joined with spaces.
+    :rtype: types.AtxHeadingStructElement
+    :raises: GithubEmptyLinkLabel or GithubOverflowCharsLinkLabel or a
+         built-in exception.
+    """
+    if not keep_header_levels >= 1:
+        raise ValueError
+
+    if parser in ['github', 'cmark', 'gitlab', 'commonmarker', 'goldmark']:
+        # The leading and trailing whitespace of the paragraph lines is not
+        # part of the content.
+        final_line: str = ' '.join([line.strip(' \t\n') for line in lines])
+        if not no_links:
+            final_line = _build_link_label(final_line)
+
+        return {
+            'header_type': header_type,
+            'header_text_trimmed': final_line,
+            'visible': header_type <= keep_header_levels,
+        }
+
+    return {'header_type': None, 'header_text_trimmed': None, 'visible': False}
+
+
+def is_indented_code_line(line: str,
+                          is_continuation: bool = False,
+                          parser: str = 'github') -> bool:
+    r"""Determine if the given line is part of an indented code block.
+
+    :parameter line: a single markdown line to evaluate.
+    :parameter is_continuation: if the previous line is part of a
+         paragraph.
+         Defaults to ``False``.
+    :parameter parser: decides rules on how to generate the anchor text.
+         Defaults to ``github``.
+    :type line: str
+    :type is_continuation: bool
+    :type parser: str
+    :returns: True if the line is indented by four or more columns and it
+         is not blank, False otherwise.
+    :rtype: bool
+    :raises: a built-in exception.
+
+    .. note:: An indented code block cannot interrupt a paragraph, so
+         indented lines are paragraph continuation text.
+    """
+    if parser in ['github', 'cmark', 'gitlab', 'commonmarker', 'goldmark']:
+        if is_continuation:
+            return False
+
+        indentation: int = 0
+        i: int = 0
+        while i < len(line) and line[i] in ' \t':
+            if line[i] == '\t':
+                # Tab stops are 4 characters.
+                indentation += 4 - indentation % 4
+            else:
+                indentation += 1
+            i += 1
+
+        return (indentation >
+                md_parser['github']['header']['max_space_indentation']
+                and line[i:].strip(' \t\n') != '')
+    elif parser in ['redcarpet']:
+        # TODO.
+        return False
+
+    return False
+
+
+def is_opening_html_block(line: str,
+                          is_continuation: bool = False,
+                          parser: str = 'github') -> int | None:
+    r"""Determine if the given line is the start of an HTML block.
+
+    :parameter line: a single markdown line to evaluate.
+    :parameter is_continuation: if the previous line is part of a
+         paragraph.
+         Defaults to ``False``.
+    :parameter parser: decides rules on how to generate the anchor text.
+         Defaults to ``github``.
+    :type line: str
+    :type is_continuation: bool
+    :type parser: str
+    :returns: None if the input line does not start an HTML block.
+         Otherwise, returns the type of the HTML block, from ``1`` to ``7``,
+         which is needed by ``is_closing_html_block``.
+    :rtype: typing.Optional[int]
+    :raises: a built-in exception.
+
+    :Example:
+
+    >>> import md_toc
+    >>> md_toc.api.is_opening_html_block('<!-- comment')
+    2
+    >>> md_toc.api.is_opening_html_block('<span>', is_continuation=True)
+    """
+    if parser in ['github', 'cmark', 'gitlab', 'commonmarker', 'goldmark']:
+        compiled: list = _get_compiled_re(parser)['html_block_start']
+        # [0.30]
+        #   Start condition: line begins with [...] the string <
+        if line.lstrip(' ')[:1] != '<':
+            return None
+
+        i: int = 0
+        while i < 6:
+            if compiled[i].match(line):
+                return i + 1
+            i += 1
+
+        # HTML blocks of type 7 cannot interrupt a paragraph.
+        if not is_continuation and compiled[6].fullmatch(line):
+            return 7
+
+        return None
+    elif parser in ['redcarpet']:
+        # TODO.
+        return None
+
+    return None
+
+
+def is_closing_html_block(line: str,
+                          html_block_type: int,
+                          parser: str = 'github') -> bool:
+    r"""Determine if the given line is the end of an HTML block.
+
+    :parameter line: a single markdown line to evaluate.
+    :parameter html_block_type: the return value of
+         ``is_opening_html_block``.
+    :parameter parser: decides rules on how to generate the anchor text.
+         Defaults to ``github``.
+    :type line: str
+    :type html_block_type: int
+    :type parser: str
+    :returns: True if the line ends the HTML block, False otherwise.
+    :rtype: bool
+    :raises: a built-in exception.
+
+    .. note:: The end condition may be met by the opening line as well.
+         The blank line ending an HTML block of type 6 or 7 is not part of
+         the block.
+    """
+    if parser in ['github', 'cmark', 'gitlab', 'commonmarker', 'goldmark']:
+        if html_block_type >= 6:
+            return line.strip(' \t\n') == ''
+
+        return _get_compiled_re(parser)['html_block_end'][
+            html_block_type - 1].search(line) is not None
+    elif parser in ['redcarpet']:
+        # TODO.
+        return False
+
+    return False
+
+
+def is_opening_front_matter(line: str, parser: str = 'github') -> str | None:
+    r"""Determine if the given line is the opening delimiter of front matter.
+
+    :parameter line: the first line of the file.
+    :parameter parser: decides rules on how to generate the anchor text.
+         Defaults to ``github``.
+    :type line: str
+    :type parser: str
+    :returns: None if the input line is not a front matter delimiter.
+         Otherwise, returns the closing delimiter.
+    :rtype: typing.Optional[str]
+    :raises: a built-in exception.
+
+    .. note:: Front matter without a closing delimiter is part of the
+         document. So is front matter longer than
+         ``common_defaults['max_front_matter_lines']`` lines.
+    """
+    if parser in [
+            'github', 'cmark', 'gitlab', 'commonmarker', 'goldmark',
+            'redcarpet'
+    ]:
+        delimiter: str = line.rstrip(' \t\n')
+        if delimiter in md_parser[parser]['front_matter']['delimiters']:
+            return delimiter
+
+    return None
+
+
+def _skip_front_matter(
+    lines: typing.Iterator[tuple[int, str, bool]],
+    parser: str = 'github',
+) -> typing.Iterator[tuple[int, str, bool]]:
+    # Remove the front matter at the start of the file. Its lines are
+    # kept until the closing delimiter is found: without it they are
+    # part of the document. Line numbers are compared, instead of counting
+    # the lines, because the mmap engine skips most of them.
+    first: tuple[int, str, bool] | None = next(lines, None)
+    if first is None:
+        return
+
+    delimiter: str | None = None
+    if first[0] == 1:
+        delimiter = is_opening_front_matter(first[1], parser)
+    if delimiter is None:
+        yield first
+        yield from lines
+        return
+
+    last_line_number: int = common_defaults['max_front_matter_lines'] + 2
+    front_matter: list[tuple[int, str, bool]] = [first]
+    for line in lines:
+        front_matter.append(line)
+        if line[0] > last_line_number:
+            break
+        if line[1].rstrip(' \t\n') == delimiter:
+            yield from lines
+            return
+
+    yield from front_matter
+    yield from lines
+
+
 if __name__ == '__main__':
     pass
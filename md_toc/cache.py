@@ -0,0 +1,206 @@
+#
+# cache.py
+#
+# Copyright (C) 2024 Franco Masotti (see /README.md)
+#
+# This file is part of md-toc.
+#
+# md-toc is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# md-toc is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with md-toc.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""A persistent cache of the generated TOCs."""
+
+from __future__ import annotations
+
+import functools
+import hashlib
+import os
+import sqlite3
+import time
+
+from .constants import common_defaults
+
+
+def get_cache_file() -> str:
+    r"""Get the path of the cache database.
+
+    :returns: ``$XDG_CACHE_HOME/md_toc/toc.sqlite3`` or
+        ``~/.cache/md_toc/toc.sqlite3`` if ``XDG_CACHE_HOME`` is not set.
+    :rtype: str
+    :raises: a built-in exception.
+    """
+    cache_home: str = os.environ.get('XDG_CACHE_HOME', '')
+    if cache_home == '':
+        cache_home = os.path.join(os.path.expanduser('~'), '.cache')
+
+    return os.path.join(cache_home, 'md_toc',
+                        common_defaults['cache']['filename'])
+
+
+def clear():
+    r"""Remove all the cache entries.
+
+    :returns: None
+    :rtype: None
+    :raises: a built-in exception.
+    """
+    cache_file: str = get_cache_file()
+    key: tuple[int, str] = (os.getpid(), cache_file)
+    if key in _connections:
+        _connections.pop(key).close()
+
+    # Remove the write-ahead log files as well.
+    for suffix in ['', '-wal', '-shm']:
+        try:
+            os.remove(cache_file + suffix)
+        except FileNotFoundError:
+            pass
+
+
+def _get_version() -> str:
+    # Invalidate the entries of the other versions.
+    from . import __version__
+    return __version__
+
+
+def _get_file_digest(filename: str) -> str:
+    h = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for chunk in iter(functools.partial(f.read, 1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# Open connections, one for each process and cache file.
+_connections: dict[tuple[int, str], sqlite3.Connection] = dict()
+
+
+def _connect() -> sqlite3.Connection:
+    cache_file: str = get_cache_file()
+    key: tuple[int, str] = (os.getpid(), cache_file)
+    if key in _connections:
+        if os.path.exists(cache_file):
+            return _connections[key]
+        # The database was removed by someone else.
+        _connections.pop(key).close()
+
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    connection = sqlite3.connect(cache_file, timeout=30)
+    # Losing the most recent entries after a crash is harmless.
+    connection.execute('PRAGMA journal_mode = WAL')
+    connection.execute('PRAGMA synchronous = OFF')
+    connection.execute('CREATE TABLE IF NOT EXISTS toc ('
+                       'key TEXT PRIMARY KEY, '
+                       'size INTEGER, '
+                       'mtime_ns INTEGER, '
+                       'digest TEXT, '
+                       'toc TEXT, '
+                       'last_access REAL)')
+    connection.execute(
+        'CREATE INDEX IF NOT EXISTS toc_last_access ON toc (last_access)')
+    _connections[key] = connection
+    return connection
+
+
+def _get_key(filename: str, options: tuple) -> str:
+    return hashlib.sha256(
+        repr((os.path.realpath(filename), options,
+              _get_version())).encode('UTF-8')).hexdigest()
+
+
+def lookup(filename: str, options: tuple,
+           st: os.stat_result) -> tuple[str | None, str | None]:
+    r"""Get a cached TOC.
+
+    :parameter filename: the markdown file.
+    :parameter options: all the options that change the TOC.
+    :parameter st: the status of the file.
+    :type filename: str
+    :type options: tuple
+    :type st: os.stat_result
+    :returns: the TOC or ``None`` if the file or the options changed since
+        the TOC was stored, and the content hash of the file if it was
+        computed, to be passed to ``store``.
+    :rtype: tuple
+    :raises: a built-in exception.
+
+    .. note:: Files with the same size and modification time are not
+        read. If only the modification time is different the content hash
+        is compared.
+    """
+    key: str = _get_key(filename, options)
+    digest: str | None = None
+    with _connect() as connection:
+        row = connection.execute(
+            'SELECT size, mtime_ns, digest, toc FROM toc WHERE key = ?',
+            (key, )).fetchone()
+        if row is None or row[0] != st.st_size:
+            return None, None
+        if row[1] != st.st_mtime_ns:
+            digest = _get_file_digest(filename)
+            if row[2] != digest:
+                return None, digest
+        connection.execute(
+            'UPDATE toc SET mtime_ns = ?, last_access = ? WHERE key = ?',
+            (st.st_mtime_ns, time.time(), key))
+
+    return row[3], digest
+
+
+def store(filename: str,
+          options: tuple,
+          toc: str,
+          st: os.stat_result,
+          digest: str | None = None):
+    r"""Save a TOC and remove the least recently used entries.
+
+    :parameter filename: the markdown file.
+    :parameter options: all the options that change the TOC.
+    :parameter toc: the TOC.
+    :parameter st: the status of the file before it was read.
+    :parameter digest: the content hash returned by ``lookup``. If ``None``
+        the file is hashed. Defaults to ``None``.
+    :type filename: str
+    :type options: tuple
+    :type toc: str
+    :type st: os.stat_result
+    :type digest: str
+    :returns: None
+    :rtype: None
+    :raises: a built-in exception.
+    """
+    key: str = _get_key(filename, options)
+    if digest is None:
+        digest = _get_file_digest(filename)
+    # Do not save TOCs of files changed while they were being read.
+    st_after = os.stat(filename)
+    if (st_after.st_size, st_after.st_mtime_ns) != (st.st_size,
+                                                    st.st_mtime_ns):
+        return
+
+    max_entries: int = common_defaults['cache']['max_entries']
+    with _connect() as connection:
+        connection.execute(
+            'INSERT OR REPLACE INTO toc VALUES (?, ?, ?, ?, ?, ?)',
+            (key, st.st_size, st.st_mtime_ns, digest, toc, time.time()))
+        entries: int = connection.execute(
+            'SELECT COUNT(*) FROM toc').fetchone()[0]
+        if entries > max_entries:
+            connection.execute(
+                'DELETE FROM toc WHERE key IN '
+                '(SELECT key FROM toc ORDER BY last_access LIMIT ?)',
+                (entries - max_entries, ))
+
+
+if __name__ == '__main__':
+    pass
@@ -25,9 +25,10 @@ import sys
 import textwrap
 from importlib import metadata
 
-from . import generic
+from . import cache, daemon, generic
 from .api import (
     build_multiple_tocs,
+    check_multiple_tocs,
     tocs_equal,
     write_strings_on_files_between_markers,
 )
@@ -38,7 +39,7 @@ PROGRAM_DESCRIPTION = 'Markdown Table Of Contents: Automatically generate a comp
 VERSION_NAME = 'md_toc'
 VERSION_COPYRIGHT = 'Copyright (C) 2017-2023 Franco Masotti, frnmst'
 VERSION_LICENSE = 'License GPLv3+: GNU GPL version 3 or later <http://gnu.org/licenses/gpl.html>\nThis is free software: you are free to change and redistribute it.\nThere is NO WARRANTY, to the extent permitted by law.'
-RETURN_VALUES = 'Return values: 0 ok, 1 error, 2 invalid command, 128 TOC differs from the one in the file (see --diff option)'
+RETURN_VALUES = 'Return values: 0 ok, 1 error, 2 invalid command, 128 TOC differs from the one in the file (see --diff and --check options)'
 
 try:
     VERSION_NUMBER = metadata.distribution('md_toc').version
@@ -48,6 +49,18 @@ except metadata.PackageNotFoundError:
 PROGRAM_EPILOG = RETURN_VALUES + '\n\n' + VERSION_COPYRIGHT + '\n' + VERSION_LICENSE
 
 
+def _non_negative_int(value: str) -> int:
+    # argparse reports the error as a usage error.
+    try:
+        number: int = int(value)
+    except ValueError:
+        number = -1
+    if number < 0:
+        raise argparse.ArgumentTypeError('must be a non-negative integer: ' +
+                                         repr(value))
+    return number
+
+
 class CliToApi():
     """An interface between the CLI and API functions."""
 
@@ -67,6 +80,35 @@ class CliToApi():
         if newline_string == r'\r\n':
             newline_string = '\r\n'
 
+        if args.clear_cache:
+            cache.clear()
+            # Do not wait for stdin.
+            if len(args.filename) == 0:
+                return False
+
+        if args.check:
+            checks = check_multiple_tocs(
+                filenames=args.filename,
+                marker=args.toc_marker,
+                ordered=ordered,
+                no_links=args.no_links,
+                no_indentation=args.no_indentation,
+                no_list_coherence=args.no_list_coherence,
+                keep_header_levels=args.header_levels,
+                parser=args.parser,
+                list_marker=list_marker,
+                skip_lines=args.skip_lines,
+                constant_ordered_list=args.constant_ordered_list,
+                newline_string=newline_string,
+                engine=args.engine,
+                jobs=args.jobs,
+                use_cache=args.cache,
+                fail_fast=args.fail_fast,
+            )
+            # Nothing is printed: only the return value tells if the TOCs
+            # differ.
+            return not all(checks)
+
         toc_struct = build_multiple_tocs(
             filenames=args.filename,
             ordered=ordered,
@@ -79,6 +121,9 @@ class CliToApi():
             skip_lines=args.skip_lines,
             constant_ordered_list=args.constant_ordered_list,
             newline_string=newline_string,
+            engine=args.engine,
+            jobs=args.jobs,
+            use_cache=args.cache,
         )
 
         equal: bool = True
@@ -104,6 +149,13 @@ class CliToApi():
         # was selected, i.e.: `args.diff`.
         return diff & args.diff
 
+    def serve(self, args):
+        """Run the daemon."""
+        if args.stdio:
+            daemon.serve_stdio()
+        else:
+            daemon.serve(args.socket)
+
 
 class CliInterface():
     """The interface exposed to the final user."""
@@ -112,6 +164,17 @@ class CliInterface():
         """Set the parser variable that will be used instead of using create_parser."""
         self.parser = self.create_parser()
 
+    def parse_args(self, args=None):
+        """Parse the arguments and reject the invalid combinations of options."""
+        args = self.parser.parse_args(args)
+        if args.fail_fast and not args.check:
+            self.parser.error('argument --fail-fast: requires --check')
+        # The serve subcommand has no file names.
+        if args.check and args.parser != 'serve':
+            if len(args.filename) == 0 or '-' in args.filename:
+                self.parser.error('argument --check: stdin cannot be checked')
+        return args
+
     def _add_filename_argument(self, parser):
         # The filename argument is common to all markdown parsers.
         # See commit b65cf32.
@@ -305,6 +368,33 @@ class CliInterface():
         redcarpet.set_defaults(header_levels=md_parser['redcarpet']['header']
                                ['default_keep_levels'], )
 
+        #########
+        # serve #
+        #########
+        serve = subparsers.add_parser(
+            'serve',
+            description='Keep md_toc loaded in memory and answer build_toc \
+                         and write_toc requests, one JSON object per line. \
+                         While the daemon listens on the default socket \
+                         md_toc commands that do not read from stdin are run \
+                         by the daemon. The common options are ignored.',
+        )
+        megroup = serve.add_mutually_exclusive_group()
+        megroup.add_argument(
+            '--socket',
+            metavar='SOCKET',
+            default=daemon.get_socket_file(),
+            help='the Unix socket to listen on. Defaults to ' +
+            daemon.get_socket_file(),
+        )
+        megroup.add_argument(
+            '--stdio',
+            action='store_true',
+            help='read the requests from stdin and write the responses to \
+                  stdout instead of using a socket',
+        )
+        serve.set_defaults(func=CliToApi().serve)
+
         ##########
         # Common #
         ##########
@@ -323,6 +413,17 @@ class CliInterface():
             help='avoids adding indentations to the TOC',
         )
 
+        parser.add_argument(
+            '--cache',
+            action='store_true',
+            help='get the TOCs of unchanged files from the cache in ' +
+            cache.get_cache_file() + ' and save the new ones there',
+        )
+        parser.add_argument(
+            '--clear-cache',
+            action='store_true',
+            help='remove all the cached TOCs before doing anything else',
+        )
         parser.add_argument(
             '-d',
             '--diff',
@@ -331,6 +432,42 @@ class CliInterface():
                 'returns 128 if the newly generated TOC differs from the one \
                   already existing in the file'),
         )
+        check_or_in_place = parser.add_mutually_exclusive_group()
+        check_or_in_place.add_argument(
+            '--check',
+            action='store_true',
+            help='like --diff but without printing the TOCs. The new TOC \
+                  of each file is compared line by line with the existing \
+                  one, stopping at the first difference. stdin cannot be \
+                  checked',
+        )
+        parser.add_argument(
+            '--fail-fast',
+            action='store_true',
+            help='do not check the other files once a TOC differs. \
+                  Requires --check',
+        )
+        parser.add_argument(
+            '-e',
+            '--engine',
+            choices=common_defaults['engines'],
+            default=common_defaults['engine'],
+            help=('the way input files are read. mmap keeps only the \
+                  lines that might be headings or code fences, which is \
+                  faster on large files. numpy does the same using numpy, \
+                  if installed with md_toc[fast]. stdin is always read with \
+                  readline. Defaults to ' + common_defaults['engine']),
+        )
+        parser.add_argument(
+            '-j',
+            '--jobs',
+            metavar='JOBS',
+            type=_non_negative_int,
+            default=1,
+            help='the number of processes used to build the TOCs of \
+                  multiple files, or to read the chunks of a single large \
+                  file. 0 uses all the available CPUs. Defaults to 1',
+        )
         parser.add_argument(
             '-l',
             '--no-links',
@@ -360,7 +497,7 @@ class CliInterface():
                   input file will be replaced with this value. \
                   Defaults to ' + repr(common_defaults['newline_string'])),
         )
-        parser.add_argument(
+        check_or_in_place.add_argument(
             '-p',
             '--in-place',
             action='store_true',
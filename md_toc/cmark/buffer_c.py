@@ -244,8 +244,7 @@ def _cmark_cmark_strbuf_drop(buf: _cmarkCmarkStrbuf, n: int):
         if buf.size:
             # Alternative to
             #     memmove(buf->ptr, buf->ptr + n, buf->size);
-            buf.ptr = ''.join(
-                [buf.ptr[:n], buf.ptr[n:buf.size + n], buf.ptr[n + buf.size:]])
+            buf.ptr = buf.ptr[n:]
 
     # No need for the terminator character.
     # buf->ptr[buf->size] = '\0';
@@ -285,20 +284,20 @@ def _cmark_cmark_strbuf_trim(buf: _cmarkCmarkStrbuf):
 def _cmark_cmark_strbuf_normalize_whitespace(s: _cmarkCmarkStrbuf):
     last_char_was_space: bool = False
     r: int = 0
-    w: int = 0
+    # Instead of writing in place.
+    w: list = list()
 
     for r in range(0, s.size):
         if _cmark_cmark_isspace(ord(s.ptr[r])):
             if not last_char_was_space:
-                s.ptr = s.ptr[0:w - 1] + ' ' + s.ptr[w + 1:]
-                w += 1
+                w.append(' ')
                 last_char_was_space = True
         else:
-            s.ptr = s.ptr[0:w - 1] + s.ptr[r] + s.ptr[w + 1:]
-            w += 1
+            w.append(s.ptr[r])
             last_char_was_space = False
 
-    _cmark_cmark_strbuf_truncate(s, w)
+    s.ptr = ''.join(w)
+    _cmark_cmark_strbuf_truncate(s, len(w))
 
 
 # 0.30
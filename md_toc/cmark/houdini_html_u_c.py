@@ -20,10 +20,10 @@
 #
 r"""A cmark implementation file."""
 
-import re
+import functools
+import string
 
 from ..constants import parser as md_parser
-from ..generic import _strncmp
 from .buffer_c import (
     _cmark_cmark_strbuf_grow,
     _cmark_cmark_strbuf_put,
@@ -39,37 +39,19 @@ from .utf8_c import _cmark_cmark_utf8proc_encode_char
 # See docs/copyright_license.rst
 
 
-# Recursive function of a binary search.
-# 0.30.
-def _cmark_S_lookup(i: int, low: int, hi: int, s: str, length: int) -> str:
-    j: int
-    cmp: int = _strncmp(
-        s, md_parser['cmark']['re']['ENTITIES']['entities'][i]['entity'],
-        length)
-    #  if (cmp == 0 && cmark_entities[i].entity[len] == 0) {
-    if cmp == 0 and length == len(
-            md_parser['cmark']['re']['ENTITIES']['entities'][i]['entity']):
-        return md_parser['cmark']['re']['ENTITIES']['entities'][i]['bytes']
-    elif cmp == -1 and i > low:
-        j = i - int((i - low) / 2)
-        if j == i:
-            j -= 1
-        return _cmark_S_lookup(j, low, i - 1, s, length)
-    elif cmp == 1 and i < hi:
-        j = i + int((hi - i) / 2)
-        if j == i:
-            j += 1
-        return _cmark_S_lookup(j, i + 1, hi, s, length)
-    else:
-        return None
+# Instead of the binary search over the sorted entities use a dict,
+# built on the first lookup.
+@functools.lru_cache(maxsize=None)
+def _cmark_get_entities() -> dict:
+    return {
+        e['entity']: e['bytes']
+        for e in md_parser['cmark']['re']['ENTITIES']['entities']
+    }
 
 
 # 0.30.
 def _cmark_S_lookup_entity(s: str, length: int):
-    return _cmark_S_lookup(
-        int(md_parser['cmark']['re']['ENTITIES']['CMARK_NUM_ENTITIES'] / 2), 0,
-        md_parser['cmark']['re']['ENTITIES']['CMARK_NUM_ENTITIES'] - 1, s,
-        length)
+    return _cmark_get_entities().get(s[:length])
 
 
 # 0.30.
@@ -82,10 +64,10 @@ def _cmark_houdini_unescape_ent(ob: _cmarkCmarkStrbuf, src: str,
         num_digits: int = 0
         max_digits: int = 7
 
-        if re.match(r'\d', src[1]):
+        if src[1] in string.digits:
 
             i = 1
-            while i < size and re.match(r'\d', src[i]):
+            while i < size and src[i] in string.digits:
                 codepoint = (codepoint * 10) + (ord(src[i]) - ord('0'))
 
                 if codepoint >= 0x110000:
@@ -100,7 +82,7 @@ def _cmark_houdini_unescape_ent(ob: _cmarkCmarkStrbuf, src: str,
 
         elif src[1] == 'x' or src[1] == 'X':
             i = 2
-            while i < size and re.match(r'[\dA-Fa-f]', src[i]):
+            while i < size and src[i] in string.hexdigits:
                 codepoint = (codepoint * 16) + ((ord(src[i]) | 32) % 39 - 9)
 
                 if codepoint >= 0x110000:
@@ -21,6 +21,7 @@
 r"""A cmark implementation file."""
 
 import copy
+import re
 
 from ..constants import parser as md_parser
 from ..generic import _replace_substring
@@ -61,7 +62,10 @@ from .node_c import (
     _cmark_cmark_node_unlink,
 )
 from .node_h import _cmarkCmarkNode
-from .references_c import _cmark_cmark_reference_lookup
+from .references_c import (
+    _cmark_cmark_reference_create,
+    _cmark_cmark_reference_lookup,
+)
 from .references_h import _cmarkCmarkReference, _cmarkCmarkReferenceMap
 from .scanners_h import (
     _cmark_scan_autolink_email,
@@ -103,6 +107,13 @@ MAXBACKTICKS = 1000
 FLAG_SKIP_HTML_CDATA = 1 << 0
 FLAG_SKIP_HTML_DECLARATION = 1 << 1
 FLAG_SKIP_HTML_PI = 1 << 2
+# "\r\n\\`&_*[]<!"
+# Characters outside of the 256 elements lookup table of the C source
+# code are special as well.
+SPECIAL_CHARS = re.compile(r'[\r\n\\`&_*\[\]<!\u0100-\U0010FFFF]')
+# The same plus " ' . -
+SPECIAL_OR_SMART_PUNCT_CHARS = re.compile(
+    r'''[\r\n\\`&_*\[\]<!"'.\-\u0100-\U0010FFFF]''')
 
 
 # 0.29, 0.30
@@ -419,6 +430,14 @@ def _cmark_advance(subj: _cmarkSubject):
     subj.pos += 1
 
 
+# Parse zero or more space characters, including at most one newline.
+# 0.30
+def _cmark_spnl(subj: _cmarkSubject):
+    _cmark_skip_spaces(subj)
+    if _cmark_skip_line_end(subj):
+        _cmark_skip_spaces(subj)
+
+
 def _cmark_skip_spaces(subj: _cmarkSubject) -> bool:
     skipped: bool = False
     while chr(_cmark_peek_char(subj)) == ' ' or chr(
@@ -1220,8 +1239,8 @@ def _cmark_cmark_clean_title(mem: _cmarkCmarkMem,
 def _cmark_link_label(subj: _cmarkSubject, raw_label: _cmarkCmarkChunk) -> int:
     startpos: int = subj.pos
     length: int = 0
-    c: int
-    no_match: bool = False
+    c: str
+    label: _cmarkCmarkChunk
 
     # advance past [
     if chr(_cmark_peek_char(subj)) == '[':
@@ -1230,7 +1249,7 @@ def _cmark_link_label(subj: _cmarkSubject, raw_label: _cmarkCmarkChunk) -> int:
         return 0
 
     c = chr(_cmark_peek_char(subj))
-    while c and c != '[' and c != ']':
+    while c != '\x00' and c != '[' and c != ']':
         if c == '\\':
             _cmark_advance(subj)
             length += 1
@@ -1242,24 +1261,27 @@ def _cmark_link_label(subj: _cmarkSubject, raw_label: _cmarkCmarkChunk) -> int:
             length += 1
 
         # MAX_LINK_LABEL_LENGTH is defined as 1000 while
-        # parser['cmark']['link']['max chars label'] is defined as 999.
+        # parser['cmark']['link']['max_chars_label'] is defined as 999.
         #     if (length > MAX_LINK_LABEL_LENGTH) {
-        if length > md_parser['cmark']['link']['max chars label'] + 1:
-            no_match = True
+        if length > md_parser['cmark']['link']['max_chars_label'] + 1:
+            #     goto noMatch;
+            break
 
         c = chr(_cmark_peek_char(subj))
 
-    if no_match:
-        subj.pos = startpos  # rewind
-        return 0
-    else:
-        if c == ']':  # match found
-            raw_label = _cmark_cmark_chunk_dup(subj.input, startpos + 1,
-                                               subj.pos - (startpos + 1))
-        _cmark_cmark_chunk_trim(raw_label)
+    if c == ']':  # match found
+        # raw_label is an output parameter in C.
+        label = _cmark_cmark_chunk_dup(subj.input, startpos + 1,
+                                       subj.pos - (startpos + 1))
+        _cmark_cmark_chunk_trim(label)
+        raw_label.data = label.data
+        raw_label.length = label.length
         _cmark_advance(subj)  # advance past ]
         return 1
 
+    subj.pos = startpos  # rewind
+    return 0
+
 
 # 0.30
 def _cmark_manual_scan_link_url_2(input: _cmarkCmarkChunk,
@@ -1519,544 +1541,89 @@ def _cmark_handle_newline(subj: _cmarkSubject) -> _cmarkCmarkNode:
 
 # 0.29, 0.30
 def _cmark_subject_find_special_char(subj: _cmarkSubject, options: int) -> int:
-    # "\r\n\\`&_*[]<!"
-    SPECIAL_CHARS: list = [
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        1,
-        0,
-        0,
-        1,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        1,
-        0,
-        0,
-        0,
-        0,
-        1,
-        0,
-        0,
-        0,
-        1,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        1,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        1,
-        1,
-        1,
-        0,
-        1,
-        1,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-    ]
+    # Instead of looping over the SPECIAL_CHARS and SMART_PUNCT_CHARS
+    # lookup tables jump to the next special character.
+    special_chars: re.Pattern = SPECIAL_CHARS
+    if options & CMARK_OPT_SMART:
+        special_chars = SPECIAL_OR_SMART_PUNCT_CHARS
 
-    # " ' . -
-    SMART_PUNCT_CHARS: list = [
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        1,
-        0,
-        0,
-        0,
-        0,
-        1,
-        0,
-        0,
-        0,
-        0,
-        0,
-        1,
-        1,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-    ]
+    m = special_chars.search(subj.input.data, subj.pos + 1, subj.input.length)
+    if m is None:
+        return subj.input.length
+    return m.start()
 
-    n: int = subj.pos + 1
 
-    while n < subj.input.length:
-        # Patch to avoid overflow problems.
-        # FIXME: this should not be needed!
-        # These two are not present in the original C source code.
-        if (ord(subj.input.data[n]) > len(SPECIAL_CHARS)
-                or ord(subj.input.data[n]) > len(SMART_PUNCT_CHARS)):
-            return n
+def _cmark_handle_open_bracket(subj: _cmarkSubject) -> _cmarkCmarkNode:
+    _cmark_advance(subj)
+    new_inl: _cmarkCmarkNode = _cmark_make_str(subj, subj.pos - 1,
+                                               subj.pos - 1,
+                                               _cmark_cmark_chunk_literal('['))
+    _cmark_push_bracket(subj, False, new_inl)
+    return new_inl
 
-        if SPECIAL_CHARS[ord(subj.input.data[n])] == 1:
-            return n
-        if options & CMARK_OPT_SMART and SMART_PUNCT_CHARS[ord(
-                subj.input.data[n])]:
-            return n
-        n += 1
 
-    return subj.input.length
+def _cmark_handle_bang(subj: _cmarkSubject) -> _cmarkCmarkNode:
+    new_inl: _cmarkCmarkNode
+    _cmark_advance(subj)
+    if _cmark_peek_char(subj) == '[':
+        _cmark_advance(subj)
+        new_inl = _cmark_make_str(subj, subj.pos - 2, subj.pos - 1,
+                                  _cmark_cmark_chunk_literal('!['))
+        _cmark_push_bracket(subj, True, new_inl)
+    else:
+        new_inl = _cmark_make_str(subj, subj.pos - 1, subj.pos - 1,
+                                  _cmark_cmark_chunk_literal('!'))
+    return new_inl
+
+
+# The returned inline is not added to the parent.
+def _cmark_handle_close_bracket_no_inline(subj: _cmarkSubject,
+                                          ignore: list) -> None:
+    _cmark_handle_close_bracket(subj, ignore)
+
+
+# Instead of the switch statement of the C source code.
+# Each handler gets the subject, the current character, the options and
+# the ignore list and returns the new inline, if any.
+INLINE_HANDLERS: dict = {
+    '\r':
+    lambda subj, c, options, ignore: _cmark_handle_newline(subj),
+    '\n':
+    lambda subj, c, options, ignore: _cmark_handle_newline(subj),
+    '`':
+    lambda subj, c, options, ignore: _cmark_handle_backticks(subj, options),
+    '\\':
+    lambda subj, c, options, ignore: _cmark_handle_backslash(subj),
+    '&':
+    lambda subj, c, options, ignore: _cmark_handle_entity(subj),
+    '<':
+    lambda subj, c, options, ignore: _cmark_handle_pointy_brace(subj, options),
+    '*':
+    lambda subj, c, options, ignore: _cmark_handle_delim(
+        subj, c, (options & CMARK_OPT_SMART) != 0),
+    '_':
+    lambda subj, c, options, ignore: _cmark_handle_delim(
+        subj, c, (options & CMARK_OPT_SMART) != 0),
+    '\'':
+    lambda subj, c, options, ignore: _cmark_handle_delim(
+        subj, c, (options & CMARK_OPT_SMART) != 0),
+    '"':
+    lambda subj, c, options, ignore: _cmark_handle_delim(
+        subj, c, (options & CMARK_OPT_SMART) != 0),
+    '-':
+    lambda subj, c, options, ignore: _cmark_handle_hyphen(
+        subj, (options & CMARK_OPT_SMART) != 0),
+    '.':
+    lambda subj, c, options, ignore: _cmark_handle_period(
+        subj, (options & CMARK_OPT_SMART) != 0),
+    '[':
+    lambda subj, c, options, ignore: _cmark_handle_open_bracket(subj),
+    ']':
+    lambda subj, c, options, ignore: _cmark_handle_close_bracket_no_inline(
+        subj, ignore),
+    '!':
+    lambda subj, c, options, ignore: _cmark_handle_bang(subj),
+}
 
 
 # Parse an inline, advancing subject, and add it as a child of parent.
@@ -2076,40 +1643,8 @@ def _cmark_parse_inline(subj: _cmarkSubject,
     c = _cmark_peek_char(subj)
     if c == 0:
         return 0
-    elif chr(c) in ['\r', '\n']:
-        new_inl = _cmark_handle_newline(subj)
-    elif chr(c) in ['`']:
-        new_inl = _cmark_handle_backticks(subj, options)
-    elif chr(c) in ['\\']:
-        new_inl = _cmark_handle_backslash(subj)
-    elif chr(c) in ['&']:
-        new_inl = _cmark_handle_entity(subj)
-    elif chr(c) in ['<']:
-        new_inl = _cmark_handle_pointy_brace(subj, options)
-    elif chr(c) in ['*', '_', '\'', '"']:
-        new_inl = _cmark_handle_delim(subj, chr(c),
-                                      (options & CMARK_OPT_SMART) != 0)
-    elif chr(c) in ['-']:
-        new_inl = _cmark_handle_hyphen(subj, (options & CMARK_OPT_SMART) != 0)
-    elif chr(c) in ['.']:
-        new_inl = _cmark_handle_period(subj, (options & CMARK_OPT_SMART) != 0)
-    elif chr(c) in ['[']:
-        _cmark_advance(subj)
-        new_inl = _cmark_make_str(subj, subj.pos - 1, subj.pos - 1,
-                                  _cmark_cmark_chunk_literal('['))
-        _cmark_push_bracket(subj, False, new_inl)
-    elif chr(c) in [']']:
-        _cmark_handle_close_bracket(subj, ignore)
-    elif chr(c) in ['!']:
-        _cmark_advance(subj)
-        if _cmark_peek_char(subj) == '[':
-            _cmark_advance(subj)
-            new_inl = _cmark_make_str(subj, subj.pos - 2, subj.pos - 1,
-                                      _cmark_cmark_chunk_literal('!['))
-            _cmark_push_bracket(subj, True, new_inl)
-        else:
-            new_inl = _cmark_make_str(subj, subj.pos - 1, subj.pos - 1,
-                                      _cmark_cmark_chunk_literal('!'))
+    elif chr(c) in INLINE_HANDLERS:
+        new_inl = INLINE_HANDLERS[chr(c)](subj, chr(c), options, ignore)
     else:
         endpos = _cmark_subject_find_special_char(subj, options)
         contents = _cmark_cmark_chunk_dup(subj.input, subj.pos,
@@ -2161,5 +1696,74 @@ def _cmark_cmark_parse_inlines(
     return ignore
 
 
+# Parse reference.  Assumes string begins with '[' character.
+# Modify refmap if a reference is encountered.
+# Return 0 if no reference found, otherwise position of subject
+# after reference is parsed.
+# 0.30
+def _cmark_cmark_parse_reference_inline(
+    mem: _cmarkCmarkMem,
+    input: _cmarkCmarkChunk,
+    refmap: _cmarkCmarkReferenceMap,
+) -> int:
+    subj: _cmarkSubject = _cmarkSubject()
+    lab: _cmarkCmarkChunk = _cmark_cmark_chunk_literal('')
+    url: _cmarkCmarkChunk
+    title: _cmarkCmarkChunk
+    matchlen: int = 0
+    beforetitle: int
+
+    _cmark_subject_from_buf(mem, -1, 0, subj, input, None)
+
+    # parse label:
+    if not _cmark_link_label(subj, lab) or lab.length == 0:
+        return 0
+
+    # colon:
+    if chr(_cmark_peek_char(subj)) == ':':
+        _cmark_advance(subj)
+    else:
+        return 0
+
+    # parse link url:
+    _cmark_spnl(subj)
+    matchlen, url = _cmark_manual_scan_link_url(subj.input, subj.pos)
+    if matchlen > -1:
+        subj.pos += matchlen
+    else:
+        return 0
+
+    # parse optional link_title
+    beforetitle = subj.pos
+    _cmark_spnl(subj)
+    if subj.pos == beforetitle:
+        matchlen = 0
+    else:
+        matchlen = _cmark_scan_link_title(subj.input, subj.pos)
+    if matchlen:
+        title = _cmark_cmark_chunk_dup(subj.input, subj.pos, matchlen)
+        subj.pos += matchlen
+    else:
+        subj.pos = beforetitle
+        title = _cmark_cmark_chunk_literal('')
+
+    # parse final spaces and newline:
+    _cmark_skip_spaces(subj)
+    if not _cmark_skip_line_end(subj):
+        if matchlen:  # try rewinding before title
+            subj.pos = beforetitle
+            _cmark_skip_spaces(subj)
+            if not _cmark_skip_line_end(subj):
+                return 0
+        else:
+            return 0
+
+    # insert reference into refmap
+    _cmark_cmark_reference_create(refmap, lab,
+                                  _cmark_cmark_clean_url(mem, url),
+                                  _cmark_cmark_clean_title(mem, title))
+    return subj.pos
+
+
 if __name__ == '__main__':
     pass
@@ -87,11 +87,7 @@ class _cmarkCmarkNode:
         'internal_offset',
         'type',
         'flags',
-        'as_list',
-        'as_code',
-        'as_heading',
-        'as_link',
-        'as_custom',
+        '_as',
         'as_html_block_type',
         'numdelims',
     ]
@@ -118,17 +114,40 @@ class _cmarkCmarkNode:
         self.type: int = 0
         self.flags: int = 0
 
-        # "as" union.
-        self.as_list: _cmarkCmarkList = _cmarkCmarkList()
-        self.as_code: _cmarkCmarkCode = _cmarkCmarkCode()
-        self.as_heading: _cmarkCmarkHeading = _cmarkCmarkHeading()
-        self.as_link: _cmarkCmarkLink = _cmarkCmarkLink()
-        self.as_custom: _cmarkCmarkCustom = _cmarkCmarkCustom()
+        # "as" union. Most nodes are text and do not use it, so the
+        # member is created on first access only.
+        self._as = None
         self.as_html_block_type: int = 0
 
         # Add a new variable.
         self.numdelims: int = 0
 
+    def _get_as(self, cls: type):
+        # Only one member of the union is kept at a time.
+        if type(self._as) is not cls:
+            self._as = cls()
+        return self._as
+
+    @property
+    def as_list(self) -> _cmarkCmarkList:
+        return self._get_as(_cmarkCmarkList)
+
+    @property
+    def as_code(self) -> _cmarkCmarkCode:
+        return self._get_as(_cmarkCmarkCode)
+
+    @property
+    def as_heading(self) -> _cmarkCmarkHeading:
+        return self._get_as(_cmarkCmarkHeading)
+
+    @property
+    def as_link(self) -> _cmarkCmarkLink:
+        return self._get_as(_cmarkCmarkLink)
+
+    @property
+    def as_custom(self) -> _cmarkCmarkCustom:
+        return self._get_as(_cmarkCmarkCustom)
+
 
 if __name__ == '__main__':
     pass
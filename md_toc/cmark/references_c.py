@@ -20,8 +20,6 @@
 #
 r"""A cmark implementation file."""
 
-import functools
-
 from ..constants import parser as md_parser
 from .buffer_c import (
     _cmark_cmark_strbuf_detach,
@@ -60,7 +58,7 @@ def _cmark_normalize_reference(mem: _cmarkCmarkMem,
     _cmark_cmark_strbuf_normalize_whitespace(normalized)
 
     result = _cmark_cmark_strbuf_detach(normalized)
-    if not result:
+    if result is None:
         raise ValueError
 
     #     if result[0] == '\0':
@@ -72,44 +70,37 @@ def _cmark_normalize_reference(mem: _cmarkCmarkMem,
     return result
 
 
-def _cmark_labelcmp(a: str, b: str) -> bool:
-    return a == b
-
-
-def _cmark_refcmp(p1: _cmarkCmarkReference, p2: _cmarkCmarkReference) -> int:
-    res: bool = _cmark_labelcmp(p1.label, p2.label)
-
-    if res:
-        return res
-    else:
-        return p1.age - p2.age
-
-
-def _cmark_sort_references(maps: _cmarkCmarkReferenceMap):
-    i: int
-    last: int = 0
-    size: int = maps.size
-    r: _cmarkCmarkReference = maps.refs
+# The URL and the title must already be cleaned: cmark_clean_url and
+# cmark_clean_title are in inlines_c which imports this module.
+# 0.30
+def _cmark_cmark_reference_create(
+    maps: _cmarkCmarkReferenceMap,
+    label: _cmarkCmarkChunk,
+    url: str,
+    title: str,
+):
+    ref: _cmarkCmarkReference
+    reflabel: str = _cmark_normalize_reference(maps.mem, label)
 
-    #     **sorted = NULL;
-    # A list of _cmarkCmarkReference
-    srt: list = list()
+    # empty reference name, or composed from only whitespace
+    if reflabel is None:
+        return
 
-    #     sorted = (cmark_reference **)maps->mem->calloc(size, sizeof(cmark_reference *));
-    while (r):
-        srt.append(r)
-        r = r.next
+    # The first definition of a label wins.
+    if reflabel in maps.refs:
+        return
 
-    #     qsort(sorted, size, sizeof(cmark_reference *), refcmp);
-    srt = sorted(srt, key=functools.cmp_to_key(_cmark_refcmp))
+    ref = _cmarkCmarkReference()
+    ref.label = reflabel
+    ref.url = url
+    ref.title = title
 
-    for i in range(1, size):
-        if _cmark_labelcmp(srt[i].label, srt[last].label) != 0:
-            last += 1
-            srt[last] = srt[i]
+    if ref.url is not None:
+        ref.size += len(ref.url)
+    if ref.title is not None:
+        ref.size += len(ref.title)
 
-    maps.sorted = srt
-    maps.size = last + 1
+    maps.refs[reflabel] = ref
 
 
 # Returns reference if refmaps contains a reference with matching
@@ -119,8 +110,6 @@ def _cmark_cmark_reference_lookup(
     maps: _cmarkCmarkReferenceMap,
     label: _cmarkCmarkChunk,
 ) -> _cmarkCmarkReference:
-    # A list of _cmarkCmarkReference
-    ref: list = None
     r: _cmarkCmarkReference = None
     norm: str
 
@@ -129,29 +118,23 @@ def _cmark_cmark_reference_lookup(
             'max_chars_label'] + 1:
         return None
 
-    if maps is None or not maps.size:
+    if maps is None or not maps.refs:
         return None
 
     norm = _cmark_normalize_reference(maps.mem, label)
     if norm is None:
         return None
 
-    if not maps.sorted:
-        _cmark_sort_references(maps)
-
-    # TODO
-    #      ref = (cmark_reference **)bsearch(norm, maps->sorted, maps->size, sizeof(cmark_reference *),
-    #                    refsearch);
-    # FIXME
+    r = maps.refs.get(norm)
 
-    #     maps->mem->free(norm);
-    del norm
-
-    if ref is not None:
-        r = ref[0]
+    if r is not None:
         # Check for expansion limit
         if maps.max_ref_size and r.size > maps.max_ref_size - maps.ref_size:
             return None
         maps.ref_size += r.size
 
     return r
+
+
+if __name__ == '__main__':
+    pass
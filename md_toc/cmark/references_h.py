@@ -30,20 +30,16 @@ from .cmark_h import _cmarkCmarkMem
 # 0.30
 class _cmarkCmarkReference:
     __slots__ = [
-        'next',
         'label',
         'url',
         'title',
-        'age',
         'size',
     ]
 
     def __init__(self):
-        self.next: _cmarkCmarkReference = None
         self.label: str = None
         self.url: str = None
         self.title: str = None
-        self.age: int = 0
         self.size: int = 0
 
 
@@ -52,19 +48,18 @@ class _cmarkCmarkReferenceMap:
     __slots__ = [
         'mem',
         'refs',
-        'sorted',
-        'size',
         'ref_size',
         'max_ref_size',
     ]
 
     def __init__(self):
         self.mem: _cmarkCmarkMem = None
-        self.refs: _cmarkCmarkReference = None
-        # A list of _cmarkCmarkReference
-        self.sorted: list = None
-        self.size: int = 0
+        # Instead of the linked list, sorted and searched with bsearch,
+        # of the C source code: a dict of _cmarkCmarkReference indexed by
+        # the normalized label.
+        self.refs: dict = dict()
         self.ref_size: int = 0
+        # 0 means no limit.
         self.max_ref_size: int = 0
 
 
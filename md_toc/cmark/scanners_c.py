@@ -22,6 +22,7 @@ r"""A cmark implementation file."""
 
 import copy
 import re
+import typing
 
 from ..constants import parser as md_parser
 from .chunk_h import _cmarkCmarkChunk
@@ -35,9 +36,35 @@ from .chunk_h import _cmarkCmarkChunk
 # The original C source states:
 # /* Generated by re2c 1.3 */
 
+# Patterns are compiled once and matched at the current position, without
+# copying the rest of the subject.
+_cmark_SPACECHARS = re.compile(
+    md_parser['cmark']['_scanners.re']['spacechar'] + '+')
+# Link titles in double quotes, single quotes or parentheses.
+_cmark_LINK_TITLE = re.compile('(' + '|'.join([
+    '["](' + md_parser['cmark']['_scanners.re']['escaped_char'] +
+    '|[^"\u0000])*["]',
+    "['](" + md_parser['cmark']['_scanners.re']['escaped_char'] +
+    "|[^'\u0000])*[']",
+    r'[\(](' + md_parser['cmark']['_scanners.re']['escaped_char'] +
+    r"|[^\(\)\u0000])*[']",
+]) + ')')
+_cmark_AUTOLINK_URI = re.compile('[:][^\x00-\x20<>]*[>]')
+_cmark_AUTOLINK_EMAIL = re.compile(
+    '[a-zA-Z0-9.!#$%&\'*+/=?^_`{|}~-]+[@][a-zA-Z0-9]([a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?([.][a-zA-Z0-9]([a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?)*[>]'
+)
+_cmark_HTML_COMMENT = re.compile(
+    md_parser['cmark']['_scanners.re']['htmlcomment'])
+_cmark_CDATA = re.compile(md_parser['cmark']['_scanners.re']['cdata'])
+_cmark_HTML_TAG = re.compile(md_parser['cmark']['_scanners.re']['htmltag'])
+_cmark_HTML_DECLARATION = re.compile(
+    md_parser['cmark']['_scanners.re']['declaration'])
+_cmark_HTML_PI = re.compile(
+    md_parser['cmark']['_scanners.re']['processinginstruction'])
+
 
 def _cmark__scan_at(
-    scanner_function_name: str,
+    scanner: typing.Callable[[str, int], int],
     c: _cmarkCmarkChunk,
     offset: int,
 ) -> int:
@@ -50,98 +77,58 @@ def _cmark__scan_at(
         #     lim: str = ptr[c.length]
 
         #     ptr[c.length] = '\0'
-        if scanner_function_name == '_cmark__scan_spacechars':
-            res = _cmark__scan_spacechars(ptr, offset)
-        if scanner_function_name == '_cmark__scan_link_title':
-            res = _cmark__scan_link_title(ptr, offset)
-        if scanner_function_name == '_cmark__scan_autolink_uri':
-            res = _cmark__scan_autolink_uri(ptr, offset)
-        if scanner_function_name == '_cmark__scan_autolink_email':
-            res = _cmark__scan_autolink_email(ptr, offset)
-        if scanner_function_name == '_cmark__scan_html_comment':
-            res = _cmark__scan_html_comment(ptr, offset)
-        if scanner_function_name == '_cmark__scan_cdata':
-            res = _cmark__scan_cdata(ptr, offset)
-        if scanner_function_name == '_cmark__scan_html_tag':
-            res = _cmark__scan_html_tag(ptr, offset)
-        if scanner_function_name == '_cmark__scan_html_declaration':
-            res = _cmark__scan_html_declaration(ptr, offset)
-        if scanner_function_name == '_cmark__scan_html_pi':
-            res = _cmark__scan_html_pi(ptr, offset)
+        res = scanner(ptr, offset)
 
         #     ptr[c.length] = lim
 
     return res
 
 
-def _common_scan(regex: str, ptr: str, p: int) -> int:
-    start_match: int = 0
-    end_match: int = 0
-    retval: int
-
-    span = re.match(regex, ptr[p:])
-    if span:
-        ll = list(span.span())
-        start_match = ll[0]
-        end_match = ll[1]
-        retval = end_match - start_match
-    else:
-        retval = 0
-
-    return retval
+def _common_scan(regex: re.Pattern, ptr: str, p: int) -> int:
+    m = regex.match(ptr, p)
+    if m is None:
+        return 0
+    return m.end() - p
 
 
 # Try to match a link title (in single quotes, in double quotes, or
 # in parentheses), returning number of chars matched.  Allow one
 # level of internal nesting (quotes within quotes).
 def _cmark__scan_link_title(ptr: str, p: int) -> int:
-    r1 = '["](' + md_parser['cmark']['_scanners.re'][
-        'escaped_char'] + '|[^"\u0000])*["]'
-    r2 = "['](" + md_parser['cmark']['_scanners.re'][
-        'escaped_char'] + "|[^'\u0000])*[']"
-    r3 = r'[\(](' + md_parser['cmark']['_scanners.re'][
-        'escaped_char'] + r"|[^\(\)\u0000])*[']"
-    r = '(' + r1 + '|' + r2 + '|' + r3 + ')'
-    return _common_scan(r, ptr, p)
+    return _common_scan(_cmark_LINK_TITLE, ptr, p)
 
 
 # Match SOME space characters, including newlines.
 def _cmark__scan_spacechars(ptr: str, p: int) -> int:
-    return _common_scan(md_parser['cmark']['_scanners.re']['spacechar'] + '+',
-                        ptr, p)
+    return _common_scan(_cmark_SPACECHARS, ptr, p)
 
 
 # Try to match URI autolink after first <, returning number of chars matched.
 def _cmark__scan_autolink_uri(ptr: str, p: int) -> int:
-    return _common_scan('[:][^\x00-\x20<>]*[>]', ptr, p)
+    return _common_scan(_cmark_AUTOLINK_URI, ptr, p)
 
 
 # Try to match email autolink after first <, returning num of chars matched.
 def _cmark__scan_autolink_email(ptr: str, p: int) -> int:
-    return _common_scan(
-        '[a-zA-Z0-9.!#$%&\'*+/=?^_`{|}~-]+[@][a-zA-Z0-9]([a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?([.][a-zA-Z0-9]([a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?)*[>]',
-        ptr, p)
+    return _common_scan(_cmark_AUTOLINK_EMAIL, ptr, p)
 
 
 def _cmark__scan_html_comment(ptr: str, p: int) -> int:
-    return _common_scan(md_parser['cmark']['_scanners.re']['htmlcomment'], ptr,
-                        p)
+    return _common_scan(_cmark_HTML_COMMENT, ptr, p)
 
 
 def _cmark__scan_cdata(ptr: str, p: int) -> int:
-    return _common_scan(md_parser['cmark']['_scanners.re']['cdata'], ptr, p)
+    return _common_scan(_cmark_CDATA, ptr, p)
 
 
 # Try to match an HTML tag after first <, returning num of chars matched.
 def _cmark__scan_html_tag(ptr: str, p: int) -> int:
-    return _common_scan(md_parser['cmark']['_scanners.re']['htmltag'], ptr, p)
+    return _common_scan(_cmark_HTML_TAG, ptr, p)
 
 
 def _cmark__scan_html_declaration(ptr: str, p: int) -> int:
-    return _common_scan(md_parser['cmark']['_scanners.re']['declaration'], ptr,
-                        p)
+    return _common_scan(_cmark_HTML_DECLARATION, ptr, p)
 
 
 def _cmark__scan_html_pi(ptr: str, p: int) -> int:
-    return _common_scan(
-        md_parser['cmark']['_scanners.re']['processinginstruction'], ptr, p)
+    return _common_scan(_cmark_HTML_PI, ptr, p)
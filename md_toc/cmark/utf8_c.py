@@ -20,10 +20,11 @@
 #
 r"""A cmark implementation file."""
 
+import functools
 import unicodedata
 
 from ..constants import parser as md_parser
-from .buffer_c import _cmark_cmark_strbuf_put
+from .buffer_c import _cmark_cmark_strbuf_put, _cmark_cmark_strbuf_puts
 from .buffer_h import _cmarkCmarkStrbuf
 from .cmark_ctype_c import _cmark_cmark_ispunct
 
@@ -139,30 +140,29 @@ def _cmark_cmark_utf8proc_encode_char(uc: int, buf: _cmarkCmarkStrbuf):
     _cmark_cmark_strbuf_put(buf, dst, length)
 
 
+@functools.lru_cache(maxsize=None)
+def _cmark_case_fold_char(c: str) -> str:
+    # Folding can return more than one character, for example
+    # 'ß'.casefold() == 'ss'.
+    return unicodedata.normalize('NFC', c).casefold()
+
+
 # 0.30
 def _cmark_cmark_utf8proc_case_fold(
     dest: _cmarkCmarkStrbuf,
     string: str,
     length: int,
 ):
-    c: int
-
-    while (length > 0):
-        char_len, c = _cmark_cmark_utf8proc_iterate(string, length)
-
-        if char_len >= 0:
-            # FIXME: unsure about this. See original C source code.
-            _cmark_cmark_utf8proc_encode_char(
-                ord(unicodedata.normalize('NFC', chr(c)).casefold()), dest)
-        else:
-            _cmark_encode_unknown(dest)
-            char_len = -char_len
-
-        # Advance pointer.
-        #     str += char_len;
-        string = string[char_len:]
-        # Reduce string length.
-        length -= char_len
+    # In Python 3 all characters have length 1 so
+    # _cmark_cmark_utf8proc_iterate never fails and the string is folded
+    # in one pass instead of advancing it one character at a time.
+    string = string[:length]
+    if string.isascii():
+        # Same as folding each character.
+        _cmark_cmark_strbuf_puts(dest, string.lower())
+    else:
+        _cmark_cmark_strbuf_puts(
+            dest, ''.join([_cmark_case_fold_char(c) for c in string]))
 
 
 # 0.29, 0.30
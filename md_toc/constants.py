@@ -20,30 +20,73 @@
 #
 """A file that contains all the global constants."""
 
+import collections.abc
 import copy
-import html
 import os
 import typing
 
+
+class _Entities(collections.abc.Sequence):
+    r"""The sorted list of HTML5 entities, built on first use.
+
+    Each element is a ``dict`` with the entity name without the semicolon,
+    ``entity``, and its UTF-8 encoding terminated by ``0``, ``bytes``.
+    Copies, deep ones included, share the same list.
+    """
+
+    def __init__(self):
+        self._entities: typing.Optional[list] = None
+
+    def _get(self) -> list:
+        if self._entities is None:
+            # Importing html.entities is slow as well.
+            import html.entities
+
+            # Use a list instead of a class for simplicity.
+            # For this reason the cmark/entities.inc file is missing.
+            # remove keys without semicolons.  For some reason the list
+            # has duplicates of a few things, like auml, one with and one
+            # without a semicolon.
+            names: list = sorted(
+                [k[:-1] for k in html.entities.html5.keys() if k[-1] == ';'])
+            self._entities = list()
+            for ent in names:
+                bs: bytes = html.entities.html5[ent + ';'].encode('utf-8')
+                self._entities.append({
+                    'entity': ent,
+                    'bytes': list(bs) + [0],
+                })
+        return self._entities
+
+    def __getitem__(self, i):
+        return self._get()[i]
+
+    def __len__(self) -> int:
+        return len(self._get())
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo: dict):
+        return self
+
+
+class _EntitiesConstants(dict):
+    r"""The constants of the HTML5 entities.
+
+    ``CMARK_NUM_ENTITIES`` is the length of ``entities``, so it is only
+    computed when it is used.
+    """
+
+    def __missing__(self, key: str):
+        if key == 'CMARK_NUM_ENTITIES':
+            return len(self['entities'])
+        raise KeyError(key)
+
+
 # License C applies to the cmark entities part.
 # See docs/copyright_license.rst
-_entities5 = html.entities.html5
-# remove keys without semicolons.  For some reason the list
-# has duplicates of a few things, like auml, one with and one
-# without a semicolon.
-_ents = sorted([(k[:-1], _entities5[k].encode('utf-8'))
-                for k in _entities5.keys() if k[-1] == ';'])
-
-# Use a list instead of a class for simplicity.
-# For this reason the cmark/entities.inc file is missing.
-_entities: list = list()
-for (ent, bs) in _ents:
-    _entities.append({
-        'entity': ent,
-        'bytes': (' '.join(map(str, bs)) + ' 0').split(' ')
-    })
-    # Transform each entity into a list of integers from a list of strings.
-    _entities[-1]['bytes'] = [int(n) for n in _entities[-1]['bytes']]
+_entities: _Entities = _Entities()
 
 # Regular expressions related to scanners functions.
 # See scanners.re and scanners.c files.
@@ -62,6 +105,30 @@ __cmark_closetag = '[/]' + __cmark_tagname + __cmark_spacechar + '*[>]'
 common_defaults: dict = {
     'toc_marker': '<!--TOC-->',
     'newline_string': os.linesep,
+    # readline: read the file line by line in text mode.
+    # mmap: memory map the file and decode only the lines which might be
+    #       ATX headings or code fences.
+    # numpy: like mmap, finding those lines with numpy if it is installed.
+    'engines': ['readline', 'mmap', 'numpy'],
+    'engine': 'readline',
+    # Files are read by more processes only if each one gets a chunk of at
+    # least this many bytes.
+    'min_chunk_size': 8 * 1024 * 1024,
+    # The lines after an opening front matter delimiter are kept in memory
+    # until the closing one. Without a closing delimiter within this many
+    # lines the front matter is part of the document.
+    'max_front_matter_lines': 1024,
+    # The lines of a paragraph are kept in memory until it ends, since an
+    # underline makes it a setext heading. Longer paragraphs are not
+    # headings.
+    'max_paragraph_lines': 1024,
+    # Longer anchor links are counted by their checksum to find duplicates.
+    'max_anchor_link_key_length': 64,
+    'cache': {
+        'filename': 'toc.sqlite3',
+        # Least recently used entries are removed over this limit.
+        'max_entries': 65536,
+    },
 }
 
 parser: dict = {
@@ -94,59 +161,104 @@ parser: dict = {
             },
             'min_marker_characters': 3,
         },
+        # See https://spec.commonmark.org/0.30/#html-blocks
+        'html_block': {
+            # Start condition 1: these blocks may contain blank lines.
+            'verbatim_tags': ['pre', 'script', 'style', 'textarea'],
+            # Start condition 6.
+            'block_tags': [
+                'address', 'article', 'aside', 'base', 'basefont',
+                'blockquote', 'body', 'caption', 'center', 'col', 'colgroup',
+                'dd', 'details', 'dialog', 'dir', 'div', 'dl', 'dt',
+                'fieldset', 'figcaption', 'figure', 'footer', 'form', 'frame',
+                'frameset', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'head',
+                'header', 'hr', 'html', 'iframe', 'legend', 'li', 'link',
+                'main', 'menu', 'menuitem', 'nav', 'noframes', 'ol',
+                'optgroup', 'option', 'p', 'param', 'section', 'summary',
+                'table', 'tbody', 'td', 'tfoot', 'th', 'thead', 'title', 'tr',
+                'track', 'ul'
+            ],
+        },
+        # Front matter is not part of the specification: only the opening
+        # delimiter is listed, the closing one is the same.
+        'front_matter': {
+            'delimiters': [],
+        },
         # Regular expressions related to entities functions.
         # See make_entities_inc.py and entities.inc files.
         're': {
-            'ENTITIES': {
+            'ENTITIES':
+            _EntitiesConstants({
                 'CMARK_ENTITY_MIN_LENGTH': 2,
                 'CMARK_ENTITY_MAX_LENGTH': 32,
-                'CMARK_NUM_ENTITIES': len(_entities),
                 'entities': _entities,
-            },
+            }),
             # [0.30] only.
-            'SPACETAB': '[\u0009\u0020]',
+            'SPACETAB':
+            '[\u0009\u0020]',
             # Line ending.
-            'LE': '(\u000a|\u000d|\u000d\u000a)',
+            'LE':
+            '(\u000a|\u000d|\u000d\u000a)',
 
             # See https://spec.commonmark.org/0.28/#raw-html
             # 1. Open tag and 2. close tag.
-            'DQAV': __cmark_doublequotedvalue,
-            'SQAV': __cmark_singlequotedvalue,
-            'UAV': __cmark_unquotedvalue,
+            'DQAV':
+            __cmark_doublequotedvalue,
+            'SQAV':
+            __cmark_singlequotedvalue,
+            'UAV':
+            __cmark_unquotedvalue,
 
             # 2.
-            'AN': __cmark_attributename,
-            'TN': __cmark_tagname,
+            'AN':
+            __cmark_attributename,
+            'TN':
+            __cmark_tagname,
 
             # 3. HTML comment.
-            'COS': '<!--',
-            'COT': '((?!>|->)(?:(?!--).))+(?!-).?',
-            'COE': '-->',
+            'COS':
+            '<!--',
+            'COT':
+            '((?!>|->)(?:(?!--).))+(?!-).?',
+            'COE':
+            '-->',
 
             # 4. Processing instructions.
-            'PIS': r'<\?',
-            'PIB': r'(?:(?!\?>).)*',
-            'PIE': r'\?>',
+            'PIS':
+            r'<\?',
+            'PIB':
+            r'(?:(?!\?>).)*',
+            'PIE':
+            r'\?>',
 
             # 5. Declarations.
-            'DES': '<!',
-            'DEN': '[A-Z]+',
-            'DEB': '(?:(?!>).)+',
-            'DEE': '>',
+            'DES':
+            '<!',
+            'DEN':
+            '[A-Z]+',
+            'DEB':
+            '(?:(?!>).)+',
+            'DEE':
+            '>',
 
             # 6. CDATA
             # Section.
-            'CDS': r'<!\[CDATA\[',
+            'CDS':
+            r'<!\[CDATA\[',
             # Body.
-            'CDB': r'(?:(?!\]\]>).)+',
+            'CDB':
+            r'(?:(?!\]\]>).)+',
             # End.
-            'CDE': r'\]\]>',
+            'CDE':
+            r'\]\]>',
 
             # Attribute value.
-            'AV': __cmark_attributevalue,
+            'AV':
+            __cmark_attributevalue,
 
             # Attribute value specification.
-            'AVS': __cmark_attributevaluespec,
+            'AVS':
+            __cmark_attributevaluespec,
         },
         '_scanners.re': {
             # FIXME
@@ -178,6 +290,9 @@ parser: dict = {
             'max_levels': 6,
             'default_keep_levels': 6,
         },
+        'front_matter': {
+            'delimiters': [],
+        },
     },
 }
 
@@ -227,6 +342,11 @@ parser['cmark']['re'].update({
 
 parser['github'] = copy.deepcopy(parser['cmark'])
 
+# [0.29] <textarea> starts a block of type 7 and <source> of type 6.
+parser['github']['html_block']['verbatim_tags'].remove('textarea')
+parser['github']['html_block']['block_tags'].append('source')
+parser['github']['html_block']['block_tags'].sort()
+
 # FIXME
 # The following overrides must be removed once GFM is on par with cmark 0.30.
 # FIXME
@@ -290,5 +410,10 @@ parser['gitlab'] = copy.deepcopy(parser['cmark'])
 parser['goldmark'] = copy.deepcopy(parser['cmark'])
 parser['commonmarker'] = copy.deepcopy(parser['github'])
 
+# YAML only.
+parser['github']['front_matter']['delimiters'] = ['---']
+# YAML, TOML and JSON.
+parser['gitlab']['front_matter']['delimiters'] = ['---', '+++', ';;;']
+
 if __name__ == '__main__':
     pass
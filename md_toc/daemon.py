@@ -0,0 +1,318 @@
+#
+# daemon.py
+#
+# Copyright (C) 2024 Franco Masotti (see /README.md)
+#
+# This file is part of md-toc.
+#
+# md-toc is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# md-toc is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with md-toc.  If not, see <http://www.gnu.org/licenses/>.
+#
+r"""A long running process that keeps md-toc loaded in memory.
+
+Requests and responses are JSON objects, one per line::
+
+    {"method": "build_toc", "params": {"filename": "README.md"}, "cwd": "/src"}
+    {"result": "- [Title](#title)\n"}
+
+    {"method": "write_toc", "params": {"argv": ["-p", "github", "README.md"]}}
+    {"result": {"retcode": 0, "stdout": "", "stderr": ""}}
+
+``build_toc`` takes the arguments of ``md_toc.api.build_toc``, ``write_toc``
+the command line arguments. ``cwd``, ``id`` and ``environment`` are optional:
+``id`` is copied in the response. Failed requests get an ``error`` string
+instead of ``result``.
+
+Requests are run with the environment variables and the locale of the
+daemon. The client sends its ``environment``, see ``get_environment``,
+and runs the command itself if the one of the daemon is different, for
+example after md-toc is upgraded or ``XDG_CACHE_HOME`` is changed.
+
+.. note:: This module only imports the standard library at the top so the
+    client does not pay the import time of the rest of md-toc.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import io
+import json
+import locale
+import os
+import socket
+import stat
+import sys
+import tempfile
+
+# Reused between requests.
+_cli_interface = None
+
+# Options of the command line interface followed by a value.
+_OPTIONS_WITH_VALUE: list[str] = [
+    '-e', '--engine', '-j', '--jobs', '-m', '--toc-marker', '-n',
+    '--newline-string', '-s', '--skip-lines'
+]
+
+
+def get_socket_file() -> str:
+    r"""Get the path of the Unix socket of the daemon.
+
+    :returns: ``$XDG_RUNTIME_DIR/md_toc-$UID.sock`` or the same file in
+        the temporary directory if ``XDG_RUNTIME_DIR`` is not set.
+    :rtype: str
+    :raises: a built-in exception.
+    """
+    runtime_dir: str = os.environ.get('XDG_RUNTIME_DIR', '')
+    if runtime_dir == '':
+        runtime_dir = tempfile.gettempdir()
+
+    uid: str = str(os.getuid()) if hasattr(os, 'getuid') else ''
+    return os.path.join(runtime_dir, 'md_toc-' + uid + '.sock')
+
+
+def get_environment() -> dict:
+    r"""Get what changes the result of a command apart from its arguments.
+
+    :returns: the md-toc version, the Python interpreter, the encoding used
+        to read the files and the directory of the cache.
+    :rtype: dict
+    :raises: a built-in exception.
+    """
+    from . import __version__
+
+    return {
+        'version': __version__,
+        'executable': sys.executable,
+        'encoding': locale.getpreferredencoding(False),
+        'cache_home': os.environ.get('XDG_CACHE_HOME', ''),
+        'home': os.path.expanduser('~'),
+    }
+
+
+def _get_subcommand(argv: list[str]) -> str | None:
+    # The first positional argument, so that files named like a
+    # subcommand are not mistaken for one.
+    i: int = 0
+    while i < len(argv):
+        if argv[i] == '--':
+            return argv[i + 1] if i + 1 < len(argv) else None
+        if not argv[i].startswith('-') or argv[i] == '-':
+            return argv[i]
+        if argv[i] in _OPTIONS_WITH_VALUE:
+            i += 1
+        i += 1
+    return None
+
+
+def call(argv: list[str], timeout: float = 30.0) -> int | None:
+    r"""Run the command line interface in a running daemon.
+
+    :parameter argv: the command line arguments, without the program name.
+    :parameter timeout: the seconds to wait for the daemon, each time
+        it is read from or written to. Defaults to ``30.0``.
+    :type argv: list
+    :type timeout: float
+    :returns: the return code, or ``None`` if no daemon is listening on
+        the default socket or it cannot run the command, for example because
+        it reads from stdin, it runs in a different environment or it does
+        not answer in time. The output of the command is printed.
+    :rtype: typing.Optional[int]
+    :raises: a built-in exception.
+    """
+    if not hasattr(socket, 'AF_UNIX') or _get_subcommand(argv) == 'serve':
+        return None
+
+    socket_file: str = get_socket_file()
+    try:
+        st = os.stat(socket_file)
+    except OSError:
+        return None
+    # Do not send requests to sockets of other users.
+    if not stat.S_ISSOCK(st.st_mode) or st.st_uid != os.getuid():
+        return None
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            # socket.timeout is an OSError.
+            s.settimeout(timeout)
+            s.connect(socket_file)
+            s.sendall(
+                json.dumps({
+                    'method': 'write_toc',
+                    'params': {
+                        'argv': argv
+                    },
+                    'cwd': os.getcwd(),
+                    'environment': get_environment(),
+                }).encode('UTF-8') + b'\n')
+            with s.makefile('rb') as f:
+                response: dict = json.loads(f.readline())
+    except (OSError, ValueError):
+        # Not running anymore, stopped while answering or stuck.
+        return None
+
+    if 'error' in response:
+        return None
+
+    sys.stdout.write(response['result']['stdout'])
+    sys.stderr.write(response['result']['stderr'])
+    return response['result']['retcode']
+
+
+def _get_cli_interface():
+    global _cli_interface
+    if _cli_interface is None:
+        from .cli import CliInterface
+        _cli_interface = CliInterface()
+    return _cli_interface
+
+
+def _write_toc(argv: list[str]) -> dict:
+    from .__main__ import _run
+
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(
+            stderr):
+        try:
+            args = _get_cli_interface().parse_args(argv)
+        except SystemExit as e:
+            # Help, version and usage errors.
+            return {
+                'retcode': e.code if isinstance(e.code, int) else 1,
+                'stdout': stdout.getvalue(),
+                'stderr': stderr.getvalue(),
+            }
+
+        filenames: list[str] = getattr(args, 'filename', [])
+        if len(filenames) == 0 or '-' in filenames:
+            raise ValueError('stdin is not available')
+        retcode: int = _run(args)
+
+    return {
+        'retcode': retcode,
+        'stdout': stdout.getvalue(),
+        'stderr': stderr.getvalue(),
+    }
+
+
+def _handle_request(request: dict) -> dict:
+    from . import api
+
+    response: dict = dict()
+    if 'id' in request:
+        response['id'] = request['id']
+
+    cwd: str = os.getcwd()
+    try:
+        if request.get('environment', get_environment()) != get_environment():
+            raise ValueError('the daemon runs in a different environment')
+        os.chdir(request.get('cwd', cwd))
+        params: dict = request.get('params', dict())
+        if request['method'] == 'build_toc':
+            if params.get('filename', '-') == '-':
+                raise ValueError('stdin is not available')
+            response['result'] = api.build_toc(**params)
+        elif request['method'] == 'write_toc':
+            response['result'] = _write_toc(params['argv'])
+        else:
+            raise ValueError('unknown method ' + repr(request['method']))
+    except Exception as e:
+        response['error'] = type(e).__name__ + ': ' + str(e)
+    finally:
+        os.chdir(cwd)
+
+    return response
+
+
+def _serve_stream(rfile, wfile):
+    for line in rfile:
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError('the request is not an object')
+            response: dict = _handle_request(request)
+        except ValueError as e:
+            response = {'error': type(e).__name__ + ': ' + str(e)}
+        wfile.write(json.dumps(response).encode('UTF-8') + b'\n')
+        wfile.flush()
+
+
+def serve(socket_file: str | None = None):
+    r"""Answer the requests coming from a Unix socket until interrupted.
+
+    :parameter socket_file: the path of the socket. Defaults to
+        ``get_socket_file()``.
+    :type socket_file: str
+    :returns: None
+    :rtype: None
+    :raises: FileExistsError if another daemon is listening on the socket
+        or a built-in exception.
+
+    .. note:: Requests are answered one at a time.
+    """
+    import signal
+    import socketserver
+
+    if socket_file is None:
+        socket_file = get_socket_file()
+
+    if os.path.exists(socket_file):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            try:
+                s.connect(socket_file)
+            except OSError:
+                # Left by a daemon that was killed.
+                os.remove(socket_file)
+            else:
+                raise FileExistsError(socket_file)
+
+    class Handler(socketserver.StreamRequestHandler):
+
+        def handle(self):
+            _serve_stream(self.rfile, self.wfile)
+
+    # Load everything before the first request.
+    _get_cli_interface()
+
+    # Only the current user can connect.
+    umask: int = os.umask(0o077)
+    try:
+        server = socketserver.UnixStreamServer(socket_file, Handler)
+    finally:
+        os.umask(umask)
+
+    # Remove the socket on termination as well.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        with server:
+            server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        os.remove(socket_file)
+
+
+def serve_stdio():
+    r"""Answer the requests coming from stdin on stdout until stdin is closed.
+
+    :returns: None
+    :rtype: None
+    :raises: a built-in exception.
+    """
+    _get_cli_interface()
+    _serve_stream(sys.stdin.buffer, sys.stdout.buffer)
+
+
+if __name__ == '__main__':
+    pass
@@ -22,9 +22,16 @@
 
 from __future__ import annotations
 
+import array
+import codecs
+import io
+import locale
+import mmap
+import os
 import re
-
-import fpyutils
+import shutil
+import tempfile
+import typing
 
 
 # _ctoi and _isascii taken from cpython source Lib/curses/ascii.py
@@ -50,51 +57,429 @@ def _isascii(c) -> int:
     return 0 <= _ctoi(c) <= 127
 
 
-def _extract_lines(input_file: str, start: int, end: int) -> str:
-    r"""Extract lines from file between start and end line numbers, with line numbers starting from 1."""
-    if start > end or start < 1 or end < 1:
-        raise ValueError
+def _readlines_with_lookahead(
+        f,
+        first_line_number: int = 1) -> typing.Iterator[tuple[int, str, bool]]:
+    r"""Yield each line of a stream with its number and a flag marking the last line.
 
-    lines: list[str] = list()
-    line_counter: int = 1
+    Lines are read only once: the next line is buffered so that the document
+    end is known without seeking, which also works for non-seekable streams
+    such as stdin.
+    """
+    line_number: int = first_line_number
+    line: str = f.readline()
+    while line:
+        next_line: str = f.readline()
+        yield line_number, line, next_line == ''
+        line = next_line
+        line_number += 1
+
+
+def _mmap_readlines_with_lookahead(
+    filename: str,
+    first_chars: bytes,
+    max_space_indentation: int,
+    skip_lines: int = 0,
+    context_chars: bytes = b'',
+    blocks: list[tuple[re.Pattern, re.Pattern]] | None = None,
+    start: int = 0,
+    end: int | None = None,
+    block_end: re.Pattern | None = None,
+    vectorized: bool = False,
+) -> typing.Iterator[tuple[int, str, bool]]:
+    r"""Yield only the lines of a file that start with one of the given characters.
+
+    The file is memory mapped and searched as bytes: only the selected
+    lines become strings. Each line is returned together with its number and
+    a flag marking the last line of the file, just like
+    ``_readlines_with_lookahead``. Newlines are translated like universal
+    newlines mode does.
+
+    Lines starting with one of ``context_chars`` are preceded by the
+    skipped lines that follow the last blank line, which may be part of
+    the same paragraph.
+
+    ``blocks`` are pairs of regular expressions: all the lines from a
+    returned line matching the first one up to the line where the second
+    one is found are returned as well.
+
+    The skipped bytes between ``start`` and ``end`` are decoded as well,
+    and discarded, so that undecodable bytes raise ``UnicodeDecodeError``
+    like when the whole file is read as text.
+
+    Only the lines starting between the ``start`` and ``end`` byte offsets
+    are returned, with line numbers relative to ``start``. ``start`` must
+    be at the beginning of a line and ``end`` after a newline. If
+    ``block_end`` is not ``None`` the first line is inside a block ending
+    with it.
+
+    If ``vectorized`` is ``True`` and numpy is installed the lines starting
+    with one of ``first_chars`` are found and numbered by
+    ``_numpy_get_candidate_lines``, otherwise by regular expressions.
+    """
+    if vectorized:
+        try:
+            import numpy
+        except ImportError:
+            vectorized = False
+
+    newline = re.compile(b'\r\n|\r|\n')
+    candidate_start = b'[ ]{0,%d}[%s]' % (max_space_indentation,
+                                          re.escape(first_chars))
+    first_candidate = re.compile(candidate_start)
+    # Match the newline preceding the candidate line.
+    next_candidate = re.compile(b'[\r\n]' + candidate_start)
+    context_candidate = None
+    if context_chars != b'':
+        context_candidate = re.compile(
+            b'[ ]{0,%d}[%s]' %
+            (max_space_indentation, re.escape(context_chars)))
+    # The last line made of spaces and tabs only. Lines start after a
+    # newline but not between CR and LF. The greedy prefix makes the
+    # search go backwards from the end.
+    last_blank_line = re.compile(
+        b'(?s:.*)(?<![^\r\n])(?!(?<=\r)\n)[ \t]*(?:\r\n|\r|\n)')
+    any_block_start = None
+    if blocks is not None:
+        any_block_start = re.compile(b'|'.join([
+            b'(?:' + block_start.pattern + b')' for block_start, _ in blocks
+        ]))
+    encoding: str = locale.getpreferredencoding(False)
+
+    with open(filename, 'rb') as f:
+        # Empty files cannot be mapped.
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            size: int = len(mm)
+            if end is None:
+                end = size
+            # Bytes before this position are known to be decodable.
+            decoded_end: int = start
+            line_counter: int = 0
+            while line_counter < skip_lines:
+                m = newline.search(mm, start, end)
+                if m is None:
+                    _decode_and_discard(mm, decoded_end, end, encoding)
+                    return
+                start = m.end()
+                line_counter += 1
+
+            if start >= end:
+                _decode_and_discard(mm, decoded_end, end, encoding)
+                return
+
+            # Lines before this position are yielded even if they are not
+            # candidates.
+            context_end: int = -1
+            if block_end is not None:
+                m = block_end.search(mm, start)
+                context_end = size - 1 if m is None else max(
+                    mm.rfind(b'\n', 0, m.start()) + 1,
+                    mm.rfind(b'\r', 0, m.start()) + 1)
+
+            # The start offsets of the candidate lines and their indices
+            # from the line at start.
+            candidates = array.array('q')
+            candidate_indices = array.array('q')
+            # The candidate following the current line.
+            next_candidate_index: int = 0
+            if vectorized:
+                candidates, candidate_indices = _numpy_get_candidate_lines(
+                    mm, first_chars, max_space_indentation, start, end)
+
+            if (context_end >= start
+                    or first_candidate.match(mm, start, end) is not None):
+                line_start = start
+            elif vectorized:
+                line_start = -1 if len(candidates) == 0 else candidates[0]
+            else:
+                m = next_candidate.search(mm, start, end)
+                line_start = -1 if m is None else m.start() + 1
+
+            # The line number of the line starting at position.
+            line_number: int = skip_lines + 1
+            position: int = start
+            # Lines after the end are still decoded if they are part of a
+            # block, like when the whole file is read, but not returned.
+            while line_start != -1 and (line_start < end
+                                        or line_start <= context_end):
+                candidate: int = line_start
+                if (context_candidate is not None and line_start > position
+                        and line_start > context_end
+                        and context_candidate.match(mm, line_start)):
+                    context_end = line_start
+                    m = last_blank_line.match(mm, position, line_start)
+                    line_start = position if m is None else m.end()
+
+                if (vectorized and line_start > position
+                        and next_candidate_index < len(candidates)
+                        and candidates[next_candidate_index] == candidate):
+                    # Count the universal newlines backwards from the
+                    # candidate, which is already numbered.
+                    skipped: bytes = mm[line_start:candidate]
+                    line_number = (
+                        skip_lines + 1 +
+                        candidate_indices[next_candidate_index] -
+                        (skipped.count(b'\r') + skipped.count(b'\n') -
+                         skipped.count(b'\r\n')))
+                else:
+                    # Count the universal newlines of the skipped lines.
+                    skipped = mm[position:line_start]
+                    line_number += (skipped.count(b'\r') +
+                                    skipped.count(b'\n') -
+                                    skipped.count(b'\r\n'))
+                position = line_start
+
+                m = newline.search(mm, line_start)
+                if m is None:
+                    line_end = size
+                    next_line_start = size
+                    terminator = ''
+                else:
+                    line_end = m.start()
+                    next_line_start = m.end()
+                    terminator = '\n'
+
+                _decode_and_discard(mm, decoded_end, min(line_start, end),
+                                    encoding)
+                decoded_end = max(decoded_end, next_line_start)
+                line: str = mm[line_start:line_end].decode(encoding)
+                if line_start < end:
+                    yield (line_number, line + terminator,
+                           next_line_start >= size)
+                line_number += 1
+                position = next_line_start
+
+                if (any_block_start is not None
+                        and any_block_start.match(mm, line_start)):
+                    for block_start, block_end in blocks:
+                        if block_start.match(mm, line_start):
+                            m = block_end.search(mm, line_start)
+                            if m is None:
+                                # Until the end of the file.
+                                context_end = size - 1
+                            else:
+                                # The start of the line of the match.
+                                context_end = max(
+                                    context_end,
+                                    mm.rfind(b'\n', 0, m.start()) + 1,
+                                    mm.rfind(b'\r', 0, m.start()) + 1)
+                            break
+
+                if vectorized:
+                    while (next_candidate_index < len(candidates) and
+                           candidates[next_candidate_index] < next_line_start):
+                        next_candidate_index += 1
+
+                if next_line_start <= context_end:
+                    line_start = next_line_start
+                elif vectorized:
+                    line_start = (-1 if next_candidate_index >= len(candidates)
+                                  else candidates[next_candidate_index])
+                else:
+                    m = next_candidate.search(mm, line_end, end)
+                    line_start = -1 if m is None else m.start() + 1
+
+            _decode_and_discard(mm, decoded_end, end, encoding)
+
+
+def _decode_and_discard(mm: mmap.mmap,
+                        start: int,
+                        end: int,
+                        encoding: str,
+                        block_size: int = 16 * 1024 * 1024):
+    r"""Decode the bytes between two offsets of a memory mapped file, ``block_size`` bytes at a time.
+
+    :raises: UnicodeDecodeError if the bytes cannot be decoded.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    for block_start in range(start, end, block_size):
+        decoder.decode(mm[block_start:min(block_start + block_size, end)])
+    decoder.decode(b'', final=True)
+
+
+def _numpy_get_candidate_lines(
+        mm: mmap.mmap,
+        first_chars: bytes,
+        max_space_indentation: int,
+        start: int = 0,
+        end: int | None = None,
+        block_size: int = 16 * 1024 * 1024) -> tuple[array.array, array.array]:
+    r"""Find the lines of a memory mapped file that start with one of the given characters.
+
+    The bytes are compared by numpy, ``block_size`` bytes at a time.
+    Characters can be preceded by up to ``max_space_indentation`` spaces.
+
+    :returns: the start offsets of the lines between the ``start`` and
+        ``end`` byte offsets and their indices, where the line at ``start``
+        is ``0``.
+    """
+    import numpy
+
+    if end is None:
+        end = len(mm)
+    chars = numpy.frombuffer(first_chars, dtype=numpy.uint8)
+    # Python integers would use several times the memory.
+    candidates = array.array('q')
+    candidate_indices = array.array('q')
+    # The lines starting in the previous blocks.
+    line_counter: int = 0
+    for block_start in range(start, end, block_size):
+        block_end: int = min(block_start + block_size, end)
+        # The byte before the block and the indentation after it are
+        # needed as well.
+        offset: int = max(block_start - 1, start)
+        a = numpy.frombuffer(
+            mm,
+            dtype=numpy.uint8,
+            count=min(block_end + max_space_indentation + 1, end) - offset,
+            offset=offset)
+        current = a[block_start - offset:block_end - offset]
+        if block_start == start:
+            # The first line starts at start.
+            previous = numpy.concatenate(
+                (numpy.array([ord('\n')], dtype=numpy.uint8), current[:-1]))
+        else:
+            previous = a[:block_end - block_start]
+
+        # Universal newlines: a line starts after LF, or after a CR which
+        # is not followed by LF.
+        line_starts = numpy.flatnonzero((previous == ord('\n'))
+                                        | ((previous == ord('\r'))
+                                           & (current != ord('\n'))))
+        indices = line_starts + (block_start - offset)
+        is_candidate = numpy.zeros(len(indices), dtype=bool)
+        is_indentation = numpy.ones(len(indices), dtype=bool)
+        for i in range(0, max_space_indentation + 1):
+            is_in_block = indices + i < len(a)
+            c = numpy.where(is_in_block,
+                            a[numpy.minimum(indices + i,
+                                            len(a) - 1)], ord('\n'))
+            is_candidate |= is_indentation & numpy.isin(c, chars)
+            is_indentation &= c == ord(' ')
+
+        selected = numpy.flatnonzero(is_candidate)
+        candidates.frombytes((line_starts[selected] + block_start).astype(
+            numpy.int64).tobytes())
+        candidate_indices.frombytes(
+            (selected + line_counter).astype(numpy.int64).tobytes())
+        line_counter += len(line_starts)
+        # Release the buffer of the memory map.
+        del a, current, previous
+
+    return candidates, candidate_indices
+
+
+def _mmap_split_after_blank_lines(
+    filename: str,
+    number_of_chunks: int,
+    skip_lines: int = 0,
+    first_chunk_end: re.Pattern | None = None,
+) -> list[tuple[int, int | None]]:
+    r"""Split a file in byte ranges of about the same size.
+
+    Each range but the first one starts after a blank line. The first
+    range contains the skipped lines and the first match of
+    ``first_chunk_end`` after them, if any. The end of the last range is
+    ``None``.
+    """
+    newline = re.compile(b'\r\n|\r|\n')
+    # See _mmap_readlines_with_lookahead.
+    blank_line = re.compile(b'(?<![^\r\n])(?!(?<=\r)\n)[ \t]*(?:\r\n|\r|\n)')
+    boundaries: list[int] = [0]
+
+    with open(filename, 'rb') as f:
+        size: int = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return [(0, None)]
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start: int = 0
+            line_counter: int = 0
+            while line_counter < skip_lines and start < size:
+                m = newline.search(mm, start)
+                start = size if m is None else m.end()
+                line_counter += 1
+
+            if first_chunk_end is not None:
+                m = first_chunk_end.search(mm, start)
+                if m is not None:
+                    start = m.end()
+
+            for i in range(1, number_of_chunks):
+                m = blank_line.search(
+                    mm, max(start, boundaries[-1],
+                            size * i // number_of_chunks))
+                if m is None or m.end() >= size:
+                    break
+                boundaries.append(m.end())
+
+    return [(boundaries[i], boundaries[i + 1])
+            for i in range(0,
+                           len(boundaries) - 1)] + [(boundaries[-1], None)]
+
+
+def _read_lines(filename: str) -> tuple[bytes, list[str]]:
+    r"""Read a file once and get both its raw content and its lines.
+
+    Lines are split and their newlines translated like universal newlines
+    mode does.
+    """
+    with open(filename, 'rb') as f:
+        content: bytes = f.read()
+
+    text: str = content.decode(locale.getpreferredencoding(False))
+    return content, io.StringIO(text, newline=None).readlines()
 
-    with open(input_file) as f:
-        line: str = f.readline()
-        while line:
-            if line_counter >= start and line_counter <= end:
-                lines.append(line)
-            line = f.readline()
-            line_counter += 1
 
-    return ''.join(lines)
+def _get_line_matches(lines: list[str], pattern: str) -> dict[int, int]:
+    r"""Get the line numbers, starting from 1, of the lines equal to pattern.
 
+    Leading and trailing whitespace characters are ignored.
+    The keys of the returned dict are the occurrency numbers, starting from 1.
+    """
+    pattern = pattern.strip()
+    occurrency_matches: dict[int, int] = dict()
+    for line_number, line in enumerate(lines, start=1):
+        if line.strip() == pattern:
+            occurrency_matches[len(occurrency_matches) + 1] = line_number
 
-def _remove_line_intervals(filename: str, line_intervals: list[list[int]]):
-    # A nested list of integers divided in couples is expected.
-    # Example: [[1, 4], [8, 9]]
-    for interval in line_intervals:
-        if len(interval) != 2 or interval[0] < 1 or interval[
-                1] < 1 or interval[0] > interval[1]:
-            raise ValueError
+    return occurrency_matches
 
-        fpyutils.filelines.remove_line_interval(
-            filename,
-            interval[0],
-            interval[1],
-            filename,
-        )
+
+def _write_file_atomically(filename: str, content: bytes):
+    r"""Replace the content of a file.
+
+    A temporary file in the same directory is renamed over the original one
+    so readers never see a partially written file. The file mode is
+    preserved.
+    """
+    with tempfile.NamedTemporaryFile(
+            'wb',
+            dir=os.path.dirname(os.path.abspath(filename)),
+            delete=False,
+    ) as f:
+        try:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+            shutil.copymode(filename, f.name)
+        except BaseException:
+            f.close()
+            os.remove(f.name)
+            raise
+    os.replace(f.name, filename)
 
 
 def _get_existing_toc(filename: str, marker: str) -> tuple:
     r"""Get the existing TOC in a file and return other important data about the TOC and its markers."""
+    return _get_existing_toc_in_lines(_read_lines(filename)[1], marker)
+
+
+def _get_existing_toc_in_lines(file_lines: list[str], marker: str) -> tuple:
+    r"""Get the existing TOC from the lines of a file. See ``_get_existing_toc``."""
     # TOC marker positions.
-    marker_line_positions, lines = fpyutils.filelines.get_line_matches(
-        filename,
-        marker,
-        0,
-        loose_matching=True,
-        keep_all_lines=True,
-    )
+    marker_line_positions: dict = _get_line_matches(file_lines, marker)
     marker_line_positions_length: int = len(marker_line_positions)
 
     old_toc: str = ''
@@ -111,15 +496,17 @@ def _get_existing_toc(filename: str, marker: str) -> tuple:
     # Possible pre-existing TOC.
     while not done and marker_line_positions_length >= 2:
 
+        # Scan only the lines between the markers instead of the whole file.
+        # Indices of file_lines start from 0.
+        first: int = marker_line_positions[first_marker]
+        second: int = marker_line_positions[second_marker]
         interval: str = _read_line_interval(
-            lines, marker_line_positions[first_marker] + 1,
-            marker_line_positions[second_marker] - 1)
+            ''.join(file_lines[first:second - 1]), 1, second - first - 1)
 
         # Line intervals excluding the newline after the first <!--TOC-->
         # and before the last <!--TOC-->.
         interval_with_newline: str = _read_line_interval(
-            lines, marker_line_positions[first_marker] + 2,
-            marker_line_positions[second_marker] - 2)
+            ''.join(file_lines[first + 1:second - 2]), 1, second - first - 3)
 
         # TODO: add code fence detection.
         if _detect_toc_list(interval_with_newline) or _string_empty(interval):
@@ -130,8 +517,7 @@ def _get_existing_toc(filename: str, marker: str) -> tuple:
 
             if start_line <= end_line:
                 # Real TOC detected.
-                old_toc = _extract_lines(filename, start_line,
-                                         end_line).strip()
+                old_toc = ''.join(file_lines[start_line - 1:end_line]).strip()
             else:
                 old_toc = ''
 
@@ -184,42 +570,6 @@ def _replace_substring(source: str, replacement: str, start: int,
     return ''.join(replaced)
 
 
-# A weaker version of C's strncmp: this one does not count the characters,
-# it just notifies if there are differences.
-def _strncmp(s1: str, s2: str, length: int) -> int:
-    i: int = 0
-    retval: int = 0
-    process: bool = True
-
-    s1_prime: str = s1[:length]
-    s2_prime: str = s2[:length]
-    s1_prime_length: int = len(s1_prime)
-    s2_prime_length: int = len(s2_prime)
-    min_length: int = min(s1_prime_length, s2_prime_length)
-
-    if s1_prime_length < s2_prime_length:
-        retval = -1
-        process = False
-    elif s1_prime_length > s2_prime_length:
-        retval = 1
-        process = False
-
-    while process and i < min_length:
-        int_s1: int = ord(s1_prime[i])
-        int_s2: int = ord(s2_prime[i])
-
-        if int_s1 < int_s2:
-            retval = -1
-            process = False
-        elif int_s1 > int_s2:
-            retval = 1
-            process = False
-
-        i += 1
-
-    return retval
-
-
 def _string_empty(lines: str) -> bool:
     empty: bool = True
     # Avoid matching \n\r
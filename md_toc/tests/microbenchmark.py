@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2024 Franco Masotti (see /README.md)
+#
+# This file is part of md-toc.
+#
+# md-toc is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# md-toc is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with md-toc.  If not, see <http://www.gnu.org/licenses/>.
+#
+r"""Micro benchmarks of single functions.
+
+Run all of them with ``python3 -m md_toc.tests.microbenchmark`` or only
+some by passing their names as arguments.
+"""
+
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import md_toc
+from md_toc.cmark import chunk_h, references_c
+from md_toc.constants import common_defaults
+
+# Headings similar to the ones found in technical documentation.
+HEADINGS: list = [
+    'Installation',
+    'Getting started',
+    'Configuration options',
+    'API reference',
+    'Frequently asked questions',
+    'Release notes for version 2',
+    'The `build_toc` function',
+    'Using *emphasis* and **strong emphasis**',
+    'Links to [other documents](https://example.com)',
+    'HTML <em>tags</em> in headings',
+    'Entities &amp; special characters &nbsp; here',
+    'Escaped \\*asterisks\\*',
+    'snake_case_identifiers',
+]
+
+
+def _run(name: str, function, arguments: list, minimum_time: float = 1.0):
+    iterations: int = 0
+    start: float = time.perf_counter()
+    elapsed: float = 0
+    while elapsed < minimum_time:
+        for a in arguments:
+            function(*a)
+        iterations += len(arguments)
+        elapsed = time.perf_counter() - start
+
+    print(name + ': ' + str(int(iterations / elapsed)) + ' calls/sec')
+
+
+def build_anchor_link():
+    r"""Slugs per second for each cmark-like parser."""
+    random.seed(0)
+    headings: list = [random.choice(HEADINGS) for _ in range(0, 1000)]
+    for parser in ['github', 'gitlab', 'cmark']:
+        _run(
+            'build_anchor_link ' + parser,
+            md_toc.api.build_anchor_link,
+            # A new duplicate counter for every heading.
+            [[h, dict(), parser] for h in headings],
+        )
+
+
+def remove_emphasis():
+    r"""Headings per second, mostly made of plain words."""
+    random.seed(0)
+    headings: list = [random.choice(HEADINGS) for _ in range(0, 1000)]
+    _run('remove_emphasis', md_toc.api.remove_emphasis,
+         [[h, 'github'] for h in headings])
+
+
+def header_duplicate_counter():
+    r"""Speed and memory of the duplicate counter with many headings."""
+    headings: list = ['Section ' + str(i % 50000) for i in range(0, 100000)]
+    counter: dict = dict()
+    tracemalloc.start()
+    start: float = time.perf_counter()
+    for h in headings:
+        md_toc.api.build_anchor_link(h, counter, 'github')
+    elapsed: float = time.perf_counter() - start
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print('header_duplicate_counter: ' + str(int(len(headings) / elapsed)) +
+          ' calls/sec, ' + str(size // 1024) + ' KiB retained')
+
+
+def filter_indices_from_line():
+    r"""Link labels of the maximum length full of emphasis markers."""
+    random.seed(0)
+    labels: list = list()
+    for _ in range(0, 10):
+        label: list = list()
+        while len(''.join(label)) < 999:
+            marker: str = random.choice(['*', '**', '_', '__', '***'])
+            label.append(marker + random.choice(HEADINGS[:6]) + marker + ' ')
+        labels.append(''.join(label)[:999])
+    _run('remove_emphasis 999 chars', md_toc.api.remove_emphasis,
+         [[label, 'github'] for label in labels])
+
+    # Remove one character out of two.
+    _run('filter_indices_from_line 999 chars',
+         md_toc.api.filter_indices_from_line,
+         [[label, [range(i, i + 1) for i in range(0, 999, 2)]]
+          for label in labels])
+
+
+def long_headings():
+    r"""Long headings made of plain words with some emphasis."""
+    random.seed(0)
+    headings: list = list()
+    for _ in range(0, 10):
+        words: list = list()
+        while len(' '.join(words)) < 500:
+            words.append(random.choice(HEADINGS[:6]))
+            if random.random() < 0.1:
+                words.append('*' + random.choice(HEADINGS[:6]) + '*')
+        headings.append(' '.join(words))
+    _run('remove_emphasis 500 chars', md_toc.api.remove_emphasis,
+         [[h, 'github'] for h in headings])
+
+
+def links():
+    r"""Time per link of headings with more and more links.
+
+    The time per link should not grow with the length of the heading.
+    """
+    # Initialize the parser.
+    md_toc.api.remove_emphasis('[link](https://example.com)', 'github')
+    for n in [10, 100, 1000, 5000]:
+        heading: str = ' '.join([
+            '[link ' + str(i) + '](https://example.com/' + str(i) +
+            ' "title") <https://example.com>' for i in range(0, n)
+        ])
+        start: float = time.perf_counter()
+        md_toc.api.remove_emphasis(heading, 'github')
+        elapsed: float = time.perf_counter() - start
+        print('remove_emphasis ' + str(n) + ' links: ' +
+              str(int(elapsed / n * 10**6)) + ' us/link')
+
+
+def entities():
+    r"""Headings with named and numeric character references."""
+    headings: list = [
+        'Fish &amp; chips',
+        'Non&nbsp;breaking&nbsp;spaces',
+        '&lt;div&gt; &copy; &AElig;',
+        '&#35; and &#x41;',
+        '&quot;Quoted&quot; *text*',
+    ]
+    _run('remove_emphasis entities', md_toc.api.remove_emphasis,
+         [[h, 'github'] for h in headings])
+
+
+def allocations():
+    r"""Peak memory used to parse a heading, measured with tracemalloc.
+
+    Every text run, emphasis and link is a node.
+    """
+    headings: list = HEADINGS + [
+        ' '.join(['*word* [link](https://example.com) text'] * 100)
+    ]
+    # Initialize the parser and the tables.
+    for h in headings:
+        md_toc.api.remove_emphasis(h, 'github')
+
+    peaks: list = list()
+    for h in headings:
+        tracemalloc.start()
+        md_toc.api.remove_emphasis(h, 'github')
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    print('remove_emphasis allocations: ' +
+          str(sum(peaks[:-1]) // len(peaks[:-1])) + ' bytes/heading, ' +
+          str(peaks[-1]) + ' bytes for 100 links')
+
+
+def reference_labels():
+    r"""Normalize link reference labels of growing length.
+
+    Calls per second should be inversely proportional to the length.
+    """
+    random.seed(0)
+    for alphabet in ['abcdefgh ABC', 'àèìòùßÅΩж ']:
+        for n in [10, 100, 999]:
+            label: str = ''.join(
+                [random.choice(alphabet) for _ in range(0, n)])
+            _run(
+                'normalize_reference ' + str(n) + ' chars ' + alphabet[0],
+                references_c._cmark_normalize_reference,
+                [[None, chunk_h._cmarkCmarkChunk(label, n)]],
+                minimum_time=0.5,
+            )
+
+
+def import_time():
+    r"""Import time of the constants, measured with ``python -X importtime``."""
+    times: list = list()
+    for _ in range(0, 10):
+        result = subprocess.run(
+            [
+                sys.executable, '-X', 'importtime', '-c',
+                'import md_toc.constants'
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        for line in result.stderr.splitlines():
+            fields: list = line.split('|')
+            if fields[-1].strip() == 'md_toc.constants':
+                # Self time, in microseconds.
+                times.append(int(fields[0].split(':')[1]))
+    print('import md_toc.constants: ' + str(min(times)) + ' us')
+
+
+def engines():
+    r"""Time to build the TOC of a 50 MB file with each engine.
+
+    Like in generated reference documentation, headings are few compared
+    to paragraphs and code.
+    """
+    random.seed(0)
+    blocks: list = list()
+    size: int = 0
+    while size < 50 * 1024 * 1024:
+        block: str = random.choices(
+            [
+                '## ' + random.choice(HEADINGS),
+                ' '.join(random.choices(HEADINGS[:6], k=20)) + '\n' +
+                ' '.join(random.choices(HEADINGS[:6], k=20)),
+                '```\n# Not a heading\n' + random.choice(HEADINGS) + '\n```',
+                '    ' + random.choice(HEADINGS) + '\n    ' +
+                random.choice(HEADINGS),
+            ],
+            weights=[1, 50, 5, 20],
+        )[0]
+        blocks.append(block)
+        size += len(block) + 2
+
+    with tempfile.TemporaryDirectory() as d:
+        filename: str = os.path.join(d, 'engines.md')
+        with open(filename, 'w') as f:
+            f.write('# Title\n\n' + '\n\n'.join(blocks) + '\n')
+        for engine in common_defaults['engines']:
+            start: float = time.perf_counter()
+            md_toc.api.build_toc(filename, engine=engine)
+            print('build_toc ' + engine + ': ' +
+                  str(round(time.perf_counter() - start, 2)) + ' s')
+
+
+BENCHMARKS: dict = {
+    'build_anchor_link': build_anchor_link,
+    'remove_emphasis': remove_emphasis,
+    'header_duplicate_counter': header_duplicate_counter,
+    'filter_indices_from_line': filter_indices_from_line,
+    'long_headings': long_headings,
+    'links': links,
+    'entities': entities,
+    'allocations': allocations,
+    'reference_labels': reference_labels,
+    'import_time': import_time,
+    'engines': engines,
+}
+
+if __name__ == '__main__':
+    for benchmark in sys.argv[1:] or BENCHMARKS:
+        BENCHMARKS[benchmark]()
@@ -21,12 +21,38 @@
 r"""The tests module."""
 
 import doctest
+import hashlib
+import importlib.util
+import io
+import json
+import mmap
+import os
+import re
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
 import unittest
 from unittest.mock import patch
 
+from pyfakefs.fake_filesystem_unittest import Pause
 from pyfakefs.fake_filesystem_unittest import TestCase as pyfakefsTestCase
 
-from .. import api, exceptions, generic
+from .. import api, cache, daemon, exceptions, generic
+from ..cmark import (
+    cmark_h,
+    houdini_html_u_c,
+    inlines_c,
+    node_h,
+    references_h,
+    scanners_c,
+    scanners_h,
+    utf8_c,
+)
+from ..cmark.chunk_h import _cmarkCmarkChunk
+from ..cmark.buffer_h import _cmarkCmarkStrbuf
+from ..constants import common_defaults
 from ..constants import parser as md_parser
 
 # Some static generic variables.
@@ -150,57 +176,248 @@ class TestGeneric(pyfakefsTestCase):
         r"""Fake filesystem."""
         self.setUpPyfakefs()
 
-    def test__extract_lines(self):
-        r"""Test extracting lines between line intervals."""
+    def test__readlines_with_lookahead(self):
+        r"""Test reading lines with the document end flag."""
         with open('foo.md', 'w') as f:
-            f.write(CMARK_LINE_FOO)
-        self.assertEqual(generic._extract_lines('foo.md', 2, 2), '')
-        self.assertEqual(generic._extract_lines('foo.md', 1024, 2048), '')
-        self.assertEqual(generic._extract_lines('foo.md', 1, 1),
-                         CMARK_LINE_FOO)
+            f.write('')
+        with open('foo.md') as f:
+            self.assertEqual(list(generic._readlines_with_lookahead(f)), [])
 
         with open('foo.md', 'w') as f:
-            f.write(CMARK_LINE_FOO + LINE_LINE_FEED + CMARK_LINE_BAR)
-        self.assertEqual(generic._extract_lines('foo.md', 2, 2),
-                         CMARK_LINE_BAR)
-        self.assertEqual(generic._extract_lines('foo.md', 1, 2),
-                         CMARK_LINE_FOO + LINE_LINE_FEED + CMARK_LINE_BAR)
+            f.write(CMARK_LINE_FOO)
+        with open('foo.md') as f:
+            self.assertEqual(list(generic._readlines_with_lookahead(f)),
+                             [(1, CMARK_LINE_FOO, True)])
 
         with open('foo.md', 'w') as f:
             f.write(CMARK_LINE_FOO + LINE_LINE_FEED + CMARK_LINE_BAR +
                     LINE_LINE_FEED)
-        self.assertEqual(
-            generic._extract_lines('foo.md', 1, 1024),
-            CMARK_LINE_FOO + LINE_LINE_FEED + CMARK_LINE_BAR + LINE_LINE_FEED)
-        self.assertEqual(generic._extract_lines('foo.md', 2, 2),
-                         CMARK_LINE_BAR + LINE_LINE_FEED)
-        self.assertEqual(generic._extract_lines('foo.md', 2, 3),
-                         CMARK_LINE_BAR + LINE_LINE_FEED)
-
-        with self.assertRaises(ValueError):
-            generic._extract_lines('foo.md', 0, 0)
-        with self.assertRaises(ValueError):
-            generic._extract_lines('foo.md', 0, 1)
-        with self.assertRaises(ValueError):
-            generic._extract_lines('foo.md', 1, 0)
+        with open('foo.md') as f:
+            self.assertEqual(list(generic._readlines_with_lookahead(f)),
+                             [(1, CMARK_LINE_FOO + LINE_LINE_FEED, False),
+                              (2, CMARK_LINE_BAR + LINE_LINE_FEED, True)])
 
-    def test__remove_line_intervals(self):
-        r"""Test removing multiple line intervals from a file."""
-        with open('foo.md', 'w') as f:
-            f.write(CMARK_LINE_FOO + LINE_LINE_FEED + CMARK_LINE_FOO +
-                    LINE_LINE_FEED)
-        with self.assertRaises(ValueError):
-            generic._remove_line_intervals('foo.md', [[1, 2], [4, 5, 6]])
-        with self.assertRaises(ValueError):
-            generic._remove_line_intervals('foo.md', [[1, 2, 3], [4, 5]])
-        with self.assertRaises(ValueError):
-            generic._remove_line_intervals('foo.md', [[2, 1]])
-        with self.assertRaises(ValueError):
-            generic._remove_line_intervals('foo.md', [[0, 1]])
-        with self.assertRaises(ValueError):
-            generic._remove_line_intervals('foo.md', [[1, 0]])
+    def test__mmap_readlines_with_lookahead(self):
+        r"""Test reading the candidate lines of a memory mapped file.
 
-        # The rest of the function involves fpyutils.
+        mmap does not work on the fake filesystem.
+        """
+        with Pause(self.fs):
+            with tempfile.TemporaryDirectory() as d:
+                filename = os.path.join(d, 'foo.md')
+                with open(filename, 'wb') as f:
+                    f.write(b'')
+                self.assertEqual(
+                    list(
+                        generic._mmap_readlines_with_lookahead(
+                            filename, b'#`~', 3)), [])
+
+                with open(filename, 'wb') as f:
+                    f.write((CMARK_LINE_FOO + LINE_LINE_FEED + H1 + S1 +
+                             CMARK_LINE_BAR + LINE_CARRIAGE_RETURN +
+                             LINE_LINE_FEED + S4 + H1 + S1 + CMARK_LINE_BAZ +
+                             LINE_CARRIAGE_RETURN + S3 +
+                             BACKTICK3).encode('UTF-8'))
+                self.assertEqual(
+                    list(
+                        generic._mmap_readlines_with_lookahead(
+                            filename, b'#`~', 3)),
+                    [(2, H1 + S1 + CMARK_LINE_BAR + LINE_LINE_FEED, False),
+                     (4, S3 + BACKTICK3, True)])
+                self.assertEqual(
+                    list(
+                        generic._mmap_readlines_with_lookahead(filename,
+                                                               b'#`~',
+                                                               3,
+                                                               skip_lines=3)),
+                    [(4, S3 + BACKTICK3, True)])
+                self.assertEqual(
+                    list(
+                        generic._mmap_readlines_with_lookahead(filename,
+                                                               b'#`~',
+                                                               3,
+                                                               skip_lines=4)),
+                    [])
+
+                # The lines of the paragraph before a setext heading
+                # underline.
+                with open(filename, 'wb') as f:
+                    f.write(
+                        (CMARK_LINE_FOO + LINE_LINE_FEED + LINE_LINE_FEED +
+                         CMARK_LINE_BAR + LINE_CARRIAGE_RETURN +
+                         LINE_LINE_FEED + CMARK_LINE_BAZ + LINE_LINE_FEED +
+                         S1 + 3 * LINE_DASH + LINE_LINE_FEED).encode('UTF-8'))
+                self.assertEqual(
+                    list(
+                        generic._mmap_readlines_with_lookahead(
+                            filename, b'#`~-', 3)),
+                    [(5, S1 + 3 * LINE_DASH + LINE_LINE_FEED, True)])
+                self.assertEqual(
+                    list(
+                        generic._mmap_readlines_with_lookahead(
+                            filename, b'#`~-', 3, context_chars=b'-')),
+                    [(3, CMARK_LINE_BAR + LINE_LINE_FEED, False),
+                     (4, CMARK_LINE_BAZ + LINE_LINE_FEED, False),
+                     (5, S1 + 3 * LINE_DASH + LINE_LINE_FEED, True)])
+
+                # Same lines, with or without numpy.
+                self.assertEqual(
+                    list(
+                        generic._mmap_readlines_with_lookahead(
+                            filename,
+                            b'#`~-',
+                            3,
+                            context_chars=b'-',
+                            vectorized=True)),
+                    list(
+                        generic._mmap_readlines_with_lookahead(
+                            filename, b'#`~-', 3, context_chars=b'-')))
+                with patch.dict(sys.modules, {'numpy': None}):
+                    self.assertEqual(
+                        list(
+                            generic._mmap_readlines_with_lookahead(
+                                filename,
+                                b'#`~-',
+                                3,
+                                context_chars=b'-',
+                                vectorized=True)),
+                        list(
+                            generic._mmap_readlines_with_lookahead(
+                                filename, b'#`~-', 3, context_chars=b'-')))
+
+                # Blocks are returned whole.
+                with open(filename, 'wb') as f:
+                    f.write(('<!--' + LINE_LINE_FEED + LINE_LINE_FEED +
+                             CMARK_LINE_FOO + LINE_CARRIAGE_RETURN + '-->' +
+                             LINE_CARRIAGE_RETURN + LINE_LINE_FEED +
+                             CMARK_LINE_BAR + LINE_LINE_FEED + H1 + S1 +
+                             CMARK_LINE_BAZ).encode('UTF-8'))
+                self.assertEqual(
+                    list(
+                        generic._mmap_readlines_with_lookahead(
+                            filename,
+                            b'#<',
+                            3,
+                            blocks=[
+                                (re.compile(b'<!--'), re.compile(b'-->'))
+                            ])), [(1, '<!--' + LINE_LINE_FEED, False),
+                                  (2, LINE_LINE_FEED, False),
+                                  (3, CMARK_LINE_FOO + LINE_LINE_FEED, False),
+                                  (4, '-->' + LINE_LINE_FEED, False),
+                                  (6, H1 + S1 + CMARK_LINE_BAZ, True)])
+
+                # A byte range starting inside a block.
+                self.assertEqual(
+                    list(
+                        generic._mmap_readlines_with_lookahead(
+                            filename,
+                            b'#<',
+                            3,
+                            start=6,
+                            end=15,
+                            block_end=re.compile(b'-->'))),
+                    [(1, CMARK_LINE_FOO + LINE_LINE_FEED, False),
+                     (2, '-->' + LINE_LINE_FEED, False)])
+                self.assertEqual(
+                    list(
+                        generic._mmap_readlines_with_lookahead(filename,
+                                                               b'#<',
+                                                               3,
+                                                               start=6,
+                                                               end=15)), [])
+
+                # Undecodable bytes in the skipped lines, and after the
+                # last candidate line, are found like when reading text.
+                for content in [
+                        b'\xff\n# A\n', b'# A\n\xff\n', b'# A\n\xff',
+                        b'\xff\n\xff\n'
+                ]:
+                    with open(filename, 'wb') as f:
+                        f.write(content)
+                    for vectorized in [False, True]:
+                        with self.assertRaises(UnicodeDecodeError):
+                            list(
+                                generic._mmap_readlines_with_lookahead(
+                                    filename, b'#', 3, vectorized=vectorized))
+                    with self.assertRaises(UnicodeDecodeError):
+                        list(
+                            generic._mmap_readlines_with_lookahead(
+                                filename, b'#', 3, skip_lines=5))
+                # Bytes after the end are not decoded.
+                with open(filename, 'wb') as f:
+                    f.write(b'# A\n\xff\n')
+                self.assertEqual(
+                    list(
+                        generic._mmap_readlines_with_lookahead(filename,
+                                                               b'#',
+                                                               3,
+                                                               end=4)),
+                    [(1, '# A\n', False)])
+
+    @unittest.skipIf(
+        importlib.util.find_spec('numpy') is None, 'numpy is not installed')
+    def test__numpy_get_candidate_lines(self):
+        r"""Test finding the candidate lines with numpy."""
+        with Pause(self.fs):
+            with tempfile.TemporaryDirectory() as d:
+                filename = os.path.join(d, 'foo.md')
+                with open(filename, 'wb') as f:
+                    f.write((CMARK_LINE_FOO + LINE_LINE_FEED + S3 + H1 +
+                             LINE_CARRIAGE_RETURN + LINE_LINE_FEED + S4 + H1 +
+                             LINE_CARRIAGE_RETURN + H2 + S1 + CMARK_LINE_BAR +
+                             LINE_CARRIAGE_RETURN + BACKTICK3).encode('UTF-8'))
+                with open(filename, 'rb') as f:
+                    with mmap.mmap(f.fileno(), 0,
+                                   access=mmap.ACCESS_READ) as mm:
+                        # Blocks of any size give the same result.
+                        for block_size in [1, 2, 3, 1024]:
+                            candidates, indices = (
+                                generic._numpy_get_candidate_lines(
+                                    mm, b'#`~', 3, block_size=block_size))
+                            self.assertEqual(candidates.tolist(), [4, 16, 23])
+                            self.assertEqual(indices.tolist(), [1, 3, 4])
+
+                        candidates, indices = (
+                            generic._numpy_get_candidate_lines(mm,
+                                                               b'#`~',
+                                                               3,
+                                                               start=10,
+                                                               end=23))
+                        self.assertEqual(candidates.tolist(), [16])
+                        self.assertEqual(indices.tolist(), [1])
+
+    def test__mmap_split_after_blank_lines(self):
+        r"""Test splitting a memory mapped file in byte ranges."""
+        with Pause(self.fs):
+            with tempfile.TemporaryDirectory() as d:
+                filename = os.path.join(d, 'foo.md')
+                with open(filename, 'wb') as f:
+                    f.write(b'')
+                self.assertEqual(
+                    generic._mmap_split_after_blank_lines(filename, 4),
+                    [(0, None)])
+
+                with open(filename, 'wb') as f:
+                    f.write((CMARK_LINE_FOO + LINE_LINE_FEED + LINE_LINE_FEED +
+                             CMARK_LINE_BAR + LINE_CARRIAGE_RETURN +
+                             LINE_LINE_FEED + S1 + LINE_CARRIAGE_RETURN +
+                             LINE_LINE_FEED + CMARK_LINE_BAZ +
+                             LINE_LINE_FEED).encode('UTF-8'))
+                self.assertEqual(
+                    generic._mmap_split_after_blank_lines(filename, 4),
+                    [(0, 5), (5, 13), (13, None)])
+                self.assertEqual(
+                    generic._mmap_split_after_blank_lines(filename, 1),
+                    [(0, None)])
+                self.assertEqual(
+                    generic._mmap_split_after_blank_lines(filename,
+                                                          4,
+                                                          skip_lines=2),
+                    [(0, 13), (13, None)])
+                self.assertEqual(
+                    generic._mmap_split_after_blank_lines(
+                        filename, 4, first_chunk_end=re.compile(b'bar')),
+                    [(0, 13), (13, None)])
 
     def test__get_existing_toc(self):
         r"""Test retrieving the existing TOC. See the TestApi.test_write_string_on_file_between_markers method for more tests."""
@@ -494,6 +711,286 @@ class TestGeneric(pyfakefsTestCase):
             generic._read_line_interval('ab\u000d\u000a\u000ac', 2, 3), 'c')
 
 
+class TestCache(pyfakefsTestCase):
+    r"""Test the TOC cache.
+
+    sqlite does not work on the fake filesystem.
+    """
+
+    def setUp(self):
+        r"""Fake filesystem."""
+        self.setUpPyfakefs()
+
+    def test_lookup_and_store(self):
+        r"""Test cache hits and misses."""
+        with Pause(self.fs):
+            with tempfile.TemporaryDirectory() as d:
+                with patch.dict(os.environ, {'XDG_CACHE_HOME': d}):
+                    filename = os.path.join(d, 'foo.md')
+                    with open(filename, 'w') as f:
+                        f.write(H1 + S1 + CMARK_LINE_FOO + LINE_LINE_FEED)
+                    st = os.stat(filename)
+                    self.assertEqual(cache.lookup(filename, (1, ), st),
+                                     (None, None))
+                    cache.store(filename, (1, ), LINE, st)
+                    self.assertEqual(cache.lookup(filename, (1, ), st),
+                                     (LINE, None))
+                    self.assertEqual(cache.lookup(filename, (2, ), st),
+                                     (None, None))
+
+                    # Same content, different modification time.
+                    digest = cache._get_file_digest(filename)
+                    os.utime(filename,
+                             ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+                    st = os.stat(filename)
+                    self.assertEqual(cache.lookup(filename, (1, ), st),
+                                     (LINE, digest))
+
+                    # Same size, different content.
+                    with open(filename, 'w') as f:
+                        f.write(H1 + S1 + CMARK_LINE_BAR + LINE_LINE_FEED)
+                    os.utime(filename,
+                             ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+                    st = os.stat(filename)
+                    digest = cache._get_file_digest(filename)
+                    self.assertEqual(cache.lookup(filename, (1, ), st),
+                                     (None, digest))
+
+                    # The file is not hashed again.
+                    with patch.object(cache, '_get_file_digest') as m:
+                        cache.store(filename, (1, ), LINE, st, digest)
+                        m.assert_not_called()
+                    self.assertEqual(cache.lookup(filename, (1, ), st),
+                                     (LINE, None))
+
+                    # The database is opened again when it is removed.
+                    connection = cache._connect()
+                    os.remove(cache.get_cache_file())
+                    self.assertEqual(cache.lookup(filename, (1, ), st),
+                                     (None, None))
+                    with self.assertRaises(sqlite3.ProgrammingError):
+                        connection.execute('SELECT 1')
+
+                    # build_toc uses the cache.
+                    self.assertEqual(api.build_toc(filename, use_cache=True),
+                                     api.build_toc(filename))
+                    cache.store(filename,
+                                (False, False, False, False, 3, 'github', '-',
+                                 0, False, os.linesep, 'readline'), LINE, st)
+                    self.assertEqual(api.build_toc(filename, use_cache=True),
+                                     LINE)
+
+                    # Each engine has its own entries.
+                    self.assertEqual(
+                        api.build_toc(filename, engine='mmap', use_cache=True),
+                        api.build_toc(filename))
+
+                    cache.clear()
+                    self.assertFalse(os.path.exists(cache.get_cache_file()))
+                    self.assertEqual(cache.lookup(filename, (1, ), st),
+                                     (None, None))
+
+    def test_eviction(self):
+        r"""Test that the least recently used entries are removed."""
+        with Pause(self.fs):
+            with tempfile.TemporaryDirectory() as d:
+                with patch.dict(os.environ, {'XDG_CACHE_HOME': d}):
+                    with patch.dict(cache.common_defaults['cache'],
+                                    {'max_entries': 2}):
+                        filename = os.path.join(d, 'foo.md')
+                        with open(filename, 'w') as f:
+                            f.write(LINE)
+                        st = os.stat(filename)
+                        for i in range(0, 3):
+                            cache.store(filename, (i, ), LINE, st)
+                        self.assertEqual(cache.lookup(filename, (0, ), st),
+                                         (None, None))
+                        self.assertEqual(cache.lookup(filename, (1, ), st),
+                                         (LINE, None))
+                        self.assertEqual(cache.lookup(filename, (2, ), st),
+                                         (LINE, None))
+
+
+class TestConstants(unittest.TestCase):
+    r"""Test the global constants."""
+
+    def test_entities(self):
+        r"""Test that the entity table is built lazily and shared."""
+        # Check the import in a new interpreter.
+        result = subprocess.run(
+            [
+                sys.executable, '-X', 'importtime', '-c',
+                'import md_toc.constants as c; '
+                'print(c._entities._entities is None); '
+                'e = c.parser["github"]["re"]["ENTITIES"]; '
+                'print(e["CMARK_NUM_ENTITIES"] == len(e["entities"]) > 2000)'
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        self.assertEqual(result.stdout, 'True\nTrue\n')
+        self.assertIn('| md_toc.constants', result.stderr)
+
+        entities = md_parser['cmark']['re']['ENTITIES']['entities']
+        self.assertEqual(
+            len(entities),
+            md_parser['cmark']['re']['ENTITIES']['CMARK_NUM_ENTITIES'])
+        with self.assertRaises(KeyError):
+            md_parser['cmark']['re']['ENTITIES']['none']
+        self.assertEqual(entities[0], {
+            'entity': 'AElig',
+            'bytes': [195, 134, 0]
+        })
+        for p in ['github', 'gitlab', 'goldmark', 'commonmarker']:
+            self.assertIs(md_parser[p]['re']['ENTITIES']['entities'], entities)
+
+
+class TestDaemon(pyfakefsTestCase):
+    r"""Test the daemon."""
+
+    def setUp(self):
+        r"""Fake filesystem."""
+        self.setUpPyfakefs()
+
+    def test__serve_stream(self):
+        r"""Test the JSON lines requests and responses."""
+        with open('foo.md', 'w') as f:
+            f.write(H1 + S1 + CMARK_LINE_FOO + LINE_LINE_FEED + MARKER +
+                    LINE_LINE_FEED)
+        cwd = os.getcwd()
+        requests = [
+            {
+                'method': 'build_toc',
+                'params': {
+                    'filename': 'foo.md',
+                    'newline_string': '\n'
+                },
+                'cwd': cwd,
+                'id': 1,
+            },
+            {
+                'method': 'write_toc',
+                'params': {
+                    'argv': ['-n', r'\n', '-p', 'github', 'foo.md']
+                },
+                'cwd': cwd,
+            },
+            {
+                'method': 'build_toc',
+                'params': {
+                    'filename': '-'
+                }
+            },
+            {
+                'method': 'write_toc',
+                'params': {
+                    'argv': ['github']
+                }
+            },
+            {
+                'method': 'none'
+            },
+        ]
+        rfile = io.BytesIO(
+            b''.join([json.dumps(r).encode('UTF-8') + b'\n'
+                      for r in requests]) + b'[]\n')
+        wfile = io.BytesIO()
+        daemon._serve_stream(rfile, wfile)
+        responses = [json.loads(r) for r in wfile.getvalue().splitlines()]
+
+        self.assertEqual(
+            responses[0], {
+                'id': 1,
+                'result':
+                '- [' + CMARK_LINE_FOO + '](#' + CMARK_LINE_FOO + ')\n'
+            })
+        self.assertEqual(
+            responses[1],
+            {'result': {
+                'retcode': 0,
+                'stdout': '',
+                'stderr': ''
+            }})
+        with open('foo.md') as f:
+            self.assertEqual(
+                f.read(), H1 + S1 + CMARK_LINE_FOO + LINE_LINE_FEED + MARKER +
+                '\n\n' + '- [' + CMARK_LINE_FOO + '](#' + CMARK_LINE_FOO +
+                ')' + '\n\n' + MARKER + '\n')
+
+        # stdin is never read, unknown methods and invalid requests.
+        for r in responses[2:]:
+            self.assertEqual(list(r.keys()), ['error'])
+        self.assertEqual(len(responses), 6)
+
+        # Requests from a different environment.
+        request = {
+            'method': 'write_toc',
+            'params': {
+                'argv': ['-p', 'github', 'foo.md']
+            },
+            'cwd': cwd,
+            'environment': daemon.get_environment(),
+        }
+        self.assertIn('result', daemon._handle_request(request))
+        request['environment'] = dict(request['environment'], version='0')
+        self.assertEqual(daemon._handle_request(request), {
+            'error':
+            'ValueError: the daemon runs in a different environment'
+        })
+
+    def test_lazy_import(self):
+        r"""Test that the submodules are imported on first use."""
+        # Check the import in a new interpreter.
+        with Pause(self.fs):
+            result = subprocess.run(
+                [
+                    sys.executable, '-c', 'import sys, md_toc; '
+                    'print("md_toc.api" in sys.modules); '
+                    'print(md_toc.generic.__name__, md_toc.constants.__name__, '
+                    'md_toc.cmark.__name__, md_toc.api.__name__)'
+                ],
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+        self.assertEqual(
+            result.stdout, 'False\n'
+            'md_toc.generic md_toc.constants md_toc.cmark md_toc.api\n')
+        with self.assertRaises(AttributeError):
+            importlib.import_module(daemon.__package__).none
+
+    def test__get_subcommand(self):
+        r"""Test that files named like a subcommand are not subcommands."""
+        self.assertEqual(daemon._get_subcommand(['serve']), 'serve')
+        self.assertEqual(daemon._get_subcommand(['-c', 'serve', '--stdio']),
+                         'serve')
+        self.assertEqual(daemon._get_subcommand(['github', 'serve']), 'github')
+        self.assertEqual(
+            daemon._get_subcommand(['-j', '2', '--engine', 'mmap', 'cmark']),
+            'cmark')
+        self.assertEqual(daemon._get_subcommand(['-j2', '-', 'serve']), '-')
+        self.assertEqual(daemon._get_subcommand(['--', 'serve']), 'serve')
+        self.assertIsNone(daemon._get_subcommand(['-s', 'serve']))
+        self.assertIsNone(daemon._get_subcommand([]))
+
+    def test_call(self):
+        r"""Test that the command runs locally without a daemon."""
+        with patch.dict(os.environ, {'XDG_RUNTIME_DIR': os.getcwd()}):
+            self.assertIsNone(daemon.call(['github', 'foo.md']))
+
+        # A daemon that does not answer.
+        with Pause(self.fs):
+            with tempfile.TemporaryDirectory() as d:
+                with patch.dict(os.environ, {'XDG_RUNTIME_DIR': d}):
+                    with socket.socket(socket.AF_UNIX,
+                                       socket.SOCK_STREAM) as s:
+                        s.bind(daemon.get_socket_file())
+                        s.listen()
+                        self.assertIsNone(
+                            daemon.call(['github', 'foo.md'], timeout=0.1))
+
+
 class TestApi(pyfakefsTestCase):
     r"""Test the main API."""
 
@@ -506,11 +1003,7 @@ class TestApi(pyfakefsTestCase):
         r"""Test if two TOCs are equal."""
 
     def test_write_string_on_file_between_markers(self):
-        r"""Test that the TOC is written correctly on the file.
-
-        Most of the job is done by the fpyutils library. Refer to that
-        for the unit tests.
-        """
+        r"""Test that the TOC is written correctly on the file."""
         with self.assertRaises(exceptions.StdinIsNotAFileToBeWritten):
             api.write_string_on_file_between_markers('-',
                                                      LINE,
@@ -838,6 +1331,18 @@ class TestApi(pyfakefsTestCase):
             lines, 'hello' + '\n' + MARKER + '\n\n' + LINE + '\n\n' + MARKER +
             '\n' + MARKER)
 
+        # Same TOC: the file is not rewritten.
+        with open('foo.md', 'w') as f:
+            f.write('hello' + '\n' + MARKER + '\n\n' + '- [hi](#hi)' + '\n\n' +
+                    MARKER + '\n')
+        os.utime('foo.md', ns=(0, 0))
+        self.assertTrue(
+            api.write_string_on_file_between_markers('foo.md',
+                                                     '- [hi](#hi)',
+                                                     MARKER,
+                                                     newline_string='\n'))
+        self.assertEqual(os.stat('foo.md').st_mtime_ns, 0)
+
     @unittest.skip('empty test')
     def test_write_strings_on_files_between_markers(self):
         r"""Test that the TOC is written correctly on the files."""
@@ -850,9 +1355,778 @@ class TestApi(pyfakefsTestCase):
         this function is growing.
         """
 
-    @unittest.skip('empty test')
+    def test_build_toc_jobs(self):
+        r"""Test that reading chunks in worker processes gives the same TOC.
+
+        Worker processes do not see the fake filesystem.
+        """
+        # Front matter, code fences and HTML blocks with blank lines,
+        # duplicates and link reference definitions in different chunks.
+        content = ('---\na: 1\n\nb: 2\n---\n# Foo\n\n```\n# Not\n\n# Not\n'
+                   '```\n\n## Foo\n\n<!--\n\n# Not\n-->\n\n## [Bar]\n\n'
+                   '[bar]: /url\n\n# Foo\n')
+        with Pause(self.fs):
+            with tempfile.TemporaryDirectory() as d:
+                filename = os.path.join(d, 'foo.md')
+                with open(filename, 'w') as f:
+                    f.write(content)
+                chunks = list()
+                split = generic._mmap_split_after_blank_lines
+
+                def split_and_keep(*args) -> list:
+                    chunks.extend(split(*args))
+                    return chunks
+
+                with patch.dict(common_defaults, {'min_chunk_size': 8}):
+                    for engine in ['readline', 'mmap']:
+                        chunks.clear()
+                        with patch.object(generic,
+                                          '_mmap_split_after_blank_lines',
+                                          side_effect=split_and_keep):
+                            self.assertEqual(
+                                api.build_toc(filename,
+                                              newline_string='\n',
+                                              engine=engine,
+                                              jobs=4),
+                                '- [Foo](#foo)\n  - [Foo](#foo-1)\n'
+                                '  - [\\[Bar\\]](#bar)\n- [Foo](#foo-2)\n')
+                        # The file is really split.
+                        self.assertGreater(len(chunks), 2)
+                        self.assertEqual(
+                            api.build_toc(filename,
+                                          newline_string='\n',
+                                          engine=engine),
+                            '- [Foo](#foo)\n  - [Foo](#foo-1)\n'
+                            '  - [\\[Bar\\]](#bar)\n- [Foo](#foo-2)\n')
+                        self.assertEqual(
+                            api.build_toc(filename,
+                                          no_links=True,
+                                          newline_string='\n',
+                                          engine=engine,
+                                          jobs=4),
+                            api.build_toc(filename,
+                                          no_links=True,
+                                          newline_string='\n',
+                                          engine=engine))
+
+                    # Errors are the same as reading the file sequentially.
+                    with open(filename, 'a') as f:
+                        f.write('\n### Baz\n')
+                    with self.assertRaises(
+                            exceptions.TocDoesNotRenderAsCoherentList):
+                        api.build_toc(filename, jobs=4)
+                    with open(filename, 'ab') as f:
+                        f.write(b'\n\xff\n')
+                    for engine in ['readline', 'mmap']:
+                        for jobs in [1, 4]:
+                            self.assertEqual(
+                                api.build_toc(filename,
+                                              no_list_coherence=True,
+                                              engine=engine,
+                                              jobs=jobs), '<!--stop reading ' +
+                                filename + ': probably a binary file-->')
+
+                with self.assertRaises(ValueError):
+                    api.build_toc(filename, jobs=-1)
+
+    def test_get_toc(self):
+        r"""Test the tree of headers and its rendering."""
+        with open('foo.md', 'w') as f:
+            f.write('# Foo\n\n## Bar\n\n### Baz\n\n## Foo\n\n# Bar\n')
+        toc = api.get_toc('foo.md', keep_header_levels=2)
+        self.assertEqual(len(toc), 4)
+        self.assertEqual(
+            toc[2], {
+                'header_type': 2,
+                'text_original': 'Foo',
+                'text_anchor_link': 'foo-1',
+                'visible': True,
+                'line_number': 7,
+                'index': 2,
+                'parent': 0,
+            })
+        self.assertEqual(list(toc.indices), [1, 1, 2, 2])
+        self.assertEqual(list(toc.parents), [-1, 0, 0, -1])
+        self.assertEqual(toc.children(), [0, 3])
+        self.assertEqual(toc.children(0), [1, 2])
+
+        # The same file can be rendered in different ways.
+        for options in [
+                dict(),
+                dict(ordered=True),
+                dict(list_marker='*', no_indentation=True),
+                dict(constant_ordered_list=True),
+        ]:
+            self.assertEqual(
+                toc.render(newline_string='\n', **options),
+                api.build_toc('foo.md',
+                              keep_header_levels=2,
+                              newline_string='\n',
+                              **options))
+        self.assertEqual(
+            toc.render(ordered=True, newline_string='\n'),
+            '1. [Foo](#foo)\n   1. [Bar](#bar)\n   2. [Foo](#foo-1)\n'
+            '2. [Bar](#bar-1)\n')
+
+        with open('foo.md', 'w') as f:
+            f.write('# Foo\n### Bar\n')
+        toc = api.get_toc('foo.md', no_links=True)
+        with self.assertRaises(exceptions.TocDoesNotRenderAsCoherentList):
+            toc.render()
+        self.assertEqual(
+            toc.render(no_list_coherence=True, newline_string='\n'),
+            '- Foo\n  - Bar\n')
+
+    def test_build_tocs_for_parsers(self):
+        r"""Test that the TOCs are the same as the ones of build_toc.
+
+        Memory mapped files do not see the fake filesystem.
+        """
+        parsers = [
+            'github', 'gitlab', 'cmark', 'goldmark', 'commonmarker',
+            'redcarpet'
+        ]
+        # Tabs after the heading markers, HTML blocks and front matter
+        # depend on the parser.
+        contents = [
+            '# A -- B\n\n#\tTab\n\n<textarea>\n\n# Foo\n</textarea>\n\n'
+            '## [Foo]\n\n[foo]: /url\n\n# A -- B\n',
+            '+++\na: 1\n+++\n# Foo\n\n```\n# Bar\n```\n## Foo\n',
+            '---\na: 1\n---\n# Foo\n',
+        ]
+        with Pause(self.fs):
+            with tempfile.TemporaryDirectory() as d:
+                filename = os.path.join(d, 'foo.md')
+                for content in contents:
+                    with open(filename, 'w') as f:
+                        f.write(content)
+                    for engine in ['readline', 'mmap']:
+                        for no_links in [False, True]:
+                            expected = [
+                                api.build_toc(filename,
+                                              no_links=no_links,
+                                              no_list_coherence=True,
+                                              parser=p,
+                                              engine=engine) for p in parsers
+                            ]
+                            self.assertEqual(
+                                api.build_tocs_for_parsers(
+                                    filename,
+                                    parsers,
+                                    no_links=no_links,
+                                    no_list_coherence=True,
+                                    engine=engine), expected)
+
+                # The blocks are found once for the parsers that follow the
+                # same rules and agree on the front matter.
+                with patch.object(api,
+                                  '_iter_headers_in_lines',
+                                  wraps=api._iter_headers_in_lines) as m:
+                    tocs = api.get_tocs_for_parsers(
+                        filename, ['gitlab', 'cmark', 'github', 'goldmark'])
+                    self.assertEqual(m.call_count, 3)
+                self.assertEqual([len(toc) for toc in tocs], [1, 2, 1, 2])
+
+    def test_check_toc(self):
+        r"""Test that the TOCs are compared like tocs_equal does."""
+        headers = '# Foo\n\n## Bar\n\n# Baz\n'
+        toc = '- [Foo](#foo)\n  - [Bar](#bar)\n- [Baz](#baz)'
+        for old_toc, equal in [
+            (toc, True),
+            ('\n  ' + toc + '  \n\n', True),
+            (toc.replace('Baz', 'Qux'), False),
+            (toc.replace('\n', '  \n'), False),
+            (toc[:-1], False),
+            (toc + '\n- [Qux](#qux)', False),
+        ]:
+            with open('foo.md', 'w') as f:
+                f.write(MARKER + '\n\n' + old_toc + '\n\n' + MARKER + '\n\n' +
+                        headers)
+            self.assertEqual(api.check_toc('foo.md', newline_string='\n'),
+                             equal)
+            self.assertEqual(
+                api.check_toc('foo.md', newline_string='\n'),
+                api.tocs_equal(api.build_toc('foo.md', newline_string='\n'),
+                               'foo.md', MARKER))
+
+        with open('foo.md', 'w') as f:
+            f.write(headers)
+        self.assertFalse(api.check_toc('foo.md'))
+        with open('empty.md', 'w') as f:
+            f.write(MARKER + '\n\n' + MARKER + '\n')
+        self.assertTrue(api.check_toc('empty.md'))
+
+        # The headers after the first difference are not read.
+        with open('foo.md', 'w') as f:
+            f.write(MARKER + '\n\n- [Qux](#qux)\n\n' + MARKER + '\n\n' +
+                    headers)
+        with patch.object(api,
+                          'build_anchor_link',
+                          wraps=api.build_anchor_link) as m:
+            self.assertFalse(api.check_toc('foo.md'))
+            self.assertEqual(m.call_count, 1)
+
+        self.assertEqual(
+            api.check_multiple_tocs(['empty.md', 'foo.md', 'empty.md'],
+                                    fail_fast=True), [True, False])
+        self.assertEqual(api.check_multiple_tocs(['foo.md', 'empty.md']),
+                         [False, True])
+        # stdin has no existing TOC.
+        for filenames in [[], ['-'], ['empty.md', '-']]:
+            with self.assertRaises(ValueError):
+                api.check_multiple_tocs(filenames)
+
+        # Nothing is printed.
+        for argv, retcode in [
+            (['--check', 'github', 'empty.md', 'empty.md'], 0),
+            (['--check', '--fail-fast', 'github', 'foo.md', 'empty.md'], 128),
+        ]:
+            self.assertEqual(daemon._write_toc(argv), {
+                'retcode': retcode,
+                'stdout': '',
+                'stderr': ''
+            })
+
+        # Usage errors.
+        for argv, error in [
+            (['--check', 'github'], 'stdin cannot be checked'),
+            (['--check', 'github', '-'], 'stdin cannot be checked'),
+            (['--fail-fast', 'github', 'empty.md'], 'requires --check'),
+        ]:
+            result = daemon._write_toc(argv)
+            self.assertEqual(result['retcode'], 2)
+            self.assertIn(error, result['stderr'])
+
+    def test_iter_headers(self):
+        r"""Test that the headers are yielded with their line numbers."""
+        with open('foo.md', 'w') as f:
+            f.write(H1 + S1 + CMARK_LINE_FOO + LINE_LINE_FEED +
+                    LINE_LINE_FEED + BACKTICK3 + LINE_LINE_FEED + H1 + S1 +
+                    CMARK_LINE_BAR + LINE_LINE_FEED + BACKTICK3 +
+                    LINE_LINE_FEED + H4 + S1 + CMARK_LINE_FOO +
+                    LINE_LINE_FEED + H2 + S1 + CMARK_LINE_FOO + LINE_LINE_FEED)
+        expected = [
+            {
+                'header_type': 1,
+                'text_original': CMARK_LINE_FOO,
+                'text_anchor_link': CMARK_LINE_FOO,
+                'visible': True,
+                'line_number': 1,
+            },
+            # The invisible h4 counts as a duplicate.
+            {
+                'header_type': 2,
+                'text_original': CMARK_LINE_FOO,
+                'text_anchor_link': CMARK_LINE_FOO + '-2',
+                'visible': True,
+                'line_number': 7,
+            },
+        ]
+        self.assertEqual(list(api.iter_headers('foo.md')), expected)
+        with open('foo.md') as f:
+            self.assertEqual(list(api.iter_headers(f)), expected)
+            self.assertFalse(f.closed)
+        self.assertEqual(list(api.iter_headers('foo.md', skip_lines=6)),
+                         [dict(expected[1], text_anchor_link=CMARK_LINE_FOO)])
+
+        # Lines are read lazily, with a single line of lookahead.
+        with open('foo.md') as f:
+            headers = api.iter_headers(f)
+            next(headers)
+            self.assertEqual(f.readline(), BACKTICK3 + LINE_LINE_FEED)
+
+        # Setext headings start with their paragraph.
+        with open('foo.md', 'w') as f:
+            f.write(CMARK_LINE_FOO + LINE_LINE_FEED + LINE_LINE_FEED +
+                    CMARK_LINE_BAR + LINE_LINE_FEED + CMARK_LINE_BAZ +
+                    LINE_LINE_FEED + 3 * '=' + LINE_LINE_FEED + '>' + S1 +
+                    CMARK_LINE_FOO + LINE_LINE_FEED + 3 * LINE_DASH +
+                    LINE_LINE_FEED + H2 + S1 + CMARK_LINE_FOO +
+                    LINE_LINE_FEED + CMARK_LINE_FOO + LINE_LINE_FEED +
+                    LINE_DASH + LINE_LINE_FEED)
+        expected = [
+            {
+                'header_type': 1,
+                'text_original': CMARK_LINE_BAR + S1 + CMARK_LINE_BAZ,
+                'text_anchor_link': CMARK_LINE_BAR + '-' + CMARK_LINE_BAZ,
+                'visible': True,
+                'line_number': 3,
+            },
+            # The paragraph in the block quote is not a heading and
+            # the dashes are a thematic break.
+            {
+                'header_type': 2,
+                'text_original': CMARK_LINE_FOO,
+                'text_anchor_link': CMARK_LINE_FOO,
+                'visible': True,
+                'line_number': 8,
+            },
+            {
+                'header_type': 2,
+                'text_original': CMARK_LINE_FOO,
+                'text_anchor_link': CMARK_LINE_FOO + '-1',
+                'visible': True,
+                'line_number': 9,
+            },
+        ]
+        self.assertEqual(list(api.iter_headers('foo.md')), expected)
+        self.assertEqual(list(api.iter_headers('foo.md', parser='redcarpet')),
+                         [dict(expected[1], text_anchor_link=CMARK_LINE_FOO)])
+        with open('foo.md') as f:
+            content = f.read()
+        with Pause(self.fs):
+            with tempfile.TemporaryDirectory() as d:
+                filename = os.path.join(d, 'foo.md')
+                with open(filename, 'w') as f:
+                    f.write(content)
+                self.assertEqual(
+                    list(api.iter_headers(filename, engine='mmap')), expected)
+
+        # Front matter, HTML blocks and indented code blocks.
+        with open('foo.md', 'w') as f:
+            f.write(3 * LINE_DASH + LINE_LINE_FEED + H1 + S1 + CMARK_LINE_FOO +
+                    LINE_LINE_FEED + 3 * LINE_DASH + LINE_LINE_FEED + '<!--' +
+                    LINE_LINE_FEED + LINE_LINE_FEED + H1 + S1 +
+                    CMARK_LINE_FOO + LINE_LINE_FEED + '-->' + LINE_LINE_FEED +
+                    '<div>' + LINE_LINE_FEED + H1 + S1 + CMARK_LINE_FOO +
+                    LINE_LINE_FEED + LINE_LINE_FEED + S4 + H1 + S1 +
+                    CMARK_LINE_FOO + LINE_LINE_FEED + H1 + S1 +
+                    CMARK_LINE_BAR + LINE_LINE_FEED)
+        expected = [{
+            'header_type': 1,
+            'text_original': CMARK_LINE_BAR,
+            'text_anchor_link': CMARK_LINE_BAR,
+            'visible': True,
+            'line_number': 12,
+        }]
+        self.assertEqual(list(api.iter_headers('foo.md')), expected)
+        # The first heading is in a paragraph started by a thematic break.
+        self.assertEqual([
+            h['text_original'] for h in api.iter_headers('foo.md', 1, 'cmark')
+        ], [CMARK_LINE_FOO, CMARK_LINE_BAR])
+        # Front matter longer than the limit is part of the document.
+        with patch.dict(common_defaults, {'max_front_matter_lines': 1}):
+            self.assertEqual(list(api.iter_headers('foo.md')), expected)
+        with patch.dict(common_defaults, {'max_front_matter_lines': 0}):
+            self.assertEqual(
+                [h['text_original'] for h in api.iter_headers('foo.md')],
+                [CMARK_LINE_FOO, CMARK_LINE_BAR])
+        with open('foo.md') as f:
+            content = f.read()
+        with Pause(self.fs):
+            with tempfile.TemporaryDirectory() as d:
+                filename = os.path.join(d, 'foo.md')
+                with open(filename, 'w') as f:
+                    f.write(content)
+                self.assertEqual(
+                    list(api.iter_headers(filename, engine='mmap')), expected)
+                with patch.dict(common_defaults,
+                                {'max_front_matter_lines': 0}):
+                    self.assertEqual([
+                        h['text_original']
+                        for h in api.iter_headers(filename, engine='mmap')
+                    ], [CMARK_LINE_FOO, CMARK_LINE_BAR])
+
+        # Paragraphs longer than the limit are not setext headings.
+        content = ('a\nb\n===\n\nc\nd\ne\n===\n\nf\ng\nh\n---\n'
+                   '# i\nj\n---\n')
+        with Pause(self.fs):
+            with tempfile.TemporaryDirectory() as d:
+                filename = os.path.join(d, 'foo.md')
+                with open(filename, 'w') as f:
+                    f.write(content)
+                for engine in common_defaults['engines']:
+                    with patch.dict(common_defaults,
+                                    {'max_paragraph_lines': 2}):
+                        self.assertEqual([
+                            (h['text_original'], h['line_number'])
+                            for h in api.iter_headers(filename, engine=engine)
+                        ], [('a b', 1), ('i', 14), ('j', 15)])
+                    self.assertEqual([
+                        h['text_original']
+                        for h in api.iter_headers(filename, engine=engine)
+                    ], ['a b', 'c d e', 'f g h', 'i', 'j'])
+
+        with self.assertRaises(ValueError):
+            next(api.iter_headers('foo.md', skip_lines=-1))
+        with self.assertRaises(ValueError):
+            next(api.iter_headers('foo.md', engine='none'))
+
+    def test__get_reference_map(self):
+        r"""Test that link reference definitions are found in the whole file."""
+        with open('foo.md', 'w') as f:
+            f.write('# _[a_][Foo  BAR]b_\n'
+                    '\n'
+                    '```\n'
+                    '[code]: /code\n'
+                    '```\n'
+                    'paragraph\n'
+                    '[paragraph]: /paragraph\n'
+                    '\n'
+                    '[foo bar]:\n'
+                    '  /url\n'
+                    '  "title"\n'
+                    '[Foo Bar]: /second\n'
+                    '[baz]: /baz "title" not a title\n'
+                    '\n'
+                    '[STRAẞE]: /strasse\n')
+        refmap = api._get_reference_map('foo.md')
+        # Labels are case folded.
+        self.assertEqual(list(refmap.refs), ['foo bar', 'strasse'])
+        # The first definition wins.
+        self.assertEqual(refmap.refs['foo bar'].url, '/url')
+        self.assertEqual(refmap.refs['foo bar'].title, 'title')
+
+        # Emphasis cannot cross the boundaries of the link.
+        self.assertEqual(api.remove_emphasis('_[a_][foo bar]b_'),
+                         '[a][foo bar]b_')
+        self.assertEqual(
+            api.remove_emphasis('_[a_][foo bar]b_', refmap=refmap),
+            '[a_][foo bar]b')
+        # Brackets are escaped unless links are disabled.
+        self.assertEqual(
+            next(api.iter_headers('foo.md'))['text_anchor_link'],
+            'afoo--barb_')
+        self.assertEqual(
+            next(api.iter_headers('foo.md',
+                                  no_links=True))['text_anchor_link'],
+            'a_foo--barb')
+
+        # Expansion limit.
+        refmap.max_ref_size = 1
+        self.assertEqual(
+            api.remove_emphasis('_[a_][foo bar]b_', refmap=refmap),
+            '[a][foo bar]b_')
+
+    def test__cmark_cmark_utf8proc_case_fold(self):
+        r"""Test the case folding of link reference labels."""
+
+        def case_fold(string: str) -> str:
+            buf = _cmarkCmarkStrbuf()
+            utf8_c._cmark_cmark_utf8proc_case_fold(buf, string, len(string))
+            return buf.ptr
+
+        self.assertEqual(case_fold('Foo'), 'foo')
+        # Folding can return more than one character.
+        self.assertEqual(case_fold('\u00df'), 'ss')
+        # NFC maps CJK compatibility ideographs before folding.
+        self.assertEqual(case_fold('\uf900'), '\u8c48')
+        self.assertEqual(case_fold('Foo \u1e9e\uf900'), 'foo ss\u8c48')
+
+    def test__cmark_S_lookup_entity(self):
+        r"""Test the lookup of HTML entities by name."""
+        lookup = houdini_html_u_c._cmark_S_lookup_entity
+
+        # Known entities, with the terminating 0 of the C string.
+        self.assertEqual(lookup('amp', 3), [38, 0])
+        self.assertEqual(lookup('AElig', 5), [195, 134, 0])
+        self.assertEqual(lookup('ngE', 3), [226, 137, 167, 204, 184, 0])
+        # Names are case sensitive.
+        self.assertIsNone(lookup('AMp', 3))
+        self.assertIsNone(lookup('foo', 3))
+        self.assertIsNone(lookup('', 0))
+
+        # Only the first characters are looked up.
+        self.assertEqual(lookup('amp;x', 3), [38, 0])
+        self.assertEqual(lookup('Aacute;', 6), [195, 129, 0])
+        # Prefixes and extensions of a name are not entities.
+        self.assertIsNone(lookup('Aacute', 5))
+        self.assertIsNone(lookup('am', 2))
+        self.assertIsNone(lookup('ampx', 4))
+        self.assertIsNone(lookup('amp;', 4))
+
+        def unescape(string: str) -> str:
+            buf = _cmarkCmarkStrbuf()
+            houdini_html_u_c._cmark_houdini_unescape_html_f(
+                buf, string, len(string))
+            return buf.ptr
+
+        # Text that is not an entity is kept.
+        self.assertEqual(unescape('&foo; &amp &am;'), '&foo; &amp &am;')
+        self.assertEqual(unescape('& amp;'), '& amp;')
+        # Longer than the longest entity name.
+        self.assertEqual(unescape('&' + 'a' * 40 + ';'), '&' + 'a' * 40 + ';')
+
+    def test__cmarkCmarkNode_as(self):
+        r"""Test that the members of the as union do not leak."""
+        node = node_h._cmarkCmarkNode()
+        self.assertIsNone(node._as)
+
+        # The same member is kept between accesses.
+        node.as_heading.level = 2
+        node.as_heading.setext = True
+        self.assertEqual(node.as_heading, node_h._cmarkCmarkHeading(2, True))
+        self.assertIs(node.as_heading, node._as)
+
+        # Switching to another member starts from its defaults.
+        node.as_link.url = 'https://\u0100.example'
+        node.as_link.title = 'é'
+        self.assertEqual(node.as_link,
+                         node_h._cmarkCmarkLink('https://\u0100.example', 'é'))
+        self.assertEqual(node.as_code, node_h._cmarkCmarkCode())
+        node.as_code.info = 'python'
+        node.as_code.fenced = 1
+        self.assertEqual(node.as_heading, node_h._cmarkCmarkHeading())
+        self.assertEqual(node.as_link, node_h._cmarkCmarkLink())
+        self.assertEqual(node.as_code, node_h._cmarkCmarkCode())
+        self.assertEqual(node.as_list, node_h._cmarkCmarkList())
+        self.assertEqual(node.as_custom, node_h._cmarkCmarkCustom())
+
+        # Nodes do not share members.
+        other = node_h._cmarkCmarkNode()
+        other.as_heading.level = 3
+        node.as_heading.level = 1
+        self.assertEqual(other.as_heading.level, 3)
+
+    def test__cmark__scan_at(self):
+        r"""Test the scanners at offsets other than 0."""
+
+        def scan(scanner, data: str, offset: int) -> int:
+            return scanner(_cmarkCmarkChunk(data, len(data)), offset)
+
+        # The offsets are the ones used by the inline parser, for example
+        # after '<' for tags and after '<!' for comments.
+        prefix = 'é\u0100 x'
+        n = len(prefix)
+        self.assertEqual(
+            scan(scanners_h._cmark_scan_link_title, prefix + '"a b" y', n), 5)
+        self.assertEqual(
+            scan(scanners_h._cmark_scan_link_title, prefix + "'\u0100' y", n),
+            3)
+        self.assertEqual(
+            scan(scanners_h._cmark_scan_link_title, prefix + '"a b', n), 0)
+        self.assertEqual(
+            scan(scanners_h._cmark_scan_autolink_email, prefix + '<a@b.c>',
+                 n + 1), 6)
+        self.assertEqual(
+            scan(scanners_h._cmark_scan_html_tag, prefix + '<a href="é">x',
+                 n + 1), 11)
+        self.assertEqual(
+            scan(scanners_h._cmark_scan_html_tag, prefix + '</b>', n + 1), 3)
+        self.assertEqual(
+            scan(scanners_h._cmark_scan_html_cdata,
+                 prefix + '<![CDATA[\u0100]]>x', n + 3), 7)
+        self.assertEqual(
+            scan(scanners_h._cmark_scan_html_cdata,
+                 prefix + '<![CDATA[\u0100]]>x', n + 1), 0)
+        self.assertEqual(
+            scan(scanners_h._cmark_scan_html_comment, prefix + '<!-- é -->x',
+                 n + 2), 8)
+        self.assertEqual(
+            scan(scanners_h._cmark_scan_html_pi, prefix + '<?é x?>', n + 2), 3)
+        self.assertEqual(
+            scan(scanners_h._cmark_scan_html_declaration,
+                 prefix + '<!DOCTYPE é>x', n + 2), 9)
+        self.assertEqual(
+            scan(scanners_h._cmark_scan_spacechars, prefix + ' \t\nx', n), 3)
+
+        # Past the end.
+        self.assertEqual(
+            scan(scanners_h._cmark_scan_html_tag, '<b>', len('<b>')), 0)
+        self.assertEqual(scan(scanners_h._cmark_scan_html_tag, '<b>', 99), 0)
+        self.assertEqual(
+            scanners_c._cmark__scan_at(scanners_c._cmark__scan_html_tag,
+                                       _cmarkCmarkChunk(None, 0), 0), 0)
+
+        # The same as scanning the rest of the string.
+        for scanner in [
+                scanners_c._cmark__scan_spacechars,
+                scanners_c._cmark__scan_link_title,
+                scanners_c._cmark__scan_autolink_uri,
+                scanners_c._cmark__scan_autolink_email,
+                scanners_c._cmark__scan_html_comment,
+                scanners_c._cmark__scan_cdata,
+                scanners_c._cmark__scan_html_tag,
+                scanners_c._cmark__scan_html_declaration,
+                scanners_c._cmark__scan_html_pi,
+        ]:
+            data = ('x "t" <http://e.x> <a@b.c> <!-- c --> <![CDATA[d]]> '
+                    '<a href="é"> </b> <!DOCTYPE x> <?p?> \u0100')
+            for offset in range(0, len(data) + 1):
+                self.assertEqual(
+                    scanners_c._cmark__scan_at(
+                        scanner, _cmarkCmarkChunk(data, len(data)), offset),
+                    scanners_c._cmark__scan_at(
+                        scanner,
+                        _cmarkCmarkChunk(data[offset:],
+                                         len(data) - offset), 0))
+
+    def test__cmark_subject_find_special_char(self):
+        r"""Test that the search stops like with the C lookup tables."""
+        special = '\r\n\\`&_*[]<!'
+        smart = special + '"\'.-'
+
+        def find(data: str, pos: int, chars: str) -> int:
+            # Characters above U+00FF are outside of the tables.
+            for i in range(pos + 1, len(data)):
+                if data[i] in chars or ord(data[i]) > 0xFF:
+                    return i
+            return len(data)
+
+        subj = inlines_c._cmarkSubject()
+        for data in [
+                'abc', 'a*b_c', 'é*ü_ÿ', 'éüÿ\u0100', '\u0100*\u0101',
+                'aé\U0001F600x', '\u00ff\u0100\u00ff', 'é\'"-.ü',
+                'x\r\né[Ā]!<ü>&`\\', ''
+        ]:
+            subj.input = _cmarkCmarkChunk(data, len(data))
+            for subj.pos in range(0, len(data)):
+                self.assertEqual(
+                    inlines_c._cmark_subject_find_special_char(subj, 0),
+                    find(data, subj.pos, special))
+                self.assertEqual(
+                    inlines_c._cmark_subject_find_special_char(
+                        subj, cmark_h.CMARK_OPT_SMART),
+                    find(data, subj.pos, smart))
+
+    def test__cmark_parse_inline(self):
+        r"""Test the handler of each special character."""
+
+        def parse(line: str) -> tuple:
+            parent = node_h._cmarkCmarkNode()
+            parent.data = line
+            parent.length = len(line)
+            parent.internal_offset = 1
+            ignore = inlines_c._cmark_cmark_parse_inlines(
+                None, parent, references_h._cmarkCmarkReferenceMap(), 0)
+            nodes = list()
+            node = parent.first_child
+            while node is not None:
+                nodes.append(
+                    (cmark_h._cmarkCmarkNodeType(node.type).name, node.data))
+                node = node.next
+            return nodes, ignore
+
+        text = cmark_h._cmarkCmarkNodeType.CMARK_NODE_TEXT.name
+        code = cmark_h._cmarkCmarkNodeType.CMARK_NODE_CODE.name
+        html = cmark_h._cmarkCmarkNodeType.CMARK_NODE_HTML_INLINE.name
+        softbreak = cmark_h._cmarkCmarkNodeType.CMARK_NODE_SOFTBREAK.name
+        linebreak = cmark_h._cmarkCmarkNodeType.CMARK_NODE_LINEBREAK.name
+
+        # Characters above U+00FF end the text, like special characters.
+        self.assertEqual(parse('é\u0100ü'), ([(text, 'é'),
+                                              (text, '\u0100ü')], []))
+        self.assertEqual(parse('\u0100!é'), ([(text, '\u0100'), (text, '!'),
+                                              (text, 'é')], []))
+
+        # Newlines.
+        self.assertEqual(parse('\u0100\nü'), ([(text, '\u0100'),
+                                               (softbreak, None),
+                                               (text, 'ü')], []))
+        self.assertEqual(parse('\u0100\r\nü'), ([(text, '\u0100'),
+                                                 (softbreak, None),
+                                                 (text, 'ü')], []))
+        self.assertEqual(parse('\rĀ'), ([(softbreak, None), (text, 'Ā')], []))
+        self.assertEqual(parse('\u0100  \nü'), ([(text, '\u0100  '),
+                                                 (linebreak, None),
+                                                 (text, 'ü')], []))
+
+        # Backticks.
+        self.assertEqual(parse('é`\u0100`ü'), ([(text, 'é'), (code, '\u0100'),
+                                                (text, 'ü')], []))
+        self.assertEqual(parse('`\u0100'), ([(text, '`'),
+                                             (text, '\u0100')], []))
+
+        # Backslashes.
+        self.assertEqual(parse('\u0100\\*ü'), ([(text, '\u0100'), (text, '*'),
+                                                (text, 'ü')], []))
+        self.assertEqual(parse('\\\u0100'), ([(text, '\\'),
+                                              (text, '\u0100')], []))
+
+        # Entities.
+        nodes, ignore = parse('&amp;\u0100')
+        self.assertEqual([n[0] for n in nodes], [text, text])
+        self.assertEqual(nodes[1], (text, '\u0100'))
+        self.assertEqual(parse('&\u0100;'), ([(text, '&'),
+                                              (text, '\u0100;')], []))
+
+        # Pointy braces.
+        self.assertEqual(parse('\u0100<a href="é">ü'),
+                         ([(text, '\u0100'), (html, '<a href="é">'),
+                           (text, 'ü')], []))
+        self.assertEqual(parse('<\u0100>'), ([(text, '<'),
+                                              (text, '\u0100>')], []))
+
+        # Emphasis delimiters are removed and their positions returned.
+        self.assertEqual(
+            parse('*\u0100*ü'),
+            ([(text, 'ü')], [range(0, 1), range(2, 3)]))
+        self.assertEqual(parse('é_\u0100_'), ([(text, 'é'), (text, '_'),
+                                               (text, '\u0100'),
+                                               (text, '_')], []))
+        self.assertEqual(parse('\u0100*'), ([(text, '\u0100'),
+                                             (text, '*')], []))
+
+        # Smart punctuation is not enabled.
+        for c in ['\'', '"', '-', '.']:
+            self.assertEqual(parse(c + '\u0100'), ([(text, c),
+                                                    (text, '\u0100')], []))
+
+        # Brackets. The inline of the closing bracket is not added.
+        self.assertEqual(parse('\u0100[é]'), ([(text, '\u0100'), (text, '['),
+                                               (text, 'é')], []))
+        self.assertEqual(parse('![\u0100]'), ([(text, '!'), (text, '['),
+                                               (text, '\u0100')], []))
+        self.assertEqual(parse(']\u0100'), ([(text, '\u0100')], []))
+
+        self.assertEqual(api.remove_emphasis('*\u0100* _é_ **ü**'),
+                         '\u0100 é ü')
+
     def test_build_multiple_tocs(self):
-        r"""Test that the TOC is built correctly for multiple files."""
+        r"""Test that the TOC is built correctly for multiple files.
+
+        Worker processes do not see the fake filesystem.
+        """
+        with Pause(self.fs):
+            with tempfile.TemporaryDirectory() as d:
+                filenames = list()
+                for i in range(0, 16):
+                    filenames.append(os.path.join(d, str(i) + '.md'))
+                    with open(filenames[-1], 'w') as f:
+                        f.write(H1 + S1 + CMARK_LINE_FOO + str(i) +
+                                LINE_LINE_FEED)
+                expected = [
+                    '- [' + CMARK_LINE_FOO + str(i) + '](#' + CMARK_LINE_FOO +
+                    str(i) + ')' + LINE_LINE_FEED for i in range(0, 16)
+                ]
+                self.assertEqual(
+                    api.build_multiple_tocs(filenames, newline_string='\n'),
+                    expected)
+                self.assertEqual(
+                    api.build_multiple_tocs(filenames,
+                                            newline_string='\n',
+                                            jobs=4), expected)
+
+                with open(filenames[3], 'w') as f:
+                    f.write(H1 + S1 + CMARK_LINE_FOO + LINE_LINE_FEED + H3 +
+                            S1 + CMARK_LINE_FOO + LINE_LINE_FEED)
+                with self.assertRaises(
+                        exceptions.TocDoesNotRenderAsCoherentList):
+                    api.build_multiple_tocs(filenames, jobs=4)
+
+                # All the invalid arguments are reported with a message,
+                # also by worker processes.
+                errors = [
+                    ('jobs', -1, 'jobs must be a non-negative integer: -1'),
+                    ('skip_lines', -1,
+                     'skip_lines must be a non-negative integer: -1'),
+                    ('engine', 'none',
+                     "engine must be one of readline, mmap, numpy: 'none'"),
+                ]
+                for jobs in [1, 4]:
+                    for name, value, message in errors:
+                        kwargs = {'jobs': jobs, name: value}
+                        with self.assertRaises(ValueError) as cm:
+                            api.build_multiple_tocs(filenames, **kwargs)
+                        self.assertEqual(str(cm.exception), message)
+                        with self.assertRaises(ValueError) as cm:
+                            api.check_multiple_tocs(filenames, **kwargs)
+                        self.assertEqual(str(cm.exception), message)
+                # The command reports a usage error.
+                result = daemon._write_toc(['-j', '-2', 'github'] + filenames)
+                self.assertEqual(result['retcode'], 2)
+                self.assertIn('must be a non-negative integer',
+                              result['stderr'])
 
     def test_increase_index_ordered_list(self):
         r"""Test that the list index increases correctly.
@@ -1341,6 +2615,16 @@ class TestApi(pyfakefsTestCase):
         self.assertEqual(
             api.filter_indices_from_line(
                 'foo bar', [range(1, 2), range(4, 7)]), 'fo ')
+        # Unsorted and overlapping ranges.
+        self.assertEqual(
+            api.filter_indices_from_line(
+                'foo bar',
+                [range(4, 6),
+                 range(0, 2),
+                 range(1, 3),
+                 range(5, 6)]), ' r')
+        self.assertEqual(
+            api.filter_indices_from_line('foo bar', [range(0, 7, 2)]), 'o a')
 
     def test_remove_emphasis(self):
         r"""Test that removing emphasis works correctly correctly.
@@ -1348,6 +2632,15 @@ class TestApi(pyfakefsTestCase):
         .. note: not all tests are enabled because of a missing implementation
             and possible bugs.
         """
+        # Plain text, without inline special characters.
+        self.assertEqual(api.remove_emphasis(LINE), LINE)
+        self.assertEqual(api.remove_emphasis(CMARK_LINE_FOO + '\x00'),
+                         CMARK_LINE_FOO)
+        with patch('md_toc.cmark.inlines_c._cmark_cmark_parse_inlines'
+                   ) as parse_inlines:
+            api.remove_emphasis(LINE)
+            parse_inlines.assert_not_called()
+
         # Example 331 [Commonmark 0.28].
         # Example 350 [Commonmark 0.29].
         # Example 350 [Commonmark 0.30].
@@ -2773,6 +4066,11 @@ class TestApi(pyfakefsTestCase):
         self.assertEqual(api.remove_html_tags('<plaintext>', 'github'),
                          '<plaintext>')
 
+        # Tags are removed one kind at a time: removing an open tag
+        # can create a new declaration.
+        for parser in ['github', 'cmark']:
+            self.assertEqual(api.remove_html_tags('a<!<b>X y>', parser), 'a')
+
     def test_anchor_link_punctuation_filter(self):
         r"""Test the filtering of special characters from a string.
 
@@ -2820,6 +4118,28 @@ class TestApi(pyfakefsTestCase):
             self.assertEqual(header_duplicate_counter[k], 2)
             for k in header_duplicate_counter
         ]
+        self.assertEqual(
+            api.build_anchor_link(LINE,
+                                  header_duplicate_counter,
+                                  parser='github'), 'this-is-a-static-line-2')
+        self.assertEqual(header_duplicate_counter,
+                         {'this-is-a-static-line': 3})
+
+        # Long anchor links are counted by their checksum.
+        header_duplicate_counter = dict()
+        with patch.dict(common_defaults, {'max_anchor_link_key_length': 10}):
+            for i in ['', '-1', '-2']:
+                self.assertEqual(
+                    api.build_anchor_link(LINE,
+                                          header_duplicate_counter,
+                                          parser='github'),
+                    'this-is-a-static-line' + i)
+            self.assertEqual(
+                api.build_anchor_link('a', header_duplicate_counter), 'a')
+        self.assertEqual(header_duplicate_counter, {
+            hashlib.sha256(b'this-is-a-static-line').digest(): 3,
+            'a': 1
+        })
 
         # Check if the exception is raised for newlines.
         header_duplicate_counter = dict()
@@ -4478,6 +5798,165 @@ class TestApi(pyfakefsTestCase):
             api.is_closing_code_fence(TILDE3 + T1, TILDE3, 'cmark'), )
         self.assertFalse(api.is_closing_code_fence(TILDE3 + T4 + S4, TILDE3), )
 
+    def test_is_setext_heading_underline(self):
+        r"""Test detection of setext heading underlines."""
+        # Example 50 [Commonmark 0.30].
+        self.assertEqual(api.is_setext_heading_underline(3 * '='), 1)
+        self.assertEqual(
+            api.is_setext_heading_underline(3 * LINE_DASH + LINE_LINE_FEED), 2)
+        # Example 53 [Commonmark 0.30].
+        self.assertEqual(api.is_setext_heading_underline(LINE_DASH), 2)
+        # Example 55 [Commonmark 0.30].
+        self.assertEqual(
+            api.is_setext_heading_underline(S3 + 3 * LINE_DASH + S4), 2)
+        self.assertIsNone(api.is_setext_heading_underline(S4 + 3 * '='))
+        # Example 57 [Commonmark 0.30].
+        self.assertIsNone(
+            api.is_setext_heading_underline(3 * LINE_DASH + S1 + LINE_DASH))
+        self.assertIsNone(api.is_setext_heading_underline('=' + LINE_DASH))
+        self.assertIsNone(api.is_setext_heading_underline(LINE_EMPTY))
+
+        # Trailing tabs [Commonmark 0.30].
+        self.assertEqual(
+            api.is_setext_heading_underline(3 * '=' + T1, 'cmark'), 1)
+        self.assertIsNone(api.is_setext_heading_underline(3 * '=' + T1))
+
+        self.assertIsNone(api.is_setext_heading_underline(
+            3 * '=', 'redcarpet'))
+
+    def test_is_paragraph_line(self):
+        r"""Test detection of paragraph lines."""
+        self.assertTrue(api.is_paragraph_line(CMARK_LINE_FOO))
+        self.assertTrue(api.is_paragraph_line(H1 + CMARK_LINE_HASHTAG))
+        self.assertFalse(api.is_paragraph_line(LINE_EMPTY))
+        self.assertFalse(api.is_paragraph_line(S1 + T1 + LINE_LINE_FEED))
+        self.assertFalse(api.is_paragraph_line(H1 + S1 + CMARK_LINE_FOO))
+        self.assertFalse(api.is_paragraph_line(3 * '*'))
+        self.assertFalse(api.is_paragraph_line('>' + CMARK_LINE_FOO))
+        self.assertFalse(api.is_paragraph_line(BACKTICK3))
+
+        # Indented code blocks cannot interrupt a paragraph.
+        self.assertFalse(api.is_paragraph_line(S4 + CMARK_LINE_FOO))
+        self.assertTrue(api.is_paragraph_line(S4 + CMARK_LINE_FOO, True))
+
+        # Example 304 [Commonmark 0.30].
+        self.assertFalse(
+            api.is_paragraph_line(LINE_DASH + S1 + CMARK_LINE_FOO, True))
+        self.assertFalse(api.is_paragraph_line('1. ' + CMARK_LINE_FOO, True))
+        # Example 305 [Commonmark 0.30].
+        self.assertTrue(api.is_paragraph_line('14. ' + CMARK_LINE_FOO, True))
+        self.assertFalse(api.is_paragraph_line('14. ' + CMARK_LINE_FOO))
+        self.assertTrue(api.is_paragraph_line(LINE_DASH, True))
+
+        self.assertFalse(
+            api.is_paragraph_line(CMARK_LINE_FOO, False, 'redcarpet'))
+
+    def test_get_setext_heading(self):
+        r"""Test the link label of setext headings."""
+        self.assertEqual(
+            api.get_setext_heading([
+                S2 + CMARK_LINE_FOO + LINE_LINE_FEED, CMARK_LINE_BAR + S1 +
+                LINE_SQUARE_BRACKET_OPEN + CMARK_LINE_BAZ +
+                LINE_SQUARE_BRACKET_CLOSE + T1 + LINE_LINE_FEED
+            ], 2), {
+                'header_type':
+                2,
+                'header_text_trimmed':
+                CMARK_LINE_FOO + S1 + CMARK_LINE_BAR + S1 + LINE_ESCAPE +
+                LINE_SQUARE_BRACKET_OPEN + CMARK_LINE_BAZ + LINE_ESCAPE +
+                LINE_SQUARE_BRACKET_CLOSE,
+                'visible':
+                True,
+            })
+        line = (LINE_SQUARE_BRACKET_OPEN + CMARK_LINE_FOO +
+                LINE_SQUARE_BRACKET_CLOSE)
+        self.assertEqual(
+            api.get_setext_heading([line], 1,
+                                   no_links=True)['header_text_trimmed'], line)
+        self.assertFalse(
+            api.get_setext_heading([CMARK_LINE_FOO], 2,
+                                   keep_header_levels=1)['visible'])
+        with self.assertRaises(exceptions.GithubOverflowCharsLinkLabel):
+            api.get_setext_heading([CMARK_LINE_1000_CHARS], 1)
+        with self.assertRaises(ValueError):
+            api.get_setext_heading([CMARK_LINE_FOO], 1, keep_header_levels=0)
+
+    def test_is_indented_code_line(self):
+        r"""Test detection of indented code lines."""
+        self.assertTrue(api.is_indented_code_line(S4 + CMARK_LINE_FOO))
+        self.assertTrue(api.is_indented_code_line(T1 + CMARK_LINE_FOO))
+        self.assertTrue(api.is_indented_code_line(S2 + T1 + CMARK_LINE_FOO))
+        self.assertFalse(api.is_indented_code_line(S3 + CMARK_LINE_FOO))
+        self.assertFalse(api.is_indented_code_line(S4 + LINE_LINE_FEED))
+        self.assertFalse(api.is_indented_code_line(S4 + CMARK_LINE_FOO, True))
+        self.assertFalse(
+            api.is_indented_code_line(S4 + CMARK_LINE_FOO, False, 'redcarpet'))
+
+    def test_is_opening_html_block(self):
+        r"""Test detection of the start of HTML blocks."""
+        self.assertIsNone(api.is_opening_html_block(CMARK_LINE_FOO))
+        self.assertIsNone(api.is_opening_html_block(S4 + '<div>'))
+        # Example 148 [Commonmark 0.30].
+        self.assertEqual(api.is_opening_html_block('<pre class="x">'), 1)
+        self.assertEqual(api.is_opening_html_block('<PRE>'), 1)
+        self.assertEqual(api.is_opening_html_block('<pre'), 1)
+        self.assertEqual(api.is_opening_html_block('<!-- foo -->'), 2)
+        self.assertEqual(api.is_opening_html_block('<?php'), 3)
+        self.assertEqual(api.is_opening_html_block('<!DOCTYPE html>'), 4)
+        self.assertEqual(api.is_opening_html_block('<![CDATA['), 5)
+        self.assertEqual(api.is_opening_html_block(S3 + '<div>'), 6)
+        self.assertEqual(api.is_opening_html_block('</DIV>', True), 6)
+        self.assertEqual(api.is_opening_html_block('<hr/>'), 6)
+        self.assertIsNone(api.is_opening_html_block('<divx>', True))
+        # Example 163 [Commonmark 0.30].
+        self.assertEqual(api.is_opening_html_block('<a href="foo">'), 7)
+        self.assertEqual(api.is_opening_html_block('</a>' + T1), 7)
+        self.assertIsNone(api.is_opening_html_block('<a>' + S1 + 'foo'))
+        # Example 164 [Commonmark 0.30]. It cannot interrupt a paragraph.
+        self.assertIsNone(api.is_opening_html_block('<a>', True))
+
+        # [0.29] vs [0.30].
+        self.assertEqual(api.is_opening_html_block('<textarea>'), 7)
+        self.assertEqual(
+            api.is_opening_html_block('<textarea>', False, 'cmark'), 1)
+        self.assertEqual(api.is_opening_html_block('<source>'), 6)
+        self.assertEqual(api.is_opening_html_block('<source>', False, 'cmark'),
+                         7)
+        self.assertIsNone(api.is_opening_html_block('<!doctype html>'))
+        self.assertEqual(
+            api.is_opening_html_block('<!doctype html>', False, 'cmark'), 4)
+
+        self.assertIsNone(
+            api.is_opening_html_block('<div>', False, 'redcarpet'))
+
+    def test_is_closing_html_block(self):
+        r"""Test detection of the end of HTML blocks."""
+        self.assertTrue(api.is_closing_html_block('</pre>', 1))
+        self.assertTrue(api.is_closing_html_block('foo </SCRIPT> bar', 1))
+        self.assertFalse(api.is_closing_html_block('</div>', 1))
+        self.assertTrue(api.is_closing_html_block('<!-->', 2))
+        self.assertFalse(api.is_closing_html_block('->', 2))
+        self.assertTrue(api.is_closing_html_block('?>', 3))
+        self.assertTrue(api.is_closing_html_block('>', 4))
+        self.assertTrue(api.is_closing_html_block(']]>', 5))
+        self.assertTrue(api.is_closing_html_block(S1 + T1 + LINE_LINE_FEED, 6))
+        self.assertFalse(api.is_closing_html_block('</div>', 6))
+        self.assertTrue(api.is_closing_html_block(LINE_EMPTY, 7))
+
+    def test_is_opening_front_matter(self):
+        r"""Test detection of front matter."""
+        self.assertEqual(
+            api.is_opening_front_matter(3 * LINE_DASH + S1 + LINE_LINE_FEED),
+            3 * LINE_DASH)
+        self.assertIsNone(api.is_opening_front_matter(4 * LINE_DASH))
+        self.assertIsNone(api.is_opening_front_matter(S1 + 3 * LINE_DASH))
+        self.assertIsNone(api.is_opening_front_matter('+++'))
+        self.assertEqual(api.is_opening_front_matter('+++', 'gitlab'), '+++')
+        self.assertEqual(api.is_opening_front_matter(';;;', 'gitlab'), ';;;')
+        self.assertIsNone(api.is_opening_front_matter(3 * LINE_DASH, 'cmark'))
+        self.assertIsNone(
+            api.is_opening_front_matter(3 * LINE_DASH, 'redcarpet'))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -60,6 +60,33 @@ class Header(TypedDict):
     visible: bool
 
 
+class HeaderWithLineNumber(Header):
+    r"""A ``header`` object together with its position in the file.
+
+    :parameter line_number: the line of the file where the header is,
+       starting from ``1``.
+    :type line_number: int
+    """
+
+    line_number: int
+
+
+class TocEntry(HeaderWithLineNumber):
+    r"""A single entry of a ``Toc`` object.
+
+    :parameter index: the position of the entry among the ones with the same
+       parent, starting from ``1``. This is the list marker number of
+       ordered TOCs.
+    :parameter parent: the position of the parent entry in the TOC or ``-1``
+       for top level entries.
+    :type index: int
+    :type parent: int
+    """
+
+    index: int
+    parent: int
+
+
 class HeaderTypeCounter(TypedDict, total=False):
     r"""The number of headers for each type, from ``h1`` to ``h6``."""
 
@@ -74,9 +101,10 @@ class HeaderTypeCounter(TypedDict, total=False):
 class HeaderDuplicateCounter(TypedDict, total=False):
     r"""A ``header_duplicate_counter`` object.
 
-    :parameter ``key``: a generic string corresponding to header links. Its
-       value is the number of times ``key`` appears during the execution of
-       md-toc.
+    :parameter ``key``: an anchor link, without the duplicate suffix, or
+       the SHA-256 digest of its UTF-8 encoding, as bytes, if it is longer
+       than ``max_anchor_link_key_length`` characters. Its value is the
+       number of times ``key`` appears during the execution of md-toc.
 
     .. note:: This dict can be empty.
     """